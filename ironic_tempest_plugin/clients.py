@@ -16,6 +16,7 @@ from tempest import clients
 from tempest.common import credentials_factory as common_creds
 from tempest import config
 
+from ironic_tempest_plugin.common import token_cache
 from ironic_tempest_plugin.services.baremetal.v1.json.baremetal_client import \
     BaremetalClient
 
@@ -39,6 +40,8 @@ class Manager(clients.Manager):
                 ADMIN_CREDS = common_creds.get_configured_admin_credentials()
             credentials = ADMIN_CREDS
         super(Manager, self).__init__(credentials)
+        if token_cache.enabled():
+            token_cache.share(self.auth_provider)
         default_params_with_timeout_values = {
             'build_interval': CONF.compute.build_interval,
             'build_timeout': CONF.compute.build_timeout
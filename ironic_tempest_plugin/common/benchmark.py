@@ -0,0 +1,211 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import itertools
+import os
+import threading
+import time
+
+from oslo_log import log
+from oslo_serialization import jsonutils as json
+from oslo_utils import timeutils
+from tempest import config
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import utils
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(samples, pct):
+    """Calculate a percentile using linear interpolation.
+
+    :param samples: a sorted list of numbers.
+    :param pct: the percentile to calculate, between 0 and 100.
+    :returns: the percentile value or None for an empty list.
+    """
+    if not samples:
+        return None
+    rank = (len(samples) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(samples) - 1)
+    return samples[lower] + (samples[upper] - samples[lower]) * (rank - lower)
+
+
+def fairness_index(counts):
+    """Calculate Jain's fairness index.
+
+    :param counts: an iterable of numbers, e.g. how often every node was
+        picked.
+    :returns: a value between 1/n (one item gets everything) and 1 (all items
+        get the same share), or None if there is nothing to compare.
+    """
+    counts = list(counts)
+    total = sum(counts)
+    squares = sum(count * count for count in counts)
+    if not counts or not squares:
+        return None
+    return total * total / (len(counts) * squares)
+
+
+def error_code(exc):
+    """Get a short identifier of an error for reporting purposes."""
+    if isinstance(exc, lib_exc.RestClientException):
+        resp = getattr(exc, 'resp', None)
+        status = getattr(resp, 'status', None)
+        if status is not None:
+            return str(status)
+    return exc.__class__.__name__
+
+
+class LatencyRecorder(object):
+    """Thread-safe collector of request latencies and errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+        self.errors = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def add(self, duration):
+        with self._lock:
+            self.samples.append(duration)
+
+    def add_error(self, code):
+        with self._lock:
+            self.errors[code] = self.errors.get(code, 0) + 1
+
+    @contextlib.contextmanager
+    def measure(self):
+        """Measure the latency of the wrapped block.
+
+        Exceptions are recorded as errors and are not propagated.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            LOG.debug('Benchmark request failed', exc_info=True)
+            self.add_error(error_code(exc))
+        else:
+            self.add(time.monotonic() - start)
+
+    def run(self, func, iterations, concurrency=1):
+        """Call func the given number of times and record its latency.
+
+        :param func: a callable without arguments to measure.
+        :param iterations: the number of calls to make.
+        :param concurrency: how many calls may run at the same time.
+        :returns: self, for convenience.
+        """
+        def _call(_):
+            with self.measure():
+                func()
+
+        self.started_at = time.monotonic()
+        utils.run_concurrently(_call, range(iterations), concurrency)
+        self.finished_at = time.monotonic()
+        return self
+
+    def run_at_rate(self, func, rate, duration, concurrency=1):
+        """Call func at a constant rate and record its latency.
+
+        The calls are scheduled at fixed offsets from the start, if all
+        workers are busy the schedule slips and the achieved throughput ends up
+        below the requested rate.
+
+        :param func: a callable accepting the sequence number of the call.
+        :param rate: the requested number of calls per second.
+        :param duration: for how long to generate the load, in seconds.
+        :param concurrency: how many calls may run at the same time.
+        :returns: self, for convenience.
+        """
+        total = int(rate * duration)
+        counter = itertools.count()
+        lock = threading.Lock()
+
+        def _worker(_):
+            while True:
+                with lock:
+                    index = next(counter)
+                if index >= total:
+                    return
+                delay = self.started_at + index / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                with self.measure():
+                    func(index)
+
+        self.started_at = time.monotonic()
+        utils.run_concurrently(_worker, range(concurrency), concurrency)
+        self.finished_at = time.monotonic()
+        return self
+
+    def summary(self):
+        """Summarize the recorded data.
+
+        :returns: a dictionary with the number of successful and failed
+            requests, latency statistics in seconds and the throughput in
+            requests per second.
+        """
+        with self._lock:
+            samples = sorted(self.samples)
+            errors = dict(self.errors)
+        result = {
+            'count': len(samples),
+            'errors': errors,
+            'error_rate': (sum(errors.values())
+                           / max(len(samples) + sum(errors.values()), 1)),
+            'min': samples[0] if samples else None,
+            'max': samples[-1] if samples else None,
+            'mean': sum(samples) / len(samples) if samples else None,
+        }
+        for pct in PERCENTILES:
+            result['p%d' % pct] = percentile(samples, pct)
+        if self.started_at is not None and self.finished_at is not None:
+            wall = self.finished_at - self.started_at
+            result['wall_time'] = wall
+            result['throughput'] = len(samples) / wall if wall else None
+        return result
+
+
+def write_report(name, data):
+    """Write a benchmark report.
+
+    The report is always logged. It is also saved as a JSON file in
+    [baremetal_benchmark]report_dir if this option is set.
+
+    :param name: the name of the report, e.g. the test class name.
+    :param data: a JSON-serializable dictionary.
+    :returns: the path to the report file or None.
+    """
+    report = dict(data, name=name,
+                  timestamp=timeutils.utcnow().isoformat())
+    serialized = json.dumps(report, indent=2, sort_keys=True)
+    LOG.info('Benchmark report %s: %s', name, serialized)
+
+    report_dir = CONF.baremetal_benchmark.report_dir
+    if not report_dir:
+        return None
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(
+        report_dir, '%s-%s.json' % (name, timeutils.utcnow().strftime(
+            '%Y%m%d%H%M%S%f')))
+    with open(path, 'w') as fp:
+        fp.write(serialized)
+    return path
@@ -0,0 +1,258 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Index of the hardware capabilities of the nodes.
+
+Some tests need specific hardware, e.g. software RAID needs at least two
+disks. Instead of picking a random node and failing late, the capabilities
+of every node are extracted from its inventory and kept in a JSON file, so
+that the matching nodes are known before any node is reserved.
+
+The file is kept between runs. On refresh, only the inventories of new nodes
+and of nodes inspected since the last refresh are downloaded, based on the
+inspection_finished_at field of the nodes.
+"""
+
+import functools
+import os
+import tempfile
+import threading
+
+from oslo_log import log
+from oslo_serialization import jsonutils as json
+from tempest import config
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.services.baremetal import base
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+# The first microversion of the inventory API.
+INVENTORY_MICROVERSION = '1.81'
+
+_LOCK = threading.Lock()
+_INDEXES = {}
+
+
+def enabled():
+    return CONF.baremetal.capability_index
+
+
+def capabilities(inventory):
+    """Extract the capabilities of a node from its inventory.
+
+    :param inventory: the inventory as returned by the agent.
+    :returns: a JSON-serializable dictionary.
+    """
+    disks = inventory.get('disks') or []
+    interfaces = inventory.get('interfaces') or []
+    cpu = inventory.get('cpu') or {}
+    boot = inventory.get('boot') or {}
+    vendor = inventory.get('system_vendor') or {}
+    return {
+        'disks': len(disks),
+        'disk_sizes': sorted((disk.get('size') or 0 for disk in disks),
+                             reverse=True),
+        'disk_models': sorted({disk['model'] for disk in disks
+                               if disk.get('model')}),
+        'rotational_disks': sum(1 for disk in disks
+                                if disk.get('rotational')),
+        'nics': len(interfaces),
+        'nics_with_carrier': sum(1 for iface in interfaces
+                                 if iface.get('has_carrier')),
+        'cpus': cpu.get('count'),
+        'cpu_arch': cpu.get('architecture'),
+        'cpu_flags': sorted(cpu.get('flags') or []),
+        'memory_mb': (inventory.get('memory') or {}).get('physical_mb'),
+        'boot_mode': boot.get('current_boot_mode'),
+        'manufacturer': vendor.get('manufacturer'),
+    }
+
+
+def matches(caps, min_disks=None, min_disk_size=None, disk_model=None,
+            min_nics=None, min_nics_with_carrier=None, cpu_flags=(),
+            cpu_arch=None, min_memory_mb=None, boot_mode=None,
+            manufacturer=None):
+    """Check whether capabilities meet the requirements.
+
+    :param caps: capabilities as returned by capabilities().
+    :param min_disks: the minimum number of disks.
+    :param min_disk_size: the minimum size in bytes of each of the
+        min_disks biggest disks, or of the biggest disk without min_disks.
+    :param disk_model: a substring of the model of at least one disk.
+    :param min_nics: the minimum number of network interfaces.
+    :param min_nics_with_carrier: the minimum number of connected network
+        interfaces.
+    :param cpu_flags: CPU flags that must all be present.
+    :param cpu_arch: the CPU architecture.
+    :param min_memory_mb: the minimum amount of memory.
+    :param boot_mode: the boot mode the node booted the agent in.
+    :param manufacturer: a substring of the system manufacturer.
+    :returns: a boolean.
+    """
+    if min_disks and caps['disks'] < min_disks:
+        return False
+    if min_disk_size:
+        sizes = caps['disk_sizes'][:min_disks or 1]
+        if not sizes or sizes[-1] < min_disk_size:
+            return False
+    if disk_model and not any(disk_model.lower() in model.lower()
+                              for model in caps['disk_models']):
+        return False
+    if min_nics and caps['nics'] < min_nics:
+        return False
+    if (min_nics_with_carrier
+            and caps['nics_with_carrier'] < min_nics_with_carrier):
+        return False
+    if not set(cpu_flags).issubset(caps['cpu_flags']):
+        return False
+    if cpu_arch and caps['cpu_arch'] != cpu_arch:
+        return False
+    if min_memory_mb and (caps['memory_mb'] or 0) < min_memory_mb:
+        return False
+    if boot_mode and caps['boot_mode'] != boot_mode:
+        return False
+    if manufacturer and manufacturer.lower() not in (
+            caps['manufacturer'] or '').lower():
+        return False
+    return True
+
+
+class CapabilityIndex(object):
+    """Capabilities of the nodes, optionally persisted in a JSON file.
+
+    :param path: the JSON file to keep the index in, or None.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        # UUID to a dictionary with the timestamp and the capabilities,
+        # which are None for nodes without an inventory.
+        self._data = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as fp:
+                    self._data = json.loads(fp.read())
+            except ValueError:
+                LOG.warning('Ignoring the corrupted capability index %s',
+                            path)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _save(self):
+        if not self.path:
+            return
+        # Several workers may share the file, replace it atomically.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write(json.dumps(self._data, indent=2, sort_keys=True))
+        os.replace(tmp, self.path)
+
+    def _fetch(self, client, node):
+        if not node['inspection_finished_at']:
+            # Nodes that were never inspected have no inventory.
+            return node['uuid'], {'timestamp': None, 'capabilities': None}
+        try:
+            inventory = client.show_inventory(
+                node['uuid'], api_version=INVENTORY_MICROVERSION)['inventory']
+        except lib_exc.NotFound:
+            caps = None
+        else:
+            caps = capabilities(inventory)
+        return node['uuid'], {'timestamp': node['inspection_finished_at'],
+                              'capabilities': caps}
+
+    def refresh(self, client, concurrency=None):
+        """Update the index with the current inventories.
+
+        Only the inventories of new nodes and of nodes inspected since the
+        previous refresh are downloaded.
+
+        :param client: an instance of tempest plugin BaremetalClient.
+        :param concurrency: how many inventories are downloaded in parallel.
+        :returns: the number of updated nodes.
+        """
+        with base.microversion_at_least(INVENTORY_MICROVERSION):
+            nodes = utils.list_all_nodes(
+                client, fields='uuid,inspection_finished_at')
+        with self._lock:
+            removed = set(self._data) - {node['uuid'] for node in nodes}
+            for uuid in removed:
+                del self._data[uuid]
+            stale = [node for node in nodes
+                     if node['uuid'] not in self._data
+                     or (self._data[node['uuid']]['timestamp']
+                         != node['inspection_finished_at'])]
+        fetched = utils.run_concurrently(
+            functools.partial(self._fetch, client), stale,
+            concurrency or CONF.baremetal.capability_index_concurrency)
+        with self._lock:
+            self._data.update(fetched)
+            if fetched or removed:
+                self._save()
+        LOG.debug('Refreshed the capabilities of %d of %d nodes',
+                  len(fetched), len(nodes))
+        return len(fetched)
+
+    def get(self, node_id):
+        """Get the capabilities of a node or None if they are unknown."""
+        with self._lock:
+            return (self._data.get(node_id) or {}).get('capabilities')
+
+    def unknown(self):
+        """Get the nodes without known capabilities, e.g. never inspected.
+
+        :returns: a set of node UUIDs.
+        """
+        with self._lock:
+            return {uuid for uuid, item in self._data.items()
+                    if item['capabilities'] is None}
+
+    def query(self, **requirements):
+        """Get the nodes known to match the requirements.
+
+        :param requirements: the requirements, see matches().
+        :returns: a set of node UUIDs.
+        """
+        with self._lock:
+            return {uuid for uuid, item in self._data.items()
+                    if item['capabilities'] is not None
+                    and matches(item['capabilities'], **requirements)}
+
+
+def _default_path():
+    return (CONF.baremetal.capability_index_file
+            or os.path.join(tempfile.gettempdir(),
+                            'ironic-tempest-capabilities.json'))
+
+
+def get_index(client):
+    """Get the refreshed capability index shared by a worker.
+
+    The index is refreshed once per worker process.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    """
+    path = _default_path()
+    with _LOCK:
+        if path not in _INDEXES:
+            index = CapabilityIndex(path)
+            index.refresh(client)
+            _INDEXES[path] = index
+        return _INDEXES[path]
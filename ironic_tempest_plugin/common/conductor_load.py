@@ -0,0 +1,141 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Spreading of the test operations between the conductors.
+
+Picking nodes at random often makes parallel deployments land on the same
+conductor while others are idle. With [baremetal]conductor_aware_selection
+enabled, the candidate nodes are weighted by the load of the conductor
+managing them: the number of nodes the conductor is busy with, e.g.
+deploying or cleaning, plus the operations the tests of this worker have
+started on it and not finished yet.
+
+Counting the busy nodes requires listing all nodes, so the counts are cached
+by every worker for BUSY_NODES_TTL seconds. The operations of the worker
+itself are always up to date.
+"""
+
+import collections
+import random
+import threading
+import time
+
+from tempest import config
+
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.services.baremetal import base
+
+CONF = config.CONF
+
+# The first microversion exposing the conductor of a node.
+CONDUCTOR_MICROVERSION = '1.49'
+
+# Provision states in which the conductor is working on the node.
+BUSY_STATES = frozenset([
+    'deploying', 'wait call-back', 'cleaning', 'clean wait', 'inspecting',
+    'inspect wait', 'deleting', 'rescuing', 'rescue wait', 'unrescuing',
+    'servicing', 'service wait', 'adopting', 'verifying',
+])
+
+# How long the busy node counts of the conductors are reused.
+BUSY_NODES_TTL = 30
+
+_IN_FLIGHT = collections.Counter()
+_LOCK = threading.Lock()
+# A tuple (expiry time, busy node counts).
+_BUSY_NODES = None
+
+
+def enabled():
+    return CONF.baremetal.conductor_aware_selection
+
+
+def begin(conductor):
+    """Record an operation started by the tests on a conductor."""
+    if conductor:
+        with _LOCK:
+            _IN_FLIGHT[conductor] += 1
+
+
+def end(conductor):
+    """Record the end of an operation started with begin."""
+    if conductor:
+        with _LOCK:
+            if _IN_FLIGHT[conductor] > 0:
+                _IN_FLIGHT[conductor] -= 1
+
+
+def in_flight():
+    with _LOCK:
+        return dict(+_IN_FLIGHT)
+
+
+def busy_nodes(client):
+    """Count the nodes every conductor is busy with.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :returns: a Counter mapping conductor host names to the number of nodes
+        in one of the BUSY_STATES. Alive conductors without busy nodes are
+        included with a count of 0.
+    """
+    with base.microversion_at_least(CONDUCTOR_MICROVERSION):
+        nodes = utils.list_all_nodes(client,
+                                     fields='conductor,provision_state')
+        _, conductors = client.list_conductors(fields='hostname,alive')
+    counts = collections.Counter(
+        {conductor['hostname']: 0 for conductor in conductors['conductors']
+         if conductor.get('alive', True)})
+    for node in nodes:
+        if node.get('conductor') and node['provision_state'] in BUSY_STATES:
+            counts[node['conductor']] += 1
+    return counts
+
+
+def _cached_busy_nodes(client):
+    global _BUSY_NODES
+    with _LOCK:
+        cached = _BUSY_NODES
+    if cached is not None and cached[0] > time.monotonic():
+        return collections.Counter(cached[1])
+    counts = busy_nodes(client)
+    with _LOCK:
+        _BUSY_NODES = (time.monotonic() + BUSY_NODES_TTL, counts)
+    return collections.Counter(counts)
+
+
+def loads(client):
+    """Get the load of every conductor.
+
+    The busy node counts may be up to BUSY_NODES_TTL seconds old.
+    """
+    counts = _cached_busy_nodes(client)
+    counts.update(in_flight())
+    return counts
+
+
+def choose(nodes, conductor_loads, rand=random):
+    """Pick a node, preferring the nodes of the least loaded conductors.
+
+    Every node is weighted by 1 / (1 + load of its conductor), so that nodes
+    of idle conductors are the most likely, while concurrent workers still
+    pick different nodes.
+
+    :param nodes: a list of candidate nodes with the conductor field.
+    :param conductor_loads: a mapping of conductor host names to loads.
+    :param rand: the random number generator to use.
+    :returns: a node or None if there are no candidates.
+    """
+    if not nodes:
+        return None
+    weights = [1.0 / (1 + conductor_loads.get(node.get('conductor'), 0))
+               for node in nodes]
+    return rand.choices(nodes, weights=weights)[0]
@@ -0,0 +1,127 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Verification of the connectivity between many instances at once.
+
+Every source instance pings all its destinations in parallel with a single
+remote command per attempt, and all sources are checked at the same time, so
+adding instances or tenants does not multiply the verification time.
+Destinations are retried until they match the expectation or the time runs
+out, since a couple of pings may be lost until the ARP tables are populated.
+"""
+
+import threading
+
+from oslo_log import log
+
+from ironic_tempest_plugin.common import utils
+
+LOG = log.getLogger(__name__)
+
+PING_COUNT = 4
+PING_DEADLINE = 4
+
+
+def ping_command(destinations, count=PING_COUNT, deadline=PING_DEADLINE):
+    """Build a shell command pinging all destinations in parallel.
+
+    Every output line of ping is prefixed with its destination, so that the
+    outputs of the parallel pings can be told apart.
+
+    :param destinations: IP addresses to ping.
+    :returns: the command as a string.
+    """
+    parts = ['(ping %(ip)s -c%(count)d -w%(deadline)d 2>&1 | '
+             'while read line; do echo "%(ip)s $line"; done) &'
+             % {'ip': ip, 'count': count, 'deadline': deadline}
+             for ip in destinations]
+    return ' '.join(parts + ['wait'])
+
+
+def parse_output(output, destinations):
+    """Parse the output of ping_command.
+
+    A destination is reachable if at least one reply was received, since
+    the first pings may be lost until the ARP tables are populated and the
+    exit status of ping differs between implementations.
+
+    :param output: the output of ping_command.
+    :param destinations: the IP addresses that were pinged.
+    :returns: a dictionary mapping destinations to whether they answered.
+    """
+    result = dict.fromkeys(destinations, False)
+    for line in output.splitlines():
+        destination, _, rest = line.partition(' ')
+        if (destination in result
+                and ' bytes from %s' % destination in rest):
+            result[destination] = True
+    return result
+
+
+def mismatches(matrix, expected):
+    """Compare a reachability matrix with the expectations.
+
+    :param matrix: a matrix as returned by check_matrix.
+    :param expected: a dictionary mapping (source, destination) tuples to
+        whether the destination must be reachable from the source.
+    :returns: a sorted list of (source, destination, expected, actual)
+        tuples, actual is None if the destination was never checked.
+    """
+    result = []
+    for (source, destination), reachable in sorted(expected.items()):
+        actual = matrix.get(source, {}).get(destination)
+        if actual is not reachable:
+            result.append((source, destination, reachable, actual))
+    return result
+
+
+def check_matrix(get_client, sources, expected, timeout=15, interval=1):
+    """Check the reachability of destinations from several sources.
+
+    :param get_client: a callable returning a remote client with an
+        exec_command method for a source.
+    :param sources: a dictionary mapping source names to the objects
+        passed to get_client.
+    :param expected: a dictionary mapping (source name, destination IP)
+        tuples to whether the destination must be reachable.
+    :param timeout: how long to retry the destinations not matching the
+        expectations yet.
+    :param interval: the delay between the attempts.
+    :returns: the reachability matrix, a dictionary mapping source names to
+        dictionaries mapping destinations to the last observed reachability.
+    """
+    matrix = {name: {} for name in sources}
+    lock = threading.Lock()
+
+    def _check_source(name):
+        pending = {destination for source, destination in expected
+                   if source == name}
+        if not pending:
+            return
+        client = get_client(sources[name])
+
+        def _attempt():
+            destinations = sorted(pending)
+            output = client.exec_command(ping_command(destinations))
+            results = parse_output(output, destinations)
+            LOG.debug('Reachability from %s: %s', name, results)
+            with lock:
+                matrix[name].update(results)
+            for destination, reachable in results.items():
+                if expected[name, destination] == reachable:
+                    pending.discard(destination)
+            return not pending
+
+        utils.call_until_true(_attempt, timeout, interval)
+
+    utils.run_concurrently(_check_source, list(sources), len(sources))
+    return matrix
@@ -0,0 +1,329 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A local process impersonating ironic-python-agent.
+
+Booting a real ramdisk takes minutes before the first heartbeat. The fake
+agent instead looks the node up, heartbeats with the agent token and serves
+the agent command API, completing deploy and clean steps instantly or after a
+configurable delay. Nodes using it need fake power and boot interfaces and a
+deploy interface talking to the agent, e.g. direct, so that the conductor
+side deploy and clean orchestration can be exercised at high volume.
+
+The conductor must be able to reach the fake agent on
+[baremetal]fake_agent_address.
+"""
+
+from http import server
+import threading
+from urllib import parse as urllib_parse
+
+from oslo_log import log
+from oslo_serialization import jsonutils as json
+from oslo_utils import uuidutils
+from tempest import config
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import timing
+from ironic_tempest_plugin.services.baremetal import base
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+# Agent tokens are returned by the lookup API starting with 1.62.
+AGENT_MICROVERSION = '1.62'
+
+# The lookup API hides tokens that have already been handed out.
+REDACTED_TOKEN = '******'
+
+HARDWARE_MANAGER = 'GenericHardwareManager'
+HARDWARE_MANAGER_VERSION = {'generic_hardware_manager': '1.2'}
+
+# Steps reported to the conductor, the same as the ones of the generic
+# hardware manager that are enabled by default.
+CLEAN_STEPS = [
+    {'step': 'erase_devices_metadata', 'priority': 99,
+     'interface': 'deploy', 'reboot_requested': False, 'abortable': True},
+    {'step': 'erase_devices', 'priority': 10, 'interface': 'deploy',
+     'reboot_requested': False, 'abortable': True},
+]
+DEPLOY_STEPS = [
+    {'step': 'write_image', 'priority': 0, 'interface': 'deploy',
+     'reboot_requested': False, 'argsinfo': None},
+]
+
+SUCCEEDED = 'SUCCEEDED'
+RUNNING = 'RUNNING'
+FAILED = 'FAILED'
+
+
+class Command(object):
+    """A command sent to the agent by the conductor."""
+
+    def __init__(self, name, params):
+        self.id = uuidutils.generate_uuid()
+        self.name = name
+        self.params = params
+        self.status = RUNNING
+        self.result = None
+        self.error = None
+
+    def as_dict(self):
+        # The agent reports the commands without their extension, e.g.
+        # execute_clean_step for clean.execute_clean_step.
+        return {'id': self.id,
+                'command_name': self.name.rpartition('.')[2],
+                'command_params': self.params,
+                'command_status': self.status,
+                'command_result': self.result,
+                'command_error': self.error}
+
+
+class FakeAgent(object):
+    """A fake agent of a single node.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param node_uuid: UUID of the node.
+    :param address: the address the conductor reaches the agent on.
+    :param port: the port to listen on, 0 picks a free one.
+    :param command_delay: seconds it takes to complete an asynchronous
+        command such as a deploy or clean step.
+    :param heartbeat_interval: seconds between heartbeats.
+    :param agent_version: the agent version reported in the heartbeats.
+    :param fail_steps: names of steps that fail.
+    """
+
+    def __init__(self, client, node_uuid, address=None, port=0,
+                 command_delay=None, heartbeat_interval=None,
+                 agent_version='9.0.0', fail_steps=()):
+        opts = CONF.baremetal
+        self.client = client
+        self.node_uuid = node_uuid
+        self.address = address or opts.fake_agent_address
+        self.command_delay = (opts.fake_agent_command_delay
+                              if command_delay is None else command_delay)
+        self.heartbeat_interval = (opts.fake_agent_heartbeat_interval
+                                   if heartbeat_interval is None
+                                   else heartbeat_interval)
+        self.agent_version = agent_version
+        self.fail_steps = set(fail_steps)
+        self.token = None
+        self.commands = []
+        self.heartbeats = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = server.ThreadingHTTPServer(('', port),
+                                                  self._handler_class())
+        self._server.daemon_threads = True
+        self._threads = []
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def callback_url(self):
+        host = self.address
+        if ':' in host:
+            host = '[%s]' % host
+        return 'http://%s:%d' % (host, self.port)
+
+    def start(self):
+        """Start serving the command API and heartbeating."""
+        for target in (self._server.serve_forever, self._heartbeat_loop):
+            thread = threading.Thread(target=target, daemon=True,
+                                      name='fake-agent-%s' % self.node_uuid)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Heartbeats
+
+    def _lookup(self):
+        try:
+            with base.microversion_at_least(AGENT_MICROVERSION):
+                _, body = self.client.ipa_lookup(node_uuid=self.node_uuid)
+        except lib_exc.NotFound:
+            # The lookup only works in the states the agent is expected in.
+            return False
+        token = body.get('config', {}).get('agent_token')
+        if token and token != REDACTED_TOKEN:
+            self.token = token
+        interval = body.get('config', {}).get('heartbeat_timeout')
+        if interval and not self.heartbeat_interval:
+            self.heartbeat_interval = interval / 2
+        return True
+
+    def heartbeat(self):
+        """Heartbeat once, looking the node up first if needed.
+
+        :returns: whether the heartbeat was accepted.
+        """
+        if self.token is None and not self._lookup():
+            return False
+        try:
+            with base.microversion_at_least(AGENT_MICROVERSION):
+                self.client.ipa_heartbeat(
+                    self.node_uuid, callback_url=self.callback_url,
+                    agent_token=self.token,
+                    agent_version=self.agent_version)
+        except (lib_exc.Conflict, lib_exc.NotFound) as exc:
+            # The node is locked or not waiting for the agent.
+            LOG.debug('Heartbeat of node %s not accepted: %s',
+                      self.node_uuid, exc)
+            return False
+        except (lib_exc.BadRequest, lib_exc.Unauthorized):
+            # The token is reset when the node leaves the ramdisk.
+            self.token = None
+            return False
+        with self._lock:
+            self.heartbeats += 1
+        return True
+
+    def _heartbeat_loop(self):
+        while not self._stopped.is_set():
+            try:
+                self.heartbeat()
+            except Exception:
+                LOG.exception('Heartbeat of node %s failed', self.node_uuid)
+            self._stopped.wait(self.heartbeat_interval or 1)
+
+    # Command API
+
+    def _complete(self, command, result):
+        step = (command.params.get('step') or {}).get('step')
+        if step in self.fail_steps:
+            command.status, command.error = FAILED, {
+                'type': 'CommandExecutionError',
+                'message': 'Step %s failed on purpose' % step}
+        else:
+            command.status, command.result = SUCCEEDED, result
+        # Like the real agent, report the result right away.
+        if command.name.endswith('execute_clean_step') or \
+                command.name.endswith('execute_deploy_step'):
+            try:
+                self.heartbeat()
+            except Exception:
+                LOG.exception('Heartbeat of node %s failed', self.node_uuid)
+
+    def _result(self, command):
+        params = command.params
+        name = command.name
+        if name == 'clean.get_clean_steps':
+            return {'clean_steps': {HARDWARE_MANAGER: CLEAN_STEPS},
+                    'hardware_manager_version': HARDWARE_MANAGER_VERSION}
+        if name == 'deploy.get_deploy_steps':
+            return {'deploy_steps': {HARDWARE_MANAGER: DEPLOY_STEPS},
+                    'hardware_manager_version': HARDWARE_MANAGER_VERSION}
+        if name == 'clean.execute_clean_step':
+            return {'clean_result': None, 'clean_step': params.get('step')}
+        if name == 'deploy.execute_deploy_step':
+            return {'deploy_result': None, 'deploy_step': params.get('step')}
+        if name == 'standby.get_partition_uuids':
+            return {'root uuid': None}
+        return None
+
+    def execute(self, name, params, wait=False):
+        """Execute a command.
+
+        Synchronous commands and commands with wait complete immediately,
+        the others after the command delay.
+        """
+        command = Command(name, params)
+        with self._lock:
+            self.commands.append(command)
+        result = self._result(command)
+        asynchronous = name.endswith('execute_clean_step') or \
+            name.endswith('execute_deploy_step')
+        if wait or not asynchronous or not self.command_delay:
+            if asynchronous and self.command_delay:
+                timing.sleep(self.command_delay)
+            self._complete(command, result)
+        else:
+            timer = threading.Timer(self.command_delay, self._complete,
+                                    (command, result))
+            timer.daemon = True
+            timer.start()
+        return command
+
+    def _handler_class(self):
+        agent = self
+
+        class Handler(server.BaseHTTPRequestHandler):
+
+            def log_message(self, fmt, *args):
+                LOG.debug('Fake agent of node %s: ' + fmt, agent.node_uuid,
+                          *args)
+
+            def _reply(self, status, body=None):
+                data = json.dump_as_bytes(body) if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _authorized(self, query):
+                token = query.get('agent_token', [None])[0]
+                if agent.token and token != agent.token:
+                    self._reply(401, {'faultstring': 'Invalid agent token'})
+                    return False
+                return True
+
+            def do_GET(self):
+                url = urllib_parse.urlparse(self.path)
+                query = urllib_parse.parse_qs(url.query)
+                path = url.path.rstrip('/')
+                if path == '/v1/status':
+                    return self._reply(200, {'version': agent.agent_version})
+                if not self._authorized(query):
+                    return
+                with agent._lock:
+                    commands = [cmd.as_dict() for cmd in agent.commands]
+                if path == '/v1/commands':
+                    return self._reply(200, {'commands': commands})
+                if path.startswith('/v1/commands/'):
+                    ident = path.rsplit('/', 1)[1]
+                    for command in commands:
+                        if command['id'] == ident:
+                            return self._reply(200, command)
+                return self._reply(404, {'faultstring': 'Not found'})
+
+            def do_POST(self):
+                url = urllib_parse.urlparse(self.path)
+                query = urllib_parse.parse_qs(url.query)
+                if url.path.rstrip('/') != '/v1/commands':
+                    return self._reply(404, {'faultstring': 'Not found'})
+                if not self._authorized(query):
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                wait = query.get('wait', ['false'])[0].lower() == 'true'
+                command = agent.execute(body.get('name'),
+                                        body.get('params') or {}, wait=wait)
+                self._reply(200, command.as_dict())
+
+        return Handler
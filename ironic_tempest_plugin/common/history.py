@@ -0,0 +1,447 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Persistent history of the durations of bare metal operations.
+
+When [baremetal]history_db is set, every wait of wait_for_bm_node_status and
+every state changing request of the bare metal client is appended to an
+SQLite database, together with the driver and interfaces of the node, the API
+microversion, the duration and the outcome. The database is kept between runs
+and shared by the workers, so that the durations of the same operations can
+be compared across upgrades with::
+
+    python -m ironic_tempest_plugin.common.history <history_db> percentiles
+    python -m ironic_tempest_plugin.common.history <history_db> trends
+
+The Ironic version is identified by the maximum API microversion of the
+deployment, since every release adds at least one microversion.
+"""
+
+import argparse
+import atexit
+import collections
+import contextlib
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+import time
+from urllib import parse as urllib_parse
+
+from oslo_log import log
+from tempest import config
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import benchmark
+from ironic_tempest_plugin.common import throttle
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at REAL NOT NULL,
+    operation TEXT NOT NULL,
+    driver TEXT,
+    interfaces TEXT,
+    node TEXT,
+    microversion TEXT,
+    ironic_version TEXT,
+    duration REAL NOT NULL,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS operations_by_operation
+    ON operations (operation, recorded_at);
+"""
+
+COLUMNS = ('recorded_at', 'operation', 'driver', 'interfaces', 'node',
+           'microversion', 'ironic_version', 'duration', 'outcome')
+GROUP_FIELDS = ('operation', 'driver', 'interfaces', 'node', 'microversion',
+                'ironic_version', 'outcome')
+
+# The interfaces recorded for every node, the same as in the combinations of
+# the timelines.
+INTERFACE_FIELDS = ('boot_interface', 'deploy_interface', 'network_interface',
+                    'power_interface')
+
+SUCCESS = 'success'
+
+# Records are written in batches to keep the database out of the way of the
+# tests.
+FLUSH_SIZE = 50
+
+# Collections of the API whose next path segment is an identifier.
+_COLLECTIONS = frozenset(['nodes', 'ports', 'portgroups', 'chassis',
+                          'allocations', 'deploy_templates', 'runbooks',
+                          'conductors', 'drivers', 'connectors', 'targets',
+                          'vifs', 'traits', 'inspection_rules'])
+
+_LOCK = threading.Lock()
+_HISTORY = None
+_IRONIC_VERSION = {}
+
+
+def enabled():
+    return bool(CONF.baremetal.history_db)
+
+
+def operation_name(method, url):
+    """Get the operation name of a request with the identifiers removed.
+
+    :param method: the HTTP method.
+    :param url: the URL of the request.
+    :returns: a string like ``PUT /nodes/*/states/provision``.
+    """
+    path = url.split('?', 1)[0].split('/v1/', 1)[-1].strip('/')
+    segments = path.split('/')
+    for index in range(1, len(segments)):
+        if segments[index - 1] in _COLLECTIONS:
+            segments[index] = '*'
+    return '%s /%s' % (method, '/'.join(segments))
+
+
+def _node_from_url(url):
+    segments = url.split('?', 1)[0].split('/')
+    if 'nodes' in segments:
+        index = segments.index('nodes') + 1
+        if index < len(segments):
+            return segments[index]
+
+
+def _ironic_version(client):
+    key = client.base_url
+    if key not in _IRONIC_VERSION:
+        try:
+            _IRONIC_VERSION[key] = client.get_min_max_api_microversions()[1]
+        except Exception as exc:
+            # Called while handling the errors of other requests, must not
+            # replace them.
+            LOG.debug('Cannot fetch the API version for the history: %s',
+                      exc)
+            _IRONIC_VERSION[key] = None
+    return _IRONIC_VERSION[key]
+
+
+class History(object):
+    """An append-only store of operation durations.
+
+    :param path: the SQLite database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        # Several workers may write at the same time, wait for their locks.
+        conn = sqlite3.connect(self.path, timeout=60)
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    def add(self, operation, duration, outcome, node=None, driver=None,
+            interfaces=None, microversion=None, ironic_version=None):
+        """Add a record, it is written on the next flush.
+
+        :param operation: the name of the operation.
+        :param duration: the duration in seconds.
+        :param outcome: SUCCESS or the reason of the failure.
+        """
+        row = (time.time(), operation, driver, interfaces, node,
+               microversion, ironic_version, duration, outcome)
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= FLUSH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        try:
+            with contextlib.closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    'INSERT INTO operations (%s) VALUES (%s)'
+                    % (', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))),
+                    rows)
+        except sqlite3.Error as exc:
+            # The history must never fail the tests.
+            LOG.warning('Cannot write %d records to the history %s: %s',
+                        len(rows), self.path, exc)
+
+
+def get():
+    """Get the history of this process or None if it is disabled."""
+    global _HISTORY
+    if not enabled():
+        return None
+    with _LOCK:
+        if _HISTORY is None:
+            _HISTORY = History(CONF.baremetal.history_db)
+            atexit.register(_HISTORY.flush)
+        return _HISTORY
+
+
+def record_wait(client, node, operation, duration, outcome,
+                microversion=None):
+    """Record a wait on a node.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param node: the last observed node or its identifier.
+    :param operation: the name of the operation.
+    :param duration: the duration in seconds.
+    :param outcome: SUCCESS or the reason of the failure.
+    :param microversion: the API microversion used.
+    """
+    history = get()
+    if history is None:
+        return
+    if not isinstance(node, dict):
+        node = {'uuid': node}
+    interfaces = None
+    if node.get('driver'):
+        interfaces = '/'.join(node.get(field) or '-'
+                              for field in INTERFACE_FIELDS)
+    history.add(operation, duration, outcome, node=node.get('uuid'),
+                driver=node.get('driver'), interfaces=interfaces,
+                microversion=microversion,
+                ironic_version=_ironic_version(client))
+
+
+@contextlib.contextmanager
+def request(client, method, url, microversion=None):
+    """Record a state changing request made in the wrapped block.
+
+    Reads are not recorded, polling is covered by the waits.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param method: the HTTP method.
+    :param url: the URL of the request.
+    :param microversion: the API microversion used.
+    :returns: a dictionary, the ``status`` key should be set to the HTTP
+        status of the response.
+    """
+    result = {}
+    if not enabled() or throttle.classify(method, url) == throttle.READ:
+        yield result
+        return
+
+    start = time.monotonic()
+    try:
+        yield result
+    except lib_exc.RestClientException as exc:
+        result['status'] = getattr(exc.resp, 'status', None)
+        raise
+    finally:
+        duration = time.monotonic() - start
+        status = result.get('status')
+        outcome = (SUCCESS if status is not None and int(status) < 400
+                   else str(status or 'error'))
+        get().add(operation_name(method, url), duration, outcome,
+                  node=_node_from_url(url), microversion=microversion,
+                  ironic_version=_ironic_version(client))
+
+
+def load(path, operation=None, days=None):
+    """Load records from a history database.
+
+    :param path: the SQLite database file.
+    :param operation: an SQL LIKE pattern the operations must match.
+    :param days: only load records of the last days.
+    :returns: a list of dictionaries.
+    :raises: ValueError if the database does not exist.
+    """
+    if not os.path.isfile(path):
+        raise ValueError('History database %s does not exist' % path)
+    query = 'SELECT %s FROM operations WHERE 1=1' % ', '.join(COLUMNS)
+    params = []
+    if operation:
+        query += ' AND operation LIKE ?'
+        params.append(operation)
+    if days:
+        query += ' AND recorded_at >= ?'
+        params.append(time.time() - days * 86400)
+    # Read-only, so that a wrong path never creates a database.
+    uri = 'file:%s?mode=ro' % urllib_parse.quote(os.path.abspath(path))
+    with contextlib.closing(sqlite3.connect(uri, uri=True)) as conn:
+        rows = conn.execute(query + ' ORDER BY recorded_at', params)
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def _stats(records):
+    samples = sorted(item['duration'] for item in records
+                     if item['outcome'] == SUCCESS)
+    return {
+        'count': len(records),
+        'failures': len(records) - len(samples),
+        'p50': benchmark.percentile(samples, 50),
+        'p90': benchmark.percentile(samples, 90),
+        'p99': benchmark.percentile(samples, 99),
+        'max': samples[-1] if samples else None,
+    }
+
+
+def percentiles(records, by=('operation', 'driver')):
+    """Calculate duration statistics per group.
+
+    Only successful operations contribute to the durations.
+
+    :param records: records as returned by load().
+    :param by: the fields to group by.
+    :returns: a dictionary mapping tuples of the group values to
+        dictionaries with count, failures, p50, p90, p99 and max.
+    """
+    groups = collections.defaultdict(list)
+    for item in records:
+        groups[tuple(item[field] for field in by)].append(item)
+    return {key: _stats(items) for key, items in groups.items()}
+
+
+def _version_key(version):
+    try:
+        return (0,) + tuple(int(part) for part in version.split('.'))
+    except (AttributeError, ValueError):
+        return (1, str(version))
+
+
+def trends(records, period='version', by=('operation', 'driver'),
+           threshold=20.0):
+    """Follow the median duration of every group over time.
+
+    :param records: records as returned by load().
+    :param period: ``version`` to compare Ironic versions, ``day`` to
+        compare days.
+    :param by: the fields to group by.
+    :param threshold: the increase of the median in percent that is
+        considered a regression.
+    :returns: a dictionary mapping tuples of the group values to lists of
+        (period, stats, change in percent or None, regression) tuples in
+        chronological order.
+    """
+    groups = collections.defaultdict(lambda: collections.defaultdict(list))
+    for item in records:
+        if period == 'day':
+            key = datetime.datetime.fromtimestamp(
+                item['recorded_at'], datetime.timezone.utc).date().isoformat()
+        else:
+            key = item['ironic_version']
+        groups[tuple(item[field] for field in by)][key].append(item)
+
+    result = {}
+    for group, periods in groups.items():
+        rows = []
+        previous = None
+        for key in sorted(periods, key=_version_key):
+            stats = _stats(periods[key])
+            change = None
+            if previous and stats['p50'] is not None:
+                change = 100.0 * (stats['p50'] - previous) / previous
+            rows.append((key, stats, change,
+                         change is not None and change > threshold))
+            if stats['p50']:
+                previous = stats['p50']
+        result[group] = rows
+    return result
+
+
+def _format(value):
+    return '-' if value is None else '%.1f' % value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Query the history of the operation durations recorded '
+                    'by the bare metal tempest plugin.')
+    parser.add_argument('history_db',
+                        help='the value of [baremetal]history_db')
+    parser.add_argument('--operation',
+                        help='only include operations matching this SQL '
+                             'LIKE pattern, e.g. "wait:provision_state%%"')
+    parser.add_argument('--days', type=float,
+                        help='only include the records of the last days')
+    parser.add_argument('--by', default='operation,driver',
+                        help='comma-separated fields to group by, out of '
+                             '%s' % ', '.join(GROUP_FIELDS))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('percentiles',
+                          help='duration percentiles per group')
+    trends_parser = subparsers.add_parser(
+        'trends', help='median durations per Ironic version or day')
+    trends_parser.add_argument('--period', choices=('version', 'day'),
+                               default='version')
+    trends_parser.add_argument('--threshold', type=float, default=20.0,
+                               help='the increase of the median in percent '
+                                    'reported as a regression')
+    trends_parser.add_argument('--check', action='store_true',
+                               help='exit with an error if the latest '
+                                    'period of any group regressed')
+    args = parser.parse_args(argv)
+
+    by = tuple(field.strip() for field in args.by.split(','))
+    unknown = set(by) - set(GROUP_FIELDS)
+    if unknown:
+        parser.error('Cannot group by %s' % ', '.join(sorted(unknown)))
+
+    try:
+        records = load(args.history_db, args.operation, args.days)
+    except (ValueError, sqlite3.Error) as exc:
+        sys.exit(str(exc))
+    if not records:
+        sys.exit('No records found in %s' % args.history_db)
+
+    if args.command == 'percentiles':
+        row = '%6s %6s %9s %9s %9s %9s  %s\n'
+        sys.stdout.write(row % ('count', 'failed', 'p50', 'p90', 'p99',
+                                'max', '/'.join(by)))
+        for key, stats in sorted(percentiles(records, by).items(),
+                                 key=lambda item: str(item[0])):
+            sys.stdout.write(row % (
+                stats['count'], stats['failures'], _format(stats['p50']),
+                _format(stats['p90']), _format(stats['p99']),
+                _format(stats['max']), '/'.join(str(v) for v in key)))
+        return
+
+    regressions = []
+    row = '  %-12s %6s %6s %9s %9s %8s%s\n'
+    for key, rows in sorted(trends(records, args.period, by,
+                                   args.threshold).items(),
+                            key=lambda item: str(item[0])):
+        sys.stdout.write('%s\n' % '/'.join(str(v) for v in key))
+        sys.stdout.write(row % (args.period, 'count', 'failed', 'p50',
+                                'p90', 'change', ''))
+        for period, stats, change, regressed in rows:
+            sys.stdout.write(row % (
+                period, stats['count'], stats['failures'],
+                _format(stats['p50']), _format(stats['p90']),
+                '-' if change is None else '%+.0f%%' % change,
+                '  REGRESSION' if regressed else ''))
+        if rows[-1][3]:
+            regressions.append(key)
+        sys.stdout.write('\n')
+
+    if args.check and regressions:
+        sys.exit('%d groups regressed in the latest %s'
+                 % (len(regressions), args.period))
+
+
+if __name__ == '__main__':
+    main()
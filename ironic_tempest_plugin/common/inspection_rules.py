@@ -0,0 +1,583 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Offline evaluation of introspection and inspection rules.
+
+Two formats are understood:
+
+* ironic-inspector introspection rules, with conditions like
+  ``{"op": "ge", "field": "memory_mb", "value": 256}`` and actions like
+  ``{"action": "set-attribute", "path": "/extra/foo", "value": "bar"}``;
+* ironic inspection rules, with conditions like
+  ``{"op": "eq", "args": ["{inventory.cpu.count}", 8]}`` and actions like
+  ``{"op": "set-attribute", "args": ["/extra/foo", "bar"]}``.
+
+Rules are compiled once and then evaluated against many recorded
+introspection data or inventories at the same time: every condition is
+applied to all data sets that are still matching before the next condition is
+looked at. Only the node is simulated, nothing is sent to any service.
+
+The rules in a file can be tried against recorded data with::
+
+    python -m ironic_tempest_plugin.common.inspection_rules RULES DATA...
+"""
+
+import argparse
+import copy
+import ipaddress
+import re
+import string
+import sys
+
+from oslo_serialization import jsonutils as json
+
+from ironic_tempest_plugin import exceptions
+
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _contains(value, pattern):
+    if isinstance(value, str):
+        return re.search(pattern, value) is not None
+    return pattern in value
+
+
+def _in_net(value, network):
+    try:
+        return (ipaddress.ip_address(value)
+                in ipaddress.ip_network(network, strict=False))
+    except ValueError:
+        return False
+
+
+def _is_ip(value):
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+# Operation name -> (number of arguments, implementation)
+OPS = {
+    'eq': (2, lambda value, other: value == other),
+    'ne': (2, lambda value, other: value != other),
+    'lt': (2, lambda value, other: value < other),
+    'le': (2, lambda value, other: value <= other),
+    'gt': (2, lambda value, other: value > other),
+    'ge': (2, lambda value, other: value >= other),
+    'contains': (2, _contains),
+    'matches': (2, lambda value, pattern: re.fullmatch(pattern, str(value))
+                is not None),
+    'one-of': (2, lambda value, values: value in values),
+    'in-net': (2, _in_net),
+    'is-true': (1, lambda value: value is True
+                or str(value).lower() in ('true', 'yes', '1')),
+    'is-false': (1, lambda value: value is False
+                 or str(value).lower() in ('false', 'no', '0')),
+    'is-none': (1, lambda value: value is None),
+    'is-empty': (1, _is_empty),
+    'is-ip': (1, _is_ip),
+}
+
+# Action name -> its arguments. The inspector format uses the names, the
+# inspection rules format accepts them positionally as well.
+ACTIONS = {
+    'set-attribute': ('path', 'value'),
+    'extend-attribute': ('path', 'value'),
+    'del-attribute': ('path',),
+    'add-trait': ('name',),
+    'remove-trait': ('name',),
+    'set-capability': ('name', 'value'),
+    'unset-capability': ('name',),
+    'set-plugin-data': ('path', 'value'),
+    'extend-plugin-data': ('path', 'value'),
+    'unset-plugin-data': ('path',),
+    'set-port-attribute': ('port_id', 'path', 'value'),
+    'log': ('msg',),
+    'fail': ('message',),
+}
+
+MULTIPLE = ('any', 'all', 'first', 'last')
+
+_PATH_TOKEN = re.compile(r'[^.\[\]]+')
+
+
+def _invalid(rule, message, *args):
+    raise exceptions.InvalidInspectionRule(
+        'Rule %r: %s' % (rule.get('description') or rule.get('uuid'),
+                         message % args))
+
+
+def _parse_path(expression):
+    """Split a path like inventory.disks[0][name] into its keys."""
+    keys = []
+    for token in _PATH_TOKEN.findall(expression.strip()):
+        keys.append(int(token) if token.isdigit() else token)
+    return keys
+
+
+def _lookup(value, keys):
+    """Resolve the keys of a parsed path, with * matching all list items.
+
+    :returns: a list of the matching values.
+    """
+    values = [value]
+    for key in keys:
+        found = []
+        for item in values:
+            if key == '*' and isinstance(item, list):
+                found.extend(item)
+                continue
+            try:
+                found.append(item[key])
+            except (KeyError, IndexError, TypeError):
+                continue
+        values = found
+    return values
+
+
+def _compile_template(value):
+    """Compile a value that may reference the evaluation context.
+
+    Strings consisting of a single {reference} evaluate to the referenced
+    value itself, other strings are formatted.
+
+    :returns: a callable accepting the context.
+    """
+    if isinstance(value, list):
+        items = [_compile_template(item) for item in value]
+        return lambda context: [item(context) for item in items]
+    if isinstance(value, dict):
+        items = {key: _compile_template(item) for key, item in value.items()}
+        return lambda context: {key: item(context)
+                                for key, item in items.items()}
+    if not isinstance(value, str) or '{' not in value:
+        return lambda context: value
+
+    try:
+        parts = [(literal, None if field is None else _parse_path(field))
+                 for literal, field, _spec, _conv
+                 in string.Formatter().parse(value)]
+    except ValueError:
+        return lambda context: value
+
+    if len(parts) == 1 and not parts[0][0] and parts[0][1] is not None:
+        keys = parts[0][1]
+
+        def _reference(context):
+            found = _lookup(context, keys)
+            return found[0] if found else None
+        return _reference
+
+    def _format(context):
+        result = []
+        for literal, keys in parts:
+            result.append(literal)
+            if keys is not None:
+                found = _lookup(context, keys)
+                result.append(str(found[0]) if found else '')
+        return ''.join(result)
+    return _format
+
+
+def _set_path(target, path, value, extend=False, unique=False):
+    keys = _parse_path(path.replace('/', '.'))
+    if not keys:
+        raise ValueError('Empty path')
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    if extend:
+        items = target.setdefault(keys[-1], [])
+        if not (unique and value in items):
+            items.append(value)
+    else:
+        target[keys[-1]] = value
+
+
+def _del_path(target, path):
+    keys = _parse_path(path.replace('/', '.'))
+    for key in keys[:-1]:
+        target = target.get(key, {})
+    target.pop(keys[-1], None)
+
+
+class Outcome(object):
+    """The result of evaluating rules against one data set.
+
+    :ivar node: the node with all changes applied.
+    :ivar patch: the list of (operation, path, value) changes of the node.
+    :ivar matched: descriptions of the rules that matched.
+    :ivar plugin_data: the plugin data with all changes applied.
+    :ivar logs: messages logged by the rules.
+    :ivar failed: the failure message if a rule failed inspection.
+    """
+
+    def __init__(self, node, plugin_data):
+        self.node = copy.deepcopy(node or {})
+        self.plugin_data = copy.deepcopy(plugin_data or {})
+        self.patch = []
+        self.matched = []
+        self.logs = []
+        self.failed = None
+
+    def _set_capability(self, name, value):
+        properties = self.node.setdefault('properties', {})
+        capabilities = dict(
+            item.split(':', 1) for item
+            in (properties.get('capabilities') or '').split(',') if item)
+        if value is None:
+            capabilities.pop(name, None)
+        else:
+            capabilities[name] = str(value)
+        properties['capabilities'] = ','.join(
+            '%s:%s' % item for item in capabilities.items())
+        self.patch.append(('replace', '/properties/capabilities',
+                           properties['capabilities']))
+
+    def apply(self, action, args):
+        if action in ('set-attribute', 'extend-attribute'):
+            _set_path(self.node, args['path'], args['value'],
+                      extend=(action == 'extend-attribute'),
+                      unique=args.get('unique', False))
+            self.patch.append(('add', args['path'], args['value']))
+        elif action == 'del-attribute':
+            _del_path(self.node, args['path'])
+            self.patch.append(('remove', args['path'], None))
+        elif action in ('add-trait', 'remove-trait'):
+            traits = self.node.setdefault('traits', [])
+            if action == 'add-trait' and args['name'] not in traits:
+                traits.append(args['name'])
+            elif action == 'remove-trait' and args['name'] in traits:
+                traits.remove(args['name'])
+            self.patch.append((action, '/traits', args['name']))
+        elif action == 'set-capability':
+            self._set_capability(args['name'], args['value'])
+        elif action == 'unset-capability':
+            self._set_capability(args['name'], None)
+        elif action in ('set-plugin-data', 'extend-plugin-data'):
+            _set_path(self.plugin_data, args['path'], args['value'],
+                      extend=(action == 'extend-plugin-data'),
+                      unique=args.get('unique', False))
+        elif action == 'unset-plugin-data':
+            _del_path(self.plugin_data, args['path'])
+        elif action == 'set-port-attribute':
+            self.patch.append(('port', '%s%s' % (args['port_id'],
+                                                 args['path']),
+                               args['value']))
+        elif action == 'log':
+            self.logs.append(str(args['msg']))
+        elif action == 'fail':
+            self.failed = str(args['message'])
+
+
+class CompiledRule(object):
+    """A rule with all conditions and actions compiled into callables.
+
+    :ivar conditions: callables accepting a context and returning a boolean.
+    :ivar actions: callables accepting a context and returning a list of
+        (action name, arguments) tuples to apply.
+    """
+
+    def __init__(self, description, conditions, actions, phase=None,
+                 priority=0):
+        self.description = description
+        self.conditions = conditions
+        self.actions = actions
+        self.phase = phase
+        self.priority = priority
+
+
+def _compile_inspector_condition(rule, condition):
+    op = condition.get('op')
+    if op not in OPS or OPS[op][0] > 2:
+        _invalid(rule, 'unknown condition operation %r', op)
+    field = condition.get('field')
+    if not field:
+        _invalid(rule, 'condition %r has no field', op)
+    multiple = condition.get('multiple', 'any')
+    if multiple not in MULTIPLE:
+        _invalid(rule, 'invalid multiple value %r', multiple)
+    if OPS[op][0] == 2 and 'value' not in condition:
+        _invalid(rule, 'condition %r requires a value', op)
+
+    scope = 'data'
+    if '://' in field:
+        scope, field = field.split('://', 1)
+        if scope not in ('data', 'node'):
+            _invalid(rule, 'unknown field scope %r', scope)
+    keys = _parse_path(field[2:] if field.startswith('$.') else field)
+    check = OPS[op][1]
+    expected = condition.get('value')
+    invert = condition.get('invert', False)
+
+    def _check(value):
+        try:
+            if OPS[op][0] == 1:
+                return check(value)
+            return check(value, expected)
+        except TypeError:
+            return False
+
+    def _condition(context):
+        values = _lookup(context[scope], keys)
+        if not values:
+            result = False
+        elif multiple == 'any':
+            result = any(_check(value) for value in values)
+        elif multiple == 'all':
+            result = all(_check(value) for value in values)
+        elif multiple == 'first':
+            result = _check(values[0])
+        else:
+            result = _check(values[-1])
+        return result != invert
+
+    return _condition
+
+
+def _compile_inspector_action(rule, action):
+    name = action.get('action')
+    if name not in ACTIONS:
+        _invalid(rule, 'unknown action %r', name)
+    missing = [arg for arg in ACTIONS[name]
+               if arg not in action and arg not in ('value', 'msg')]
+    if missing:
+        _invalid(rule, 'action %r requires %s', name, ', '.join(missing))
+    args = {key: _compile_template(value) for key, value in action.items()
+            if key != 'action'}
+
+    def _action(context):
+        # Inspector formats strings with the introspection data as "data".
+        scope = {'data': context['data']}
+        return [(name, {key: value(scope) for key, value in args.items()})]
+
+    return _action
+
+
+def _compile_args(rule, name, args, count_or_names):
+    if isinstance(args, dict):
+        args = list(args.values())
+    if not isinstance(args, list):
+        _invalid(rule, '%r requires a list of arguments', name)
+    count = (count_or_names if isinstance(count_or_names, int)
+             else len(count_or_names))
+    if len(args) < count:
+        _invalid(rule, '%r requires %d arguments, got %d', name, count,
+                 len(args))
+    return _compile_template(args)
+
+
+def _with_loop(rule, item, loop):
+    """Compile the loop of a condition or action, if any."""
+    if loop is None:
+        return lambda context: [context]
+    if not isinstance(loop, (list, dict, str)):
+        _invalid(rule, 'loop of %r must be a list, a dictionary or a '
+                 'reference to one', item.get('op'))
+    items = _compile_template(loop)
+
+    def _loop(context):
+        values = items(context)
+        if isinstance(values, dict):
+            values = list(values.values())
+        elif not isinstance(values, list):
+            values = []
+        return [dict(context, item=value) for value in values]
+
+    return _loop
+
+
+def _compile_rule_condition(rule, condition):
+    op = condition.get('op') or ''
+    invert = condition.get('invert', False)
+    if op.startswith('!'):
+        op, invert = op[1:], not invert
+    if op not in OPS:
+        _invalid(rule, 'unknown condition operation %r', op)
+    multiple = condition.get('multiple', 'any')
+    if multiple not in MULTIPLE:
+        _invalid(rule, 'invalid multiple value %r', multiple)
+    args = _compile_args(rule, op, condition.get('args', []), OPS[op][0])
+    check = OPS[op][1]
+    loop = _with_loop(rule, condition, condition.get('loop'))
+
+    def _check(context):
+        values = args(context)
+        try:
+            return check(*values[:OPS[op][0]]) != invert
+        except (TypeError, re.error):
+            return invert
+
+    def _condition(context):
+        results = [_check(scope) for scope in loop(context)]
+        if multiple == 'any':
+            return any(results)
+        elif multiple == 'all':
+            return all(results)
+        elif multiple == 'first':
+            return bool(results) and results[0]
+        return bool(results) and results[-1]
+
+    return _condition
+
+
+def _compile_rule_action(rule, action):
+    name = action.get('op')
+    if name not in ACTIONS:
+        _invalid(rule, 'unknown action %r', name)
+    arg_names = ACTIONS[name]
+    args = _compile_args(rule, name, action.get('args', []), arg_names)
+    loop = _with_loop(rule, action, action.get('loop'))
+
+    def _action(context):
+        return [(name, dict(zip(arg_names, args(scope))))
+                for scope in loop(context)]
+
+    return _action
+
+
+def is_inspector_rule(rule):
+    """Whether a rule uses the ironic-inspector format."""
+    return (any('field' in item for item in rule.get('conditions') or ())
+            or any('action' in item for item in rule.get('actions') or ()))
+
+
+def compile_rule(rule):
+    """Compile a rule in either format.
+
+    :param rule: the rule as a dictionary.
+    :returns: a CompiledRule.
+    :raises: InvalidInspectionRule if the rule is not valid.
+    """
+    if not isinstance(rule, dict):
+        raise exceptions.InvalidInspectionRule(
+            'Rule must be a dictionary, got %r' % (rule,))
+    if not rule.get('actions'):
+        _invalid(rule, 'at least one action is required')
+
+    if is_inspector_rule(rule):
+        conditions = [_compile_inspector_condition(rule, item)
+                      for item in rule.get('conditions') or ()]
+        actions = [_compile_inspector_action(rule, item)
+                   for item in rule['actions']]
+        return CompiledRule(rule.get('description'), conditions, actions)
+
+    conditions = [_compile_rule_condition(rule, item)
+                  for item in rule.get('conditions') or ()]
+    actions = [_compile_rule_action(rule, item) for item in rule['actions']]
+    return CompiledRule(rule.get('description'), conditions, actions,
+                        phase=rule.get('phase', 'main'),
+                        priority=rule.get('priority', 0))
+
+
+def compile_rules(rules):
+    """Compile a list of rules.
+
+    Inspection rules are ordered by their priority, highest first, the
+    order of the introspection rules is kept.
+
+    :param rules: a rule or a list of rules in either format.
+    :returns: a list of CompiledRule objects.
+    :raises: InvalidInspectionRule if any of the rules is not valid.
+    """
+    if not isinstance(rules, list):
+        rules = [rules]
+    compiled = [compile_rule(rule) for rule in rules]
+    return sorted(compiled, key=lambda rule: -rule.priority)
+
+
+def _context(dataset, outcome):
+    return {
+        'data': dataset,
+        'inventory': dataset.get('inventory', {}),
+        'plugin_data': outcome.plugin_data,
+        'node': outcome.node,
+    }
+
+
+def evaluate(rules, datasets, nodes=None, phase='main'):
+    """Evaluate compiled rules against many data sets.
+
+    :param rules: a list of CompiledRule objects.
+    :param datasets: a list of introspection data or of dictionaries with
+        the inventory and plugin_data keys, e.g. stored inventories.
+    :param nodes: optionally, a list of nodes corresponding to the data
+        sets, which the rules may check and change.
+    :param phase: only inspection rules of this phase are evaluated.
+    :returns: a list of Outcome objects in the same order as datasets.
+    """
+    if nodes is None:
+        nodes = [None] * len(datasets)
+    outcomes = [Outcome(node, dataset.get('plugin_data'))
+                for node, dataset in zip(nodes, datasets)]
+    contexts = [_context(dataset, outcome)
+                for dataset, outcome in zip(datasets, outcomes)]
+
+    for rule in rules:
+        if rule.phase is not None and rule.phase != phase:
+            continue
+        matching = [index for index, outcome in enumerate(outcomes)
+                    if outcome.failed is None]
+        for condition in rule.conditions:
+            matching = [index for index in matching
+                        if condition(contexts[index])]
+            if not matching:
+                break
+
+        for index in matching:
+            outcome = outcomes[index]
+            outcome.matched.append(rule.description)
+            for action in rule.actions:
+                for name, args in action(contexts[index]):
+                    outcome.apply(name, args)
+                    if outcome.failed is not None:
+                        break
+                if outcome.failed is not None:
+                    break
+
+    return outcomes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Evaluate introspection or inspection rules against '
+                    'recorded introspection data or inventories.')
+    parser.add_argument('rules', help='a JSON file with the rules')
+    parser.add_argument('data', nargs='+',
+                        help='JSON files with the recorded data')
+    args = parser.parse_args(argv)
+
+    with open(args.rules) as fp:
+        rules = compile_rules(json.loads(fp.read()))
+    datasets = []
+    for path in args.data:
+        with open(path) as fp:
+            datasets.append(json.loads(fp.read()))
+
+    failed = False
+    for path, outcome in zip(args.data, evaluate(rules, datasets)):
+        sys.stdout.write('%s: matched %s\n' % (path, outcome.matched))
+        for change in outcome.patch:
+            sys.stdout.write('    %s %s %r\n' % change)
+        for message in outcome.logs:
+            sys.stdout.write('    log: %s\n' % message)
+        if outcome.failed is not None:
+            failed = True
+            sys.stdout.write('    FAILED: %s\n' % outcome.failed)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compressed on-disk storage of hardware inventories.
+
+Inventories and introspection data are downloaded into a temporary file,
+then parsed as a whole and split into sub-trees, so a payload is held in
+memory while it is stored. Nothing is streamed: the store only avoids keeping
+whole payloads around afterwards. Every payload is stored as a ZIP archive
+keyed by node UUID and API microversion, with a member per sub-tree. The
+archives are memory-mapped for reading and only the requested sub-trees are
+ever decompressed, so comparing the inventories of hundreds of nodes does not
+keep them all in memory.
+"""
+
+import collections
+import mmap
+import os
+import tempfile
+import threading
+from urllib import parse as urllib_parse
+import zipfile
+
+from oslo_serialization import jsonutils as json
+
+# How deep the payloads are split into separate members, e.g. with the
+# default depth of 2 the disks of an inventory are stored in the
+# payload/inventory/disks member.
+SPLIT_DEPTH = 2
+
+# The name of the member or the members prefix of the whole payload.
+ROOT = 'payload'
+
+SUFFIX = '.zip'
+
+
+def _quote(key):
+    return urllib_parse.quote(str(key), safe='')
+
+
+def _split(value, prefix, depth):
+    """Yield (member name, value) for every sub-tree of a payload."""
+    if depth > 0 and isinstance(value, dict) and value:
+        for key, item in value.items():
+            yield from _split(item, prefix + (_quote(key),), depth - 1)
+    else:
+        yield '/'.join(prefix), value
+
+
+class _MappedFile(object):
+    """A minimal read-only file object on top of a memory map.
+
+    Before Python 3.13 mmap objects lack seekable(), which zipfile needs.
+    """
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+    def read(self, size=-1):
+        return self._mapping.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._mapping.seek(offset, whence)
+        return self._mapping.tell()
+
+    def tell(self):
+        return self._mapping.tell()
+
+    def seekable(self):
+        return True
+
+
+class _Archive(object):
+    """A memory-mapped archive of a payload with an index of its members."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._reader = zipfile.ZipFile(_MappedFile(self._mmap))
+        self._lock = threading.Lock()
+        # Member names mapped to their ZipInfo objects, and the names of the
+        # sub-trees mapped to their children, which are either members
+        # (True) or sub-trees (False).
+        self.members = {}
+        self.children = collections.defaultdict(dict)
+        for info in self._reader.infolist():
+            name = info.filename[:-len('.json')]
+            self.members[name] = info
+            parts = name.split('/')
+            for index in range(1, len(parts)):
+                self.children['/'.join(parts[:index])][
+                    urllib_parse.unquote(parts[index])] = (
+                        index == len(parts) - 1)
+
+    def load(self, name):
+        with self._lock:
+            return json.loads(self._reader.read(self.members[name]))
+
+    def close(self):
+        with self._lock:
+            self._reader.close()
+            self._mmap.close()
+
+
+class InventoryStore(object):
+    """A compressed store of JSON payloads keyed by node and microversion.
+
+    :param path: the directory of the store, it is created if it does not
+        exist.
+    :param split_depth: how deep the payloads are split into sub-trees.
+    """
+
+    def __init__(self, path, split_depth=SPLIT_DEPTH):
+        self.path = path
+        self.split_depth = split_depth
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        # (node UUID, microversion) mapped to opened archives, or None for
+        # archives that are not opened yet.
+        self._archives = {}
+        for filename in os.listdir(path):
+            if filename.endswith(SUFFIX):
+                node_uuid, microversion = filename[:-len(SUFFIX)].split('@')
+                self._archives[(urllib_parse.unquote(node_uuid),
+                                urllib_parse.unquote(microversion))] = None
+
+    def _archive_path(self, node_uuid, microversion):
+        return os.path.join(self.path, '%s@%s%s' % (
+            _quote(node_uuid), _quote(microversion), SUFFIX))
+
+    def add(self, node_uuid, microversion, payload):
+        """Store a payload.
+
+        A payload that is already stored is replaced, without touching the
+        other payloads.
+
+        :param node_uuid: UUID of the node.
+        :param microversion: the API microversion the payload was fetched
+            with.
+        :param payload: a JSON-serializable dictionary.
+        """
+        key = (node_uuid, str(microversion))
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp, zipfile.ZipFile(
+                    fp, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for name, value in _split(payload, (ROOT,),
+                                          self.split_depth):
+                    archive.writestr(name + '.json', json.dump_as_bytes(value))
+            with self._lock:
+                os.replace(tmp_path, self._archive_path(*key))
+                previous = self._archives.get(key)
+                self._archives[key] = None
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if previous is not None:
+            previous.close()
+
+    def fetch(self, node_uuid, microversion, download):
+        """Download a payload into the store.
+
+        The response body is written to a temporary file, but the payload is
+        parsed as a whole to split it, so it is briefly held in memory.
+
+        :param node_uuid: UUID of the node.
+        :param microversion: the API microversion used by download.
+        :param download: a callable writing the JSON payload into the binary
+            file object it accepts, e.g. a partial of
+            BaremetalClient.download_inventory.
+        :returns: a PayloadView of the stored payload.
+        """
+        with tempfile.TemporaryFile(dir=self.path) as fp:
+            download(fp)
+            fp.seek(0)
+            payload = json.loads(fp.read())
+        self.add(node_uuid, microversion, payload)
+        del payload
+        return self.get(node_uuid, microversion)
+
+    def _archive(self, key):
+        """Get the opened archive of a payload.
+
+        :raises: KeyError if the payload is not stored.
+        """
+        with self._lock:
+            archive = self._archives[key]
+            if archive is None:
+                archive = self._archives[key] = _Archive(
+                    self._archive_path(*key))
+            return archive
+
+    def __contains__(self, key):
+        node_uuid, microversion = key
+        return (node_uuid, str(microversion)) in self._archives
+
+    def get(self, node_uuid, microversion):
+        """Get a lazy view of a stored payload.
+
+        :param node_uuid: UUID of the node.
+        :param microversion: the API microversion the payload was fetched
+            with.
+        :raises: KeyError if the payload is not stored.
+        """
+        key = (node_uuid, str(microversion))
+        if key not in self._archives:
+            raise KeyError('No payload for node %s with microversion %s'
+                           % (node_uuid, microversion))
+        return PayloadView(self, key, ROOT)
+
+    def nodes(self):
+        """List (node UUID, microversion) pairs of the stored payloads."""
+        with self._lock:
+            return sorted(self._archives)
+
+    def close(self):
+        with self._lock:
+            archives = [archive for archive in self._archives.values()
+                        if archive is not None]
+            self._archives = dict.fromkeys(self._archives)
+        for archive in archives:
+            archive.close()
+
+
+class PayloadView(object):
+    """A read-only, lazily loaded view of a stored payload or its sub-tree.
+
+    Items that are stored as separate members are returned as nested views,
+    everything else is loaded on access.
+    """
+
+    def __init__(self, store, key, name):
+        self._store = store
+        self._key = key
+        self._name = name
+
+    def keys(self):
+        archive = self._store._archive(self._key)
+        if self._name in archive.members:
+            return archive.load(self._name).keys()
+        return archive.children.get(self._name, {}).keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        archive = self._store._archive(self._key)
+        if self._name in archive.members:
+            return archive.load(self._name)[key]
+        children = archive.children.get(self._name, {})
+        if key not in children:
+            raise KeyError(key)
+        name = '%s/%s' % (self._name, _quote(key))
+        if children[key]:
+            return archive.load(name)
+        return PayloadView(self._store, self._key, name)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Load the whole sub-tree into memory."""
+        return {key: (value.to_dict() if isinstance(value, PayloadView)
+                      else value)
+                for key, value in ((key, self[key]) for key in self.keys())}
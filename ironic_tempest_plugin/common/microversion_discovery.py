@@ -0,0 +1,194 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Discovery of the minimum microversions of the bare metal client methods.
+
+The minimum microversion of a method is found by a binary search between the
+minimum and the maximum microversion of the API, assuming that a method
+keeps working in all microversions after the one it was introduced in. A call
+is considered rejected when it raises one of the errors the API returns for
+unknown microversions, i.e. NotAcceptable or NotFound.
+
+The results are cached per API version, so that they are only discovered once
+per deployment, and can be compared to the minimum microversions expected by
+test_microversion_enforcement.py.
+"""
+
+import ast
+import os
+import threading
+
+from oslo_serialization import jsonutils as json
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.services.baremetal import base
+
+REJECTED = (lib_exc.NotAcceptable, lib_exc.NotFound)
+
+ENFORCEMENT_TESTS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'tests', 'api', 'admin', 'test_microversion_enforcement.py')
+
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def _parse(version):
+    major, minor = version.split('.')
+    return int(major), int(minor)
+
+
+def versions_between(api_min, api_max):
+    """List all microversions between two microversions of the same major."""
+    major, low = _parse(api_min)
+    max_major, high = _parse(api_max)
+    if major != max_major:
+        raise ValueError('Microversions %s and %s have different major '
+                         'versions' % (api_min, api_max))
+    return ['%d.%d' % (major, minor) for minor in range(low, high + 1)]
+
+
+def accepts(client, method_name, args, version, rejected=REJECTED):
+    """Whether a call is accepted with a microversion.
+
+    Other errors than rejected, e.g. Conflict, mean that the request got past
+    the microversion checks, so the call is accepted.
+    """
+    method = getattr(client, method_name)
+    try:
+        with base.microversion(version):
+            method(**args)
+    except rejected:
+        return False
+    except lib_exc.RestClientException:
+        return True
+    return True
+
+
+def discover(client, method_name, args, api_min, api_max,
+             rejected=REJECTED):
+    """Find the minimum microversion of a method.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param method_name: the name of the client method.
+    :param args: keyword arguments of the method.
+    :param api_min: the minimum microversion of the API.
+    :param api_max: the maximum microversion of the API.
+    :param rejected: the exceptions meaning that the microversion is not
+        supported.
+    :returns: a tuple (minimum microversion or None if the method is not
+        supported at all, number of calls made).
+    """
+    versions = versions_between(api_min, api_max)
+    low, high = 0, len(versions) - 1
+    probes = 1
+    if not accepts(client, method_name, args, versions[high], rejected):
+        return None, probes
+
+    while low < high:
+        middle = (low + high) // 2
+        probes += 1
+        if accepts(client, method_name, args, versions[middle], rejected):
+            high = middle
+        else:
+            low = middle + 1
+    return versions[low], probes
+
+
+class Cache(object):
+    """Discovered microversions per API version.
+
+    :param path: optionally, a JSON file to persist the cache in.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._data = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as fp:
+                self._data = json.loads(fp.read())
+
+    def get(self, api_version, method_name):
+        return self._data.get(api_version, {}).get(method_name)
+
+    def __contains__(self, key):
+        api_version, method_name = key
+        return method_name in self._data.get(api_version, {})
+
+    def set(self, api_version, method_name, version):
+        with self._lock:
+            self._data.setdefault(api_version, {})[method_name] = version
+            if self.path:
+                with open(self.path, 'w') as fp:
+                    fp.write(json.dumps(self._data, indent=2,
+                                        sort_keys=True))
+
+    def results(self, api_version):
+        return dict(self._data.get(api_version, {}))
+
+
+def get_cache(path=None):
+    """Get a cache shared by all test classes of a worker."""
+    with _LOCK:
+        if path not in _CACHE:
+            _CACHE[path] = Cache(path)
+        return _CACHE[path]
+
+
+def expected_versions(path=ENFORCEMENT_TESTS):
+    """Extract the expected minimum microversions from the enforcement tests.
+
+    :param path: the path to test_microversion_enforcement.py.
+    :returns: a dictionary mapping public client method names to the sets of
+        minimum microversions they are tested with.
+    """
+    with open(path) as fp:
+        tree = ast.parse(fp.read(), path)
+
+    expected = {}
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr == '_microversion_test'
+                and len(node.args) >= 2):
+            continue
+        method, version = node.args[:2]
+        if (isinstance(method, ast.Attribute)
+                and not method.attr.startswith('_')
+                and isinstance(version, ast.Constant)):
+            expected.setdefault(method.attr, set()).add(version.value)
+    return expected
+
+
+def table(discovered, expected):
+    """Format the discovered and the expected microversions as a table.
+
+    :param discovered: a dictionary mapping method names to microversions.
+    :param expected: a dictionary as returned by expected_versions.
+    :returns: a tuple (the table as a string, list of mismatching methods).
+    """
+    row = '%-40s %-10s %-15s %s\n'
+    lines = [row % ('method', 'found', 'expected', 'status')]
+    mismatches = []
+    for method_name, version in sorted(discovered.items()):
+        versions = expected.get(method_name)
+        if not versions:
+            status = 'untested'
+        elif version in versions:
+            status = 'ok'
+        else:
+            status = 'MISMATCH'
+            mismatches.append(method_name)
+        lines.append(row % (method_name, version or '-',
+                            ','.join(sorted(versions or ())) or '-', status))
+    return ''.join(lines), mismatches
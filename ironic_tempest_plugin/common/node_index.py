@@ -0,0 +1,104 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Matching of test requirements to nodes.
+
+The standalone scenario tests force the driver and interfaces they need on
+the node they pick, which makes ironic validate the node and sometimes sync
+its power state. With [baremetal]interface_aware_selection enabled, the
+available nodes are grouped by their driver, interfaces, boot mode and
+resource class, nodes needing the fewest changes are preferred and the
+update is skipped when nothing differs.
+"""
+
+import collections
+
+from tempest import config
+
+from ironic_tempest_plugin.services.baremetal import base
+
+CONF = config.CONF
+
+INTERFACE_FIELDS = tuple('%s_interface' % iface
+                         for iface in base.SUPPORTED_INTERFACES)
+INDEX_FIELDS = ('driver',) + INTERFACE_FIELDS + ('boot_mode',
+                                                 'resource_class')
+
+# The first microversion exposing all INDEX_FIELDS.
+INDEX_MICROVERSION = '1.75'
+
+
+def enabled():
+    return CONF.baremetal.interface_aware_selection
+
+
+def key(node):
+    """Get the index key of a node."""
+    return tuple(node.get(field) for field in INDEX_FIELDS)
+
+
+def differences(node, driver=None, **interfaces):
+    """Get the changes needed for a node to match the requirements.
+
+    :param node: a node with the INDEX_FIELDS.
+    :param driver: the required driver or None for any driver.
+    :param interfaces: the required interfaces, e.g. deploy_interface,
+        interfaces set to None are not required.
+    :returns: a dictionary with the fields to update.
+    """
+    required = {name: value for name, value in interfaces.items() if value}
+    if driver and node.get('driver') != driver:
+        # Changing the driver resets the interfaces to the defaults of the
+        # new driver, so all required interfaces have to be set again.
+        return dict(required, driver=driver)
+    return {name: value for name, value in required.items()
+            if node.get(name) != value}
+
+
+class NodeIndex(object):
+    """Nodes grouped by their INDEX_FIELDS.
+
+    :param nodes: a list of nodes with the INDEX_FIELDS.
+    """
+
+    def __init__(self, nodes):
+        self.groups = collections.defaultdict(list)
+        for node in nodes:
+            self.groups[key(node)].append(node)
+
+    def __len__(self):
+        return sum(len(nodes) for nodes in self.groups.values())
+
+    def best(self, driver=None, boot_mode=None, resource_class=None,
+             **interfaces):
+        """Get the nodes that need the fewest changes.
+
+        The number of fields to update comes first, then whether the boot
+        mode and the resource class match.
+
+        :param driver: the required driver or None for any driver.
+        :param boot_mode: the preferred boot mode or None.
+        :param resource_class: the preferred resource class or None.
+        :param interfaces: the required interfaces.
+        :returns: a list of nodes, empty if the index is empty.
+        """
+        scored = collections.defaultdict(list)
+        for group_key, nodes in self.groups.items():
+            group = dict(zip(INDEX_FIELDS, group_key))
+            score = (len(differences(group, driver, **interfaces)),
+                     bool(boot_mode and group['boot_mode'] != boot_mode),
+                     bool(resource_class
+                          and group['resource_class'] != resource_class))
+            scored[score].extend(nodes)
+        if not scored:
+            return []
+        return scored[min(scored)]
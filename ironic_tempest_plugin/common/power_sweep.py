@@ -0,0 +1,184 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Power operations on many nodes at once.
+
+A sweep applies the same power action to a selection of nodes with a bounded
+number of requests in flight, then waits for all of them with a single node
+list per interval, recording how long every node took.
+"""
+
+import threading
+import time
+
+from oslo_log import log
+from tempest import config
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import benchmark
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.common import waiters
+from ironic_tempest_plugin.services.baremetal import base
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+# Power state targets and the power state a node ends up in after them.
+POWER_STATES = {
+    'power on': 'power on',
+    'power off': 'power off',
+    'rebooting': 'power on',
+}
+
+# The first microversions supporting the node list filters.
+FILTER_MICROVERSIONS = {
+    'conductor_group': '1.46',
+    'conductor': '1.49',
+    'shard': '1.82',
+}
+
+
+def _minimum_microversion(filters):
+    return max([FILTER_MICROVERSIONS[key] for key in filters
+                if key in FILTER_MICROVERSIONS] or ['1.8'],
+               key=lambda version: tuple(map(int, version.split('.'))))
+
+
+def select_nodes(client, **filters):
+    """List the UUIDs of the nodes matching the filters.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param filters: node list filters, e.g. shard, conductor_group,
+        conductor, provision_state or maintenance.
+    :returns: a list of node UUIDs.
+    """
+    with base.microversion_at_least(_minimum_microversion(filters)):
+        nodes = utils.list_all_nodes(client, fields='uuid', **filters)
+    return [node['uuid'] for node in nodes]
+
+
+class Sweep(object):
+    """A power action applied to several nodes.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param target: the target power state: 'power on', 'power off' or
+        'rebooting'.
+    :param concurrency: how many power requests may be in flight.
+    :param timeout: how long to wait for all nodes, defaults to
+        [baremetal]power_timeout.
+    :param interval: an interval between the node lists while waiting.
+    :param filters: node list filters matching the nodes, used to avoid
+        listing the whole fleet while waiting.
+    """
+
+    def __init__(self, client, target, concurrency=1, timeout=None,
+                 interval=1, filters=None):
+        if target not in POWER_STATES:
+            raise ValueError('Unsupported power state target %s' % target)
+        self.client = client
+        self.target = target
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.interval = interval
+        self.filters = filters or {}
+        self.recorder = benchmark.LatencyRecorder()
+        # UUID to a dictionary with the latency or error of the node.
+        self.nodes = {}
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _request(self, node_id):
+        started = time.monotonic()
+        try:
+            self.client.set_node_power_state(node_id, self.target)
+        except lib_exc.TempestException as exc:
+            LOG.warning('Power state %s of node %s was rejected: %s',
+                        self.target, node_id, exc)
+            self._record(node_id, error=benchmark.error_code(exc))
+            return
+        with self._lock:
+            self._started[node_id] = started
+
+    def _record(self, node_id, latency=None, error=None):
+        if error is None:
+            self.recorder.add(latency)
+        else:
+            self.recorder.add_error(error)
+        with self._lock:
+            self.nodes[node_id] = {'latency': latency, 'error': error}
+
+    def _finished(self, node):
+        latency = time.monotonic() - self._started[node['uuid']]
+        if node['power_state'] == POWER_STATES[self.target]:
+            self._record(node['uuid'], latency=latency)
+        else:
+            LOG.warning('Node %s failed to reach power state %s: %s',
+                        node['uuid'], self.target, node['last_error'])
+            self._record(node['uuid'], error='failed')
+
+    def run(self, node_ids):
+        """Apply the power action and wait for the nodes to reach the state.
+
+        Nodes not reaching the state are recorded as errors, use summary to
+        get the result.
+
+        :param node_ids: UUIDs of the nodes.
+        :returns: self, for convenience.
+        """
+        self.recorder.started_at = time.monotonic()
+        utils.run_concurrently(self._request, node_ids, self.concurrency)
+        try:
+            with base.microversion_at_least(
+                    _minimum_microversion(self.filters)):
+                waiters.wait_for_power_states(
+                    self.client, list(self._started),
+                    POWER_STATES[self.target], timeout=self.timeout,
+                    interval=self.interval, callback=self._finished,
+                    filters=self.filters)
+        except lib_exc.TimeoutException as exc:
+            LOG.warning('Power sweep %s did not finish: %s', self.target, exc)
+            for node_id in set(self._started) - set(self.nodes):
+                self._record(node_id, error='timeout')
+        self.recorder.finished_at = time.monotonic()
+        return self
+
+    def summary(self):
+        """Summarize the sweep.
+
+        :returns: the summary of the latencies as returned by
+            LatencyRecorder.summary with the per-node results under the nodes
+            key.
+        """
+        result = self.recorder.summary()
+        with self._lock:
+            result['nodes'] = dict(self.nodes)
+        return result
+
+
+def sweep(client, node_ids, target, concurrency=1, timeout=None, interval=1,
+          filters=None):
+    """Apply a power action to several nodes and wait for them.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param node_ids: UUIDs of the nodes.
+    :param target: the target power state: 'power on', 'power off' or
+        'rebooting'.
+    :param concurrency: how many power requests may be in flight.
+    :param timeout: how long to wait for all nodes, defaults to
+        [baremetal]power_timeout.
+    :param interval: an interval between the node lists while waiting.
+    :param filters: node list filters matching the nodes.
+    :returns: the summary of the sweep, see Sweep.summary.
+    """
+    return Sweep(client, target, concurrency=concurrency, timeout=timeout,
+                 interval=interval, filters=filters).run(node_ids).summary()
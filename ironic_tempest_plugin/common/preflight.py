@@ -0,0 +1,205 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Health checks of the bare metal service before running the tests.
+
+A misconfigured or overloaded deployment otherwise only shows up as a long
+series of timeouts. The checks run in parallel:
+
+* the API is reachable and supports the configured microversion range,
+* at least one conductor is alive,
+* the configured hardware types are enabled,
+* there are enough available nodes for the test workers.
+
+They can be run once before tempest with::
+
+    python -m ironic_tempest_plugin.common.preflight --config-file \\
+        etc/tempest.conf
+
+or by every test worker before its first scenario test with
+[baremetal]preflight enabled.
+"""
+
+import argparse
+import collections
+import sys
+import threading
+
+from oslo_log import log
+from tempest import config
+from tempest.lib.common import api_version_request
+from tempest.lib.common import api_version_utils
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin import clients
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin import exceptions
+from ironic_tempest_plugin.services.baremetal import base
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+# The first microversion reporting whether the conductors are alive.
+CONDUCTORS_MICROVERSION = '1.49'
+
+Result = collections.namedtuple('Result', ['name', 'ok', 'detail'])
+
+_LOCK = threading.Lock()
+# The failure of the checks of this process, False if they passed, None if
+# they have not run yet.
+_FAILURE = None
+
+
+def enabled():
+    return CONF.baremetal.preflight
+
+
+def check_api(client):
+    api_min, api_max = client.get_min_max_api_microversions()
+    cfg_min = CONF.baremetal.min_microversion
+    cfg_max = CONF.baremetal.max_microversion
+    if cfg_min and cfg_min != api_version_utils.LATEST_MICROVERSION:
+        if (api_version_request.APIVersionRequest(cfg_min)
+                > api_version_request.APIVersionRequest(api_max)):
+            raise ValueError('[baremetal]min_microversion %s is above the '
+                             'maximum API version %s' % (cfg_min, api_max))
+    if cfg_max and cfg_max != api_version_utils.LATEST_MICROVERSION:
+        if (api_version_request.APIVersionRequest(cfg_max)
+                < api_version_request.APIVersionRequest(api_min)):
+            raise ValueError('[baremetal]max_microversion %s is below the '
+                             'minimum API version %s' % (cfg_max, api_min))
+    return 'API versions %s to %s' % (api_min, api_max)
+
+
+def check_conductors(client):
+    with base.microversion_at_least(CONDUCTORS_MICROVERSION):
+        _, body = client.list_conductors(fields='hostname,alive')
+    alive = sorted(conductor['hostname'] for conductor in body['conductors']
+                   if conductor['alive'])
+    dead = sorted(conductor['hostname'] for conductor in body['conductors']
+                  if not conductor['alive'])
+    if not alive:
+        raise ValueError('No conductor is alive (dead: %s)'
+                         % (', '.join(dead) or 'none'))
+    if dead:
+        return '%d conductor(s) alive, dead: %s' % (len(alive),
+                                                    ', '.join(dead))
+    return '%d conductor(s) alive' % len(alive)
+
+
+def check_drivers(client):
+    _, body = client.list_drivers()
+    enabled_types = {driver['name'] for driver in body['drivers']}
+    missing = sorted(set(CONF.baremetal.enabled_hardware_types)
+                     - enabled_types)
+    if missing:
+        raise ValueError('Hardware types %(missing)s from '
+                         '[baremetal]enabled_hardware_types are not enabled, '
+                         'enabled are: %(enabled)s'
+                         % {'missing': ', '.join(missing),
+                            'enabled': ', '.join(sorted(enabled_types))})
+    return 'hardware types %s enabled' % ', '.join(
+        sorted(CONF.baremetal.enabled_hardware_types))
+
+
+def check_nodes(client):
+    # Every worker needs a node, even when the number of workers is unknown.
+    required = max(CONF.baremetal.preflight_workers
+                   or CONF.baremetal.shard_workers, 1)
+    with base.microversion_at_least('1.8'):
+        nodes = utils.list_all_nodes(client, provision_state='available',
+                                     maintenance=False, fields='uuid')
+    if len(nodes) < required:
+        raise ValueError('%d available node(s) for %d worker(s)'
+                         % (len(nodes), required))
+    return '%d available node(s)' % len(nodes)
+
+
+CHECKS = collections.OrderedDict([
+    ('api', check_api),
+    ('conductors', check_conductors),
+    ('drivers', check_drivers),
+    ('nodes', check_nodes),
+])
+
+
+def run(client, checks=None):
+    """Run the checks in parallel.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param checks: names of the checks to run, defaults to all of them.
+    :returns: a list of Result tuples in the order of the checks.
+    """
+    names = list(checks or CHECKS)
+
+    def _run(name):
+        try:
+            return Result(name, True, CHECKS[name](client))
+        except (ValueError, lib_exc.TempestException) as exc:
+            return Result(name, False, str(exc))
+        except Exception as exc:
+            # E.g. connection errors of an unreachable API.
+            return Result(name, False, '%s: %s' % (type(exc).__name__, exc))
+
+    return utils.run_concurrently(_run, names, len(names))
+
+
+def _failure(results):
+    failed = [result for result in results if not result.ok]
+    if not failed:
+        return None
+    return exceptions.PreflightFailed(reason='; '.join(
+        '%s: %s' % (result.name, result.detail) for result in failed))
+
+
+def ensure(client):
+    """Run the checks once per process.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :raises: PreflightFailed if any check failed, also on the following
+        calls without running the checks again.
+    """
+    global _FAILURE
+    with _LOCK:
+        if _FAILURE is None:
+            results = run(client)
+            for result in results:
+                LOG.info('Preflight check %s: %s (%s)', result.name,
+                         'OK' if result.ok else 'FAILED', result.detail)
+            _FAILURE = _failure(results) or False
+        if _FAILURE:
+            raise _FAILURE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Check that the bare metal service is ready for the '
+                    'tempest tests.')
+    parser.add_argument('--config-file',
+                        help='the tempest configuration file')
+    parser.add_argument('--check', action='append', choices=list(CHECKS),
+                        help='a check to run, defaults to all checks')
+    args = parser.parse_args(argv)
+
+    if args.config_file:
+        config.CONF.set_config_path(args.config_file)
+    results = run(clients.Manager().baremetal_client, args.check)
+    for result in results:
+        print('%-12s %-6s %s' % (result.name, 'OK' if result.ok else 'FAILED',
+                                 result.detail))
+    if _failure(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
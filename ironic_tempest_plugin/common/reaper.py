@@ -0,0 +1,154 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Background teardown of the nodes used by the scenario tests.
+
+Undeploying a node and waiting for automated cleaning can take many minutes,
+during which the worker cannot start the next test class. With
+[baremetal]background_teardown enabled, the standalone scenario tests hand
+their node to a reaper, which tears it down in a background thread while the
+worker moves on to the next class on another node.
+
+Teardowns still running when the worker finishes are waited for. Since
+their failures can no longer fail the test class they belong to, they are
+logged, written to a JSON file in [baremetal]teardown_report_dir if it is
+set, and the worker exits with a non-zero status, which fails the run.
+"""
+
+import atexit
+from concurrent import futures
+import logging
+import os
+import sys
+import threading
+
+from oslo_log import log
+from oslo_serialization import jsonutils as json
+from tempest import config
+
+from ironic_tempest_plugin import exceptions
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+_LOCK = threading.Lock()
+_REAPER = None
+
+# The exit status of a worker with failed teardowns.
+FAILURE_EXIT_STATUS = 1
+
+
+def enabled():
+    return CONF.baremetal.background_teardown
+
+
+class Reaper(object):
+    """A pool of threads running teardowns.
+
+    :param concurrency: how many teardowns may run at the same time.
+    """
+
+    def __init__(self, concurrency):
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix='reaper')
+        self._lock = threading.Lock()
+        # Future to the name of the teardown.
+        self._pending = {}
+        # A list of (name, exception) tuples of the failed teardowns.
+        self.failures = []
+
+    def submit(self, name, func, *args, **kwargs):
+        """Run a teardown in the background.
+
+        :param name: the name of the teardown, e.g. the test class name.
+        :param func: the callable doing the teardown.
+        :returns: a Future.
+        """
+        future = self._executor.submit(func, *args, **kwargs)
+        with self._lock:
+            self._pending[future] = name
+        LOG.debug('Teardown of %s handed to the reaper', name)
+        return future
+
+    def pending(self):
+        """Get the names of the unfinished teardowns."""
+        with self._lock:
+            return sorted(name for future, name in self._pending.items()
+                          if not future.done())
+
+    def barrier(self, timeout=None):
+        """Wait for the teardowns submitted so far.
+
+        :param timeout: how long to wait, None to wait until all finish.
+        :raises: TeardownFailed listing the teardowns that failed since the
+            previous barrier and the ones that did not finish in time.
+        """
+        with self._lock:
+            pending = dict(self._pending)
+        done, not_done = futures.wait(pending, timeout)
+        failures = []
+        with self._lock:
+            for future in done:
+                del self._pending[future]
+                if future.exception() is not None:
+                    failures.append((pending[future], future.exception()))
+            self.failures.extend(failures)
+        failures.extend((pending[future], 'did not finish in time')
+                        for future in not_done)
+        if failures:
+            raise exceptions.TeardownFailed(reason='; '.join(
+                '%s: %s' % (name, error)
+                for name, error in sorted(failures, key=str)))
+
+
+def _write_report(failures):
+    report_dir = CONF.baremetal.teardown_report_dir
+    if not report_dir:
+        return
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, 'teardown-failures-%d.json' % os.getpid())
+    with open(path, 'w') as fp:
+        fp.write(json.dumps([{'name': name, 'error': str(error)}
+                             for name, error in failures],
+                            indent=2, sort_keys=True))
+    LOG.error('Teardown failures written to %s', path)
+
+
+def _at_exit():
+    """The run-end barrier of the worker."""
+    if _REAPER is None:
+        return
+    try:
+        _REAPER.barrier()
+    except exceptions.TeardownFailed as exc:
+        LOG.error('Background teardowns failed: %s', exc)
+        _write_report(_REAPER.failures)
+        # NOTE: exceptions raised by exit handlers do not change the exit
+        # status, so exit explicitly. The handler is registered on import,
+        # before the handlers registered later, which have already run.
+        logging.shutdown()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(FAILURE_EXIT_STATUS)
+
+
+atexit.register(_at_exit)
+
+
+def get():
+    """Get the reaper of this process."""
+    global _REAPER
+    with _LOCK:
+        if _REAPER is None:
+            _REAPER = Reaper(CONF.baremetal.teardown_concurrency)
+        return _REAPER
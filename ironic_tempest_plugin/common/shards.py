@@ -0,0 +1,128 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Binding of test worker processes to node shards.
+
+When the standalone scenario tests run in several workers, all of them pick
+nodes from the same pool and race for reserving them. With shards, every
+worker only picks nodes from its own shards, so the workers never compete for
+the same node.
+
+The shards of a worker are either configured explicitly with
+[baremetal]worker_shards, or computed: with [baremetal]shard_workers set to
+the number of workers, every worker process claims a free slot by locking a
+file, and the shards returned by the API are distributed between the slots so
+that every slot gets about the same number of nodes.
+"""
+
+import fcntl
+import os
+import tempfile
+import threading
+
+from oslo_log import log
+from tempest import config
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+# The first microversion supporting shards.
+SHARDS_MICROVERSION = '1.82'
+
+_LOCK = threading.Lock()
+_SLOT = None
+# The worker shards, None until they are known.
+_SHARDS = None
+
+
+def enabled():
+    return bool(CONF.baremetal.worker_shards
+                or CONF.baremetal.shard_workers)
+
+
+def _lock_dir():
+    return (CONF.baremetal.shard_lock_dir
+            or os.path.join(tempfile.gettempdir(), 'ironic-tempest-shards'))
+
+
+def claim_slot(workers, lock_dir):
+    """Claim a free worker slot for this process.
+
+    The slot is held until the process exits.
+
+    :param workers: the number of slots.
+    :param lock_dir: the directory to keep the lock files in.
+    :returns: a tuple (index of the claimed slot, the locked file object).
+    :raises: RuntimeError if all slots are taken.
+    """
+    os.makedirs(lock_dir, exist_ok=True)
+    for index in range(workers):
+        fp = open(os.path.join(lock_dir, 'worker-%d.lock' % index), 'a')
+        try:
+            fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fp.close()
+            continue
+        # The file object must stay open to keep the lock.
+        return index, fp
+    raise RuntimeError('All %d shard worker slots in %s are taken, '
+                       '[baremetal]shard_workers must not be lower than '
+                       'the number of test workers' % (workers, lock_dir))
+
+
+def distribute(shards, workers):
+    """Distribute shards between workers, balancing their node counts.
+
+    :param shards: a list of dictionaries with the name and count keys, as
+        returned by the shards API.
+    :param workers: the number of workers.
+    :returns: a list of lists of shard names, one per worker. With fewer
+        shards than workers, some workers get no shard.
+    """
+    loads = [0] * workers
+    result = [[] for _ in range(workers)]
+    # Placing the biggest shards first keeps the workers balanced.
+    for shard in sorted(shards, key=lambda item: (-item['count'],
+                                                  item['name'])):
+        index = loads.index(min(loads))
+        result[index].append(shard['name'])
+        loads[index] += shard['count']
+    return result
+
+
+def worker_shards(client):
+    """Get the shards of this worker process.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :returns: a list of shard names, or None if workers are not bound to
+        shards.
+    """
+    global _SLOT, _SHARDS
+    if not enabled():
+        return None
+    with _LOCK:
+        if _SHARDS is not None:
+            return _SHARDS
+        if CONF.baremetal.worker_shards:
+            _SHARDS = list(CONF.baremetal.worker_shards)
+            return _SHARDS
+
+        workers = CONF.baremetal.shard_workers
+        _SLOT = claim_slot(workers, _lock_dir())
+        _, body = client.get_shards(api_version=SHARDS_MICROVERSION)
+        # Nodes without a shard are listed with a name of None.
+        shards = [shard for shard in body['shards'] if shard['name']]
+        _SHARDS = distribute(shards, workers)[_SLOT[0]]
+        LOG.info('Worker slot %d of %d is bound to the shards %s',
+                 _SLOT[0], workers, ', '.join(_SHARDS) or '(none)')
+        return _SHARDS
@@ -0,0 +1,175 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cheap detection of SSH servers becoming reachable.
+
+A full SSH authentication is expensive and, while the instance is still
+booting, every attempt waits for its own timeout. Instead, non-blocking TCP
+connections are attempted with a short backoff, and once a connection is
+accepted the SSH banner is read. Only when the banner is seen does it make
+sense to authenticate. All targets are probed from a single thread, so many
+instances can be waited for at the same time.
+"""
+
+import errno
+import selectors
+import socket
+import time
+
+from oslo_log import log
+
+from ironic_tempest_plugin.common import timing
+
+LOG = log.getLogger(__name__)
+
+SSH_PORT = 22
+
+# How long a single connection attempt, including reading the banner, may
+# take.
+ATTEMPT_TIMEOUT = 3.0
+# The delay between the attempts on a target starts at INITIAL_DELAY and is
+# doubled after every failure up to MAX_DELAY.
+INITIAL_DELAY = 0.2
+MAX_DELAY = 2.0
+
+BANNER_PREFIX = b'SSH-'
+# RFC 4253 limits the identification string to 255 characters.
+MAX_BANNER = 255
+
+
+class _Target(object):
+
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.sock = None
+        self.deadline = None
+        self.next_attempt = 0.0
+        self.delay = INITIAL_DELAY
+        self.buffer = b''
+        self.attempts = 0
+
+    def close(self, now, failed=True):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.buffer = b''
+        if failed:
+            self.next_attempt = now + self.delay
+            self.delay = min(self.delay * 2, MAX_DELAY)
+
+
+def _connect(selector, target, now):
+    family = socket.AF_INET6 if ':' in target.address else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    target.attempts += 1
+    code = sock.connect_ex((target.address, target.port))
+    if code not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+        sock.close()
+        target.close(now)
+        return
+    target.sock = sock
+    target.deadline = now + ATTEMPT_TIMEOUT
+    selector.register(sock, selectors.EVENT_WRITE, target)
+
+
+def _handle(selector, target, events, now):
+    """Advance a target after a socket event.
+
+    :returns: the banner if it has been received, otherwise None.
+    """
+    sock = target.sock
+    if events & selectors.EVENT_WRITE:
+        error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            selector.unregister(sock)
+            target.close(now)
+            return None
+        # Connected, wait for the server to send its identification.
+        selector.modify(sock, selectors.EVENT_READ, target)
+        return None
+
+    try:
+        data = sock.recv(MAX_BANNER)
+    except OSError:
+        data = b''
+    if not data:
+        selector.unregister(sock)
+        target.close(now)
+        return None
+    target.buffer += data
+    if b'\n' not in target.buffer and len(target.buffer) < MAX_BANNER:
+        return None
+    selector.unregister(sock)
+    line = target.buffer.split(b'\n', 1)[0].rstrip(b'\r')
+    if line.startswith(BANNER_PREFIX):
+        target.close(now, failed=False)
+        return line.decode('ascii', 'replace')
+    # Servers may send other lines before the banner, but a server that
+    # does not start with it here is most likely not ready yet.
+    target.close(now)
+    return None
+
+
+def wait_for_banners(addresses, timeout, port=SSH_PORT):
+    """Wait for SSH servers to send their banners.
+
+    :param addresses: IP addresses of the targets.
+    :param timeout: how long to wait for all targets in seconds.
+    :param port: the SSH port.
+    :returns: a tuple (dictionary mapping the addresses that sent a banner to
+        the banner, set of addresses that did not within the timeout).
+    """
+    targets = {address: _Target(address, port) for address in addresses}
+    banners = {}
+    start = time.monotonic()
+    deadline = start + timeout
+    with selectors.DefaultSelector() as selector:
+        while True:
+            now = time.monotonic()
+            pending = [target for address, target in targets.items()
+                       if address not in banners]
+            if not pending or now >= deadline:
+                break
+            for target in pending:
+                if target.sock is None and now >= target.next_attempt:
+                    _connect(selector, target, now)
+                elif target.sock is not None and now >= target.deadline:
+                    selector.unregister(target.sock)
+                    target.close(now)
+
+            # Wake up for the next socket event, attempt or deadline.
+            wakeups = [deadline]
+            for target in pending:
+                wakeups.append(target.deadline if target.sock is not None
+                               else target.next_attempt)
+            wait = max(0.0, min(wakeups) - time.monotonic())
+            if not selector.get_map():
+                timing.sleep(wait)
+                continue
+            with timing.measure('sleep'):
+                ready = selector.select(wait)
+            for key, events in ready:
+                banner = _handle(selector, key.data, events,
+                                 time.monotonic())
+                if banner is not None:
+                    banners[key.data.address] = banner
+                    LOG.debug('SSH banner %s received from %s after %.1f '
+                              'seconds and %d attempts', banner,
+                              key.data.address, time.monotonic() - start,
+                              key.data.attempts)
+
+        for target in targets.values():
+            if target.sock is not None:
+                target.sock.close()
+    return banners, set(targets) - set(banners)
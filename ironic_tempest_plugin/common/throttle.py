@@ -0,0 +1,218 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Client-side limiting of the load put on the bare metal API.
+
+Requests are classified into reads, writes and state changes, and every
+class can be given a budget of requests per second with
+[baremetal]request_rate_limits, enforced with a token bucket per class.
+
+With [baremetal]adaptive_concurrency enabled, the number of requests in
+flight is additionally limited by an AIMD controller: the limit is halved when
+the API answers with 429 or 503 or when the latency rises well above the
+best latency seen, and it grows by one for every window of healthy requests.
+"""
+
+import contextlib
+import threading
+import time
+
+from oslo_log import log
+from tempest import config
+
+from ironic_tempest_plugin.common import timing
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+READ = 'read'
+WRITE = 'write'
+STATE = 'state'
+
+# Status codes meaning that the API is overloaded.
+OVERLOAD_STATUSES = frozenset([429, 503])
+
+# The latency is considered rising when its moving average exceeds the best
+# moving average seen by this factor.
+LATENCY_FACTOR = 2.0
+# Weight of a new sample in the moving average of the latency.
+LATENCY_SMOOTHING = 0.2
+
+_LOCK = threading.Lock()
+_THROTTLE = None
+
+
+def classify(method, url):
+    """Classify a request.
+
+    :param method: the HTTP method.
+    :param url: the URL of the request.
+    :returns: READ, WRITE or STATE.
+    """
+    if method in ('GET', 'HEAD', 'OPTIONS'):
+        return READ
+    path = url.split('?', 1)[0]
+    if '/states/' in path or path.endswith('/vendor_passthru'):
+        return STATE
+    return WRITE
+
+
+class TokenBucket(object):
+    """A token bucket allowing a rate of calls with bursts.
+
+    :param rate: the number of tokens added per second.
+    :param burst: the maximum number of tokens, defaults to rate.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token, returning how long to wait until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens
+                               + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            timing.sleep(delay)
+
+
+class AIMDLimiter(object):
+    """A concurrency limit with additive increase, multiplicative decrease.
+
+    :param initial: the initial limit.
+    :param minimum: the lowest limit.
+    :param maximum: the highest limit.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self._healthy = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, overloaded=False):
+        """Release a slot and adjust the limit.
+
+        :param latency: the latency of the request in seconds.
+        :param overloaded: whether the API reported being overloaded.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+            if self.best_latency is None or self.latency < self.best_latency:
+                self.best_latency = self.latency
+
+            if (overloaded
+                    or self.latency > self.best_latency * LATENCY_FACTOR):
+                previous = self.limit
+                self.limit = max(self.minimum, self.limit / 2)
+                self._healthy = 0
+                if int(previous) != int(self.limit):
+                    LOG.debug('Decreasing the request concurrency to %d '
+                              '(overloaded: %s, latency %.3fs)',
+                              self.limit, overloaded, self.latency)
+                    # Do not halve again because of the same slow period.
+                    self.best_latency = self.latency / LATENCY_FACTOR
+            else:
+                self._healthy += 1
+                if self._healthy >= int(self.limit):
+                    self._healthy = 0
+                    self.limit = min(self.maximum, self.limit + 1)
+            self._condition.notify_all()
+
+
+class Throttle(object):
+    """Rate and concurrency limits of all requests of a process.
+
+    Every class of requests has its own concurrency limit, so that slow
+    state changes do not hold back cheap reads.
+
+    :param rates: a dictionary mapping request classes to requests per
+        second; classes that are not present are not rate limited.
+    :param concurrency: the initial and maximum number of requests in flight
+        per class or None to not limit the concurrency.
+    """
+
+    def __init__(self, rates, concurrency=None):
+        self.buckets = {cls: TokenBucket(rate)
+                        for cls, rate in rates.items() if rate > 0}
+        self.limiters = ({cls: AIMDLimiter(concurrency, maximum=concurrency)
+                          for cls in (READ, WRITE, STATE)}
+                         if concurrency else {})
+
+    @contextlib.contextmanager
+    def request(self, method, url):
+        """Wrap a request, waiting until it may be made.
+
+        The wrapped block should set the status key of the yielded
+        dictionary to the status code of the response.
+        """
+        request_class = classify(method, url)
+        bucket = self.buckets.get(request_class)
+        if bucket is not None:
+            bucket.acquire()
+        limiter = self.limiters.get(request_class)
+        if limiter is None:
+            yield {}
+            return
+
+        with timing.measure('sleep'):
+            limiter.acquire()
+        result = {}
+        start = time.monotonic()
+        try:
+            yield result
+        finally:
+            limiter.release(
+                time.monotonic() - start,
+                overloaded=result.get('status') in OVERLOAD_STATUSES)
+
+
+def get():
+    """Get the throttle of this process, or None if it is disabled."""
+    global _THROTTLE
+    rates = CONF.baremetal.request_rate_limits
+    concurrency = (CONF.baremetal.max_concurrent_requests
+                   if CONF.baremetal.adaptive_concurrency else None)
+    if not rates and not concurrency:
+        return None
+    with _LOCK:
+        if _THROTTLE is None:
+            _THROTTLE = Throttle(rates, concurrency)
+        return _THROTTLE
@@ -0,0 +1,259 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""State transition timelines of the nodes the tests wait on.
+
+When [baremetal]timelines_dir is set, every state observed by
+wait_for_bm_node_status is recorded. At the end of every wait the node
+history is merged in, the time spent and the history events recorded by the
+conductors in every provision state are calculated and the timeline is saved
+as a JSON file. The timelines of a run can be aggregated per driver and
+interface combination with::
+
+    python -m ironic_tempest_plugin.common.timeline <timelines_dir>
+"""
+
+import argparse
+import bisect
+import collections
+import glob
+import os
+import sys
+import threading
+
+from oslo_log import log
+from oslo_serialization import jsonutils as json
+from oslo_utils import timeutils
+from tempest import config
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import benchmark
+from ironic_tempest_plugin.services.baremetal import base
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+# Node fields that define the combination the timelines are aggregated by.
+COMBINATION_FIELDS = ('driver', 'boot_interface', 'deploy_interface',
+                      'network_interface', 'power_interface')
+
+STATE_FIELDS = ('provision_state', 'power_state', 'target_provision_state')
+
+# The first microversion of the node history API.
+HISTORY_MICROVERSION = '1.78'
+
+_TIMELINES = {}
+_LOCK = threading.Lock()
+
+
+def enabled():
+    return bool(CONF.baremetal.timelines_dir)
+
+
+def get(node_id):
+    """Get the timeline of a node, creating it if needed.
+
+    :param node_id: UUID or name of the node.
+    :returns: a Timeline object or None if timelines are disabled.
+    """
+    if not enabled():
+        return None
+    with _LOCK:
+        if node_id not in _TIMELINES:
+            _TIMELINES[node_id] = Timeline(node_id)
+        return _TIMELINES[node_id]
+
+
+class Timeline(object):
+    """Observed states and history events of a node."""
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.uuid = None
+        self.combination = {}
+        self.observations = []
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def observe(self, node):
+        """Record the state of a node if it has changed.
+
+        :param node: the node as returned by the API.
+        """
+        state = tuple(node.get(field) for field in STATE_FIELDS)
+        with self._lock:
+            self.uuid = node.get('uuid', self.uuid)
+            self.combination.update(
+                (field, node[field]) for field in COMBINATION_FIELDS
+                if node.get(field))
+            if self.observations and self.observations[-1][1:] == state:
+                return
+            self.observations.append((timeutils.utcnow(),) + state)
+
+    def merge_history(self, client):
+        """Merge in the node history events not seen yet.
+
+        :param client: an instance of tempest plugin BaremetalClient.
+        """
+        if self.uuid is None:
+            return
+        try:
+            with base.microversion_at_least(HISTORY_MICROVERSION):
+                _, body = client.list_node_history(self.uuid)
+        except lib_exc.RestClientException as exc:
+            # Either the node is gone or the API is too old.
+            LOG.debug('Cannot fetch the history of node %s: %s',
+                      self.uuid, exc)
+            return
+        with self._lock:
+            for event in body.get('history', ()):
+                self.events.setdefault(event['uuid'], event)
+
+    def phases(self):
+        """Calculate the time spent in every provision state.
+
+        The last observed state is not included since its end is unknown.
+
+        :returns: a dictionary mapping provision states to seconds.
+        """
+        result = collections.defaultdict(float)
+        with self._lock:
+            observations = list(self.observations)
+        for current, following in zip(observations, observations[1:]):
+            result[current[1]] += (following[0] - current[0]).total_seconds()
+        return dict(result)
+
+    def phase_events(self):
+        """Count the history events recorded in every provision state.
+
+        Events older than the first observation are not included since the
+        state of the node is unknown then.
+
+        :returns: a dictionary mapping provision states to numbers of events.
+        """
+        result = collections.Counter()
+        with self._lock:
+            observations = list(self.observations)
+            events = list(self.events.values())
+        timestamps = [item[0] for item in observations]
+        for event in events:
+            created_at = timeutils.normalize_time(
+                timeutils.parse_isotime(event['created_at']))
+            index = bisect.bisect_right(timestamps, created_at) - 1
+            if index >= 0:
+                result[observations[index][1]] += 1
+        return dict(result)
+
+    def as_dict(self):
+        with self._lock:
+            observations = [
+                dict(zip(('timestamp',) + STATE_FIELDS,
+                         (item[0].isoformat(),) + item[1:]))
+                for item in self.observations]
+            events = sorted(self.events.values(),
+                            key=lambda event: event['created_at'])
+        return {
+            'node': self.uuid or self.node_id,
+            'combination': dict(self.combination),
+            'observations': observations,
+            'events': [{key: event.get(key)
+                        for key in ('created_at', 'event_type', 'severity',
+                                    'event', 'conductor')}
+                       for event in events],
+            'phases': self.phases(),
+            'phase_events': self.phase_events(),
+        }
+
+    def flush(self, client):
+        """Merge in the node history and save the timeline.
+
+        :param client: an instance of tempest plugin BaremetalClient.
+        """
+        self.merge_history(client)
+        timelines_dir = CONF.baremetal.timelines_dir
+        os.makedirs(timelines_dir, exist_ok=True)
+        path = os.path.join(timelines_dir,
+                            'timeline-%s.json' % (self.uuid or self.node_id))
+        with open(path, 'w') as fp:
+            fp.write(json.dumps(self.as_dict(), indent=2))
+
+
+def combination_key(timeline):
+    return '/'.join(timeline['combination'].get(field) or '-'
+                    for field in COMBINATION_FIELDS)
+
+
+def aggregate(timelines):
+    """Aggregate phase durations per driver and interface combination.
+
+    :param timelines: a list of timelines as returned by Timeline.as_dict.
+    :returns: a dictionary mapping combination keys to dictionaries mapping
+        provision states to statistics of their durations and the number of
+        history events recorded in them.
+    """
+    durations = collections.defaultdict(lambda: collections.defaultdict(list))
+    events = collections.defaultdict(collections.Counter)
+    for timeline in timelines:
+        key = combination_key(timeline)
+        for state, seconds in timeline['phases'].items():
+            durations[key][state].append(seconds)
+        events[key].update(timeline.get('phase_events', {}))
+
+    result = {}
+    for key, phases in durations.items():
+        result[key] = {}
+        for state, samples in phases.items():
+            samples.sort()
+            result[key][state] = {
+                'count': len(samples),
+                'mean': sum(samples) / len(samples),
+                'p50': benchmark.percentile(samples, 50),
+                'max': samples[-1],
+                'events': events[key][state],
+            }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Aggregate the node timelines collected by the bare '
+                    'metal tempest plugin.')
+    parser.add_argument('timelines_dir',
+                        help='the value of [baremetal]timelines_dir')
+    args = parser.parse_args(argv)
+
+    timelines = []
+    for path in sorted(glob.glob(os.path.join(args.timelines_dir,
+                                              'timeline-*.json'))):
+        with open(path) as fp:
+            timelines.append(json.loads(fp.read()))
+    if not timelines:
+        sys.exit('No timelines found in %s' % args.timelines_dir)
+
+    row = '%-24s %6s %9s %9s %9s %6s\n'
+    for key, phases in sorted(aggregate(timelines).items()):
+        sys.stdout.write('%s\n' % key)
+        sys.stdout.write(row % ('state', 'count', 'mean', 'p50', 'max',
+                                'events'))
+        for state, stats in sorted(phases.items(),
+                                   key=lambda item: -item[1]['mean']):
+            sys.stdout.write(row % (state, stats['count'],
+                                    '%.1f' % stats['mean'],
+                                    '%.1f' % stats['p50'],
+                                    '%.1f' % stats['max'],
+                                    stats['events']))
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Attribution of the wall clock time of tests.
+
+The wall clock time of every test and of the class-wide setup and cleanup is
+split into the time spent in HTTP requests of the bare metal clients, the
+time spent sleeping while polling and everything else. The breakdown of a
+test is attached to it as the ``timings`` subunit detail, and every worker
+process appends all breakdowns to a file in [baremetal]timings_dir, which can
+be summarized with::
+
+    python -m ironic_tempest_plugin.common.timing <timings_dir>
+"""
+
+import argparse
+import contextlib
+import glob
+import os
+import sys
+import threading
+import time
+import unittest
+
+import fixtures
+from oslo_serialization import jsonutils as json
+from tempest import config
+from testtools import content
+
+CONF = config.CONF
+
+# NOTE: like the API microversion, the current timings are global: tests run
+# in separate processes, and requests made by helper threads of a test should
+# be attributed to this test.
+_CURRENT = None
+_LOCK = threading.Lock()
+
+CATEGORIES = ('http', 'sleep')
+
+
+class Timings(object):
+    """Time breakdown of a test or of a class-wide phase."""
+
+    def __init__(self, name, phase):
+        self.name = name
+        self.phase = phase
+        self.started_at = time.monotonic()
+        self.wall = None
+        self.requests = 0
+        self.totals = dict.fromkeys(CATEGORIES, 0.0)
+        self.error = None
+
+    def add(self, category, duration):
+        with _LOCK:
+            self.totals[category] += duration
+            if category == 'http':
+                self.requests += 1
+
+    def stop(self):
+        if self.wall is None:
+            self.wall = time.monotonic() - self.started_at
+
+    def as_dict(self):
+        wall = self.wall
+        if wall is None:
+            wall = time.monotonic() - self.started_at
+        with _LOCK:
+            result = dict(self.totals)
+            requests = self.requests
+        # Requests from several threads may overlap, so the sum of the
+        # categories can exceed the wall clock time.
+        other = max(wall - sum(result.values()), 0.0)
+        result.update(name=self.name, phase=self.phase, wall=wall,
+                      requests=requests, other=other)
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+def enabled():
+    return CONF.baremetal.collect_timings
+
+
+def record(category, duration):
+    """Attribute the duration to the currently running test or phase."""
+    current = _CURRENT
+    if current is not None:
+        current.add(category, duration)
+
+
+@contextlib.contextmanager
+def measure(category):
+    """Attribute the time spent in the wrapped block to a category."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        record(category, time.monotonic() - start)
+
+
+def sleep(seconds):
+    """Sleep, accounting the time as spent polling."""
+    with measure('sleep'):
+        time.sleep(seconds)
+
+
+def _start(name, phase):
+    global _CURRENT
+    previous = _CURRENT
+    _CURRENT = Timings(name, phase)
+    return _CURRENT, previous
+
+
+def _finish(timings, previous):
+    global _CURRENT
+    timings.stop()
+    _CURRENT = previous
+    _write(timings.as_dict())
+
+
+@contextlib.contextmanager
+def phase(name, phase):
+    """Collect the timings of a class-wide phase, e.g. resource_setup.
+
+    :param name: the name of the test class.
+    :param phase: the name of the phase.
+    """
+    global _CURRENT
+    if not enabled():
+        yield None
+        return
+
+    timings, previous = _start(name, phase)
+    try:
+        yield timings
+    except unittest.SkipTest:
+        # Skipped classes are of no interest.
+        _CURRENT = previous
+        raise
+    except Exception as exc:
+        timings.error = exc.__class__.__name__
+        raise
+    finally:
+        if _CURRENT is timings:
+            _finish(timings, previous)
+
+
+def _write(data):
+    timings_dir = CONF.baremetal.timings_dir
+    if not timings_dir:
+        return
+    os.makedirs(timings_dir, exist_ok=True)
+    path = os.path.join(timings_dir, 'timings-%d.jsonl' % os.getpid())
+    with _LOCK, open(path, 'a') as fp:
+        fp.write(json.dumps(data) + '\n')
+
+
+class TimingFixture(fixtures.Fixture):
+    """Collect the timings of a test and attach them as a detail.
+
+    The fixture should be used as early as possible in setUp, so that its
+    cleanup runs after all other cleanups of the test.
+
+    :param test: the test case.
+    :param setup_timings: optionally, the timings of the class-wide setup,
+        they are included in the detail for reference.
+    """
+
+    def __init__(self, test, setup_timings=None):
+        super(TimingFixture, self).__init__()
+        self.test = test
+        self.setup_timings = setup_timings
+
+    def _setUp(self):
+        self.timings, previous = _start(self.test.id(), 'test')
+        self.addCleanup(_finish, self.timings, previous)
+        # The detail is serialized lazily when the result is reported, i.e.
+        # after the cleanups have run.
+        self.test.addDetail('timings', content.Content(
+            content.ContentType('application', 'json', {'charset': 'utf8'}),
+            self._serialize))
+
+    def _serialize(self):
+        data = {'test': self.timings.as_dict()}
+        if self.setup_timings is not None:
+            data['resource_setup'] = self.setup_timings.as_dict()
+        return [json.dump_as_bytes(data)]
+
+
+def load(timings_dir):
+    """Load all timings recorded in a directory.
+
+    :param timings_dir: the directory with timings-*.jsonl files.
+    :returns: a list of dictionaries.
+    """
+    records = []
+    for path in sorted(glob.glob(os.path.join(timings_dir,
+                                              'timings-*.jsonl'))):
+        with open(path) as fp:
+            records.extend(json.loads(line) for line in fp if line.strip())
+    return records
+
+
+def report(records, top=20, stream=sys.stdout):
+    """Print the totals and the worst offenders by time spent sleeping."""
+    totals = {key: sum(item[key] for item in records)
+              for key in ('wall', 'http', 'sleep', 'other', 'requests')}
+    stream.write('%d records: wall %.1fs, http %.1fs (%d requests), '
+                 'sleep %.1fs, other %.1fs\n\n'
+                 % (len(records), totals['wall'], totals['http'],
+                    totals['requests'], totals['sleep'], totals['other']))
+
+    row = '%-16s %9s %9s %9s %6s  %s\n'
+    stream.write(row % ('phase', 'wall', 'http', 'sleep', 'sleep%', 'name'))
+    worst = sorted(records, key=lambda item: item['sleep'], reverse=True)
+    for item in worst[:top]:
+        share = 100.0 * item['sleep'] / item['wall'] if item['wall'] else 0
+        stream.write(row % (item['phase'], '%.1f' % item['wall'],
+                            '%.1f' % item['http'], '%.1f' % item['sleep'],
+                            '%.0f' % share, item['name']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Summarize the timings collected by the bare metal '
+                    'tempest plugin.')
+    parser.add_argument('timings_dir',
+                        help='the value of [baremetal]timings_dir')
+    parser.add_argument('--top', type=int, default=20,
+                        help='how many worst offenders to list')
+    args = parser.parse_args(argv)
+
+    records = load(args.timings_dir)
+    if not records:
+        sys.exit('No timings found in %s' % args.timings_dir)
+    report(records, top=args.top)
+
+
+if __name__ == '__main__':
+    main()
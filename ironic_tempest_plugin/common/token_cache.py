@@ -0,0 +1,162 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Sharing of Keystone tokens between the clients of the same credentials.
+
+Every test class gets its own client managers, and every auth provider
+requests its own token. With [baremetal]token_cache enabled, the tokens are
+cached by credential identity and scope, so that all auth providers of the
+same credentials in a worker process reuse one token until it is about to
+expire. With [baremetal]token_cache_dir set, the tokens are also shared
+between the worker processes, with a file lock ensuring that only one of
+them authenticates.
+
+This mostly pays off with pre-provisioned credentials, dynamic credentials
+are different for every test class.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import threading
+
+from oslo_log import log
+from oslo_serialization import jsonutils as json
+from tempest import config
+from tempest.lib.services import clients
+
+LOG = log.getLogger(__name__)
+
+CONF = config.CONF
+
+# Credential fields identifying a user and the scope of its tokens.
+IDENTITY_FIELDS = ('user_id', 'username', 'user_domain_id',
+                   'user_domain_name', 'project_id', 'project_name',
+                   'project_domain_id', 'project_domain_name', 'domain_id',
+                   'domain_name', 'system')
+
+_TOKENS = {}
+_LOCKS = {}
+_LOCK = threading.Lock()
+
+
+def enabled():
+    return CONF.baremetal.token_cache
+
+
+def cache_key(auth_provider):
+    """Build the cache key of an auth provider.
+
+    :param auth_provider: a tempest auth provider.
+    :returns: a hexadecimal digest of the identity, the scope and the
+        identity service.
+    """
+    credentials = auth_provider.credentials
+    identity = {field: getattr(credentials, field, None)
+                for field in IDENTITY_FIELDS}
+    identity['scope'] = getattr(auth_provider, 'scope', None)
+    identity['auth_url'] = getattr(auth_provider.auth_client, 'auth_url',
+                                   None)
+    return hashlib.sha256(
+        json.dump_as_bytes(identity, sort_keys=True)).hexdigest()
+
+
+def _path(key, suffix):
+    return os.path.join(CONF.baremetal.token_cache_dir,
+                        'token-%s.%s' % (key, suffix))
+
+
+@contextlib.contextmanager
+def _locked(key):
+    """Serialize the authentication of the same credentials."""
+    with _LOCK:
+        lock = _LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        if not CONF.baremetal.token_cache_dir:
+            yield
+            return
+        os.makedirs(CONF.baremetal.token_cache_dir, mode=0o700,
+                    exist_ok=True)
+        with open(_path(key, 'lock'), 'a') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+def _read(key):
+    """Read a token saved by another worker process."""
+    if not CONF.baremetal.token_cache_dir:
+        return None
+    try:
+        with open(_path(key, 'json')) as fp:
+            token, auth_data = json.loads(fp.read())
+    except (OSError, ValueError):
+        return None
+    return token, auth_data
+
+
+def _save(key, auth):
+    _TOKENS[key] = auth
+    if not CONF.baremetal.token_cache_dir:
+        return
+    path = _path(key, 'json')
+    # Tokens are secrets, only the owner may read them.
+    fd = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as fp:
+        fp.write(json.dumps(list(auth)))
+    os.replace(path + '.tmp', path)
+
+
+def share(auth_provider):
+    """Make an auth provider use the shared token cache.
+
+    :param auth_provider: a tempest auth provider.
+    """
+    if getattr(auth_provider, '_token_cache_key', None):
+        return
+    key = cache_key(auth_provider)
+    authenticate = auth_provider._get_auth
+
+    def _get_auth():
+        with _locked(key):
+            # Another worker may have refreshed an expired token already.
+            for load in (_TOKENS.get, _read):
+                auth = load(key)
+                if auth is not None and not auth_provider.is_expired(auth):
+                    _TOKENS[key] = auth
+                    return auth
+            LOG.debug('Requesting a new token for %s',
+                      auth_provider.credentials)
+            auth = authenticate()
+            _save(key, auth)
+            return auth
+
+    auth_provider._get_auth = _get_auth
+    auth_provider._token_cache_key = key
+
+
+def share_managers(owner):
+    """Make all client managers of a test class use the token cache.
+
+    :param owner: a test class, its os_* attributes are inspected.
+    """
+    if not enabled():
+        return
+    for name in dir(owner):
+        if not name.startswith('os_'):
+            continue
+        manager = getattr(owner, name, None)
+        if isinstance(manager, clients.ServiceClients):
+            share(manager.auth_provider)
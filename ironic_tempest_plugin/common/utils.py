@@ -10,6 +10,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from concurrent import futures
+import threading
+import time
+
+from oslo_log import log as logging
+
+from ironic_tempest_plugin.common import timing
+
+LOG = logging.getLogger(__name__)
+
 
 def get_node(client, node_id=None, instance_uuid=None, api_version=None):
     """Get a node by its identifier or instance UUID.
@@ -33,3 +43,94 @@ def get_node(client, node_id=None, instance_uuid=None, api_version=None):
                                                     api_version=api_version)
         if body['nodes']:
             return body['nodes'][0]
+
+
+def run_concurrently(func, items, concurrency=1):
+    """Call a function for every item using a pool of threads.
+
+    Tempest REST clients can be shared between threads, so this is suitable
+    for fanning out independent API calls.
+
+    :param func: a callable accepting a single item.
+    :param items: an iterable of items to pass to func.
+    :param concurrency: maximum number of calls running at the same time.
+    :returns: a list of results in the same order as items.
+    :raises: the first exception raised by any call, after all calls finish.
+    """
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with futures.ThreadPoolExecutor(
+            max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+def list_all_nodes(client, **params):
+    """List all nodes matching the filters, following the pages.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param params: parameters of list_nodes, e.g. filters or fields.
+    :returns: a list of nodes.
+    """
+    nodes = []
+    marker = None
+    while True:
+        if marker:
+            params['marker'] = marker
+        _, body = client.list_nodes(**params)
+        nodes.extend(body['nodes'])
+        if not body['nodes'] or not body.get('next'):
+            return nodes
+        marker = body['nodes'][-1]['uuid']
+
+
+def start_in_background(func, *args, **kwargs):
+    """Call a function in a background thread.
+
+    :param func: a callable.
+    :param args: positional arguments of func.
+    :param kwargs: keyword arguments of func.
+    :returns: a Future of the result of func.
+    """
+    future = futures.Future()
+
+    def _run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=_run, daemon=True,
+                     name=getattr(func, '__name__', None)).start()
+    return future
+
+
+def call_until_true(func, duration, sleep_for, *args, **kwargs):
+    """Call the given function until it returns True or the time runs out.
+
+    Same as tempest.lib.common.utils.test_utils.call_until_true, but the time
+    spent sleeping is accounted in the test timings.
+
+    :param func: a callable returning a boolean.
+    :param duration: the number of seconds to wait for func to return True.
+    :param sleep_for: the number of seconds to sleep between the calls.
+    :param args: positional arguments of func.
+    :param kwargs: keyword arguments of func.
+    :returns: True if func returned True within the duration, False otherwise.
+    """
+    begin = time.monotonic()
+    deadline = begin + duration
+    while True:
+        if func(*args, **kwargs):
+            LOG.debug('Call %s returned True after %.2f seconds',
+                      getattr(func, '__name__', func),
+                      time.monotonic() - begin)
+            return True
+        if time.monotonic() >= deadline:
+            break
+        timing.sleep(sleep_for)
+    LOG.debug('Call %s returned False after %.2f seconds',
+              getattr(func, '__name__', func), time.monotonic() - begin)
+    return False
@@ -12,13 +12,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 from oslo_log import log
 from tempest import config
 from tempest.lib.common.utils import test_utils
 from tempest.lib import exceptions as lib_exc
 
+from ironic_tempest_plugin.common import history
+from ironic_tempest_plugin.common import timeline as node_timeline
+from ironic_tempest_plugin.common import timing
 from ironic_tempest_plugin.common import utils
 from ironic_tempest_plugin import exceptions as ironic_exc
+from ironic_tempest_plugin.services.baremetal import base as client_base
 
 LOG = log.getLogger(__name__)
 
@@ -48,7 +54,8 @@ def _determine_and_check_timeout_interval(timeout, default_timeout,
 
 
 def wait_for_bm_node_status(client, node_id, attr, status, timeout=None,
-                            interval=None, abort_on_error_state=False):
+                            interval=None, abort_on_error_state=False,
+                            timeline=None):
     """Waits for a baremetal node attribute to reach given status.
 
     :param client: an instance of tempest plugin BaremetalClient.
@@ -61,17 +68,27 @@ def wait_for_bm_node_status(client, node_id, attr, status, timeout=None,
         Defaults to client.build_interval.
     :param abort_on_error_state: whether to abort waiting if the node reaches
         an error state.
+    :param timeline: a Timeline object to record the observed states in.
+        Defaults to the timeline of the node if [baremetal]timelines_dir is
+        set.
 
     The client should have a show_node(node_id) method to get the node.
     """
     timeout, interval = _determine_and_check_timeout_interval(
         timeout, client.build_timeout, interval, client.build_interval)
+    if timeline is None:
+        timeline = node_timeline.get(node_id)
 
     if not isinstance(status, list):
         status = [status]
+    # The last observed node and the outcome of the wait for the history.
+    last = {'node': node_id, 'outcome': 'timeout'}
 
     def is_attr_in_status():
         node = utils.get_node(client, node_id=node_id)
+        last['node'] = node
+        if timeline is not None:
+            timeline.observe(node)
         if node[attr] in status:
             return True
         elif (abort_on_error_state
@@ -84,11 +101,33 @@ def wait_for_bm_node_status(client, node_id, attr, status, timeout=None,
                     'attr': attr, 'expected': status,
                     'error': node.get('last_error')})
             LOG.debug(msg)
+            last['outcome'] = node['provision_state']
             raise lib_exc.TempestException(msg)
         return False
 
-    if not test_utils.call_until_true(is_attr_in_status, timeout,
-                                      interval):
+    start = time.monotonic()
+    try:
+        finished = utils.call_until_true(is_attr_in_status, timeout, interval)
+        if finished:
+            last['outcome'] = history.SUCCESS
+    except Exception as exc:
+        if last['outcome'] == 'timeout':
+            last['outcome'] = exc.__class__.__name__
+        raise
+    finally:
+        if timeline is not None:
+            try:
+                timeline.flush(client)
+            except Exception:
+                # Must not replace the outcome of the wait.
+                LOG.exception('Cannot save the timeline of node %s', node_id)
+        history.record_wait(
+            client, last['node'],
+            'wait:%s=%s' % (attr, '|'.join(str(item) for item in status)),
+            time.monotonic() - start, last['outcome'],
+            microversion=client_base.current_microversion())
+
+    if not finished:
         message = ('Node %(node_id)s failed to reach %(attr)s=%(status)s '
                    'within the required time (%(timeout)s s).' %
                    {'node_id': node_id,
@@ -121,8 +160,8 @@ def wait_node_instance_association(client, instance_uuid, timeout=None,
         node = utils.get_node(client, instance_uuid=instance_uuid)
         return node is not None
 
-    if not test_utils.call_until_true(is_some_node_associated, timeout,
-                                      interval):
+    if not utils.call_until_true(is_some_node_associated, timeout,
+                                 interval):
         msg = ('Timed out waiting to get Ironic node by instance UUID '
                '%(instance_uuid)s within the required time (%(timeout)s s).'
                % {'instance_uuid': instance_uuid, 'timeout': timeout})
@@ -155,7 +194,7 @@ def wait_for_allocation(client, allocation_ident, timeout=15, interval=1,
         else:
             return allocation['state'] != 'allocating'
 
-    if not test_utils.call_until_true(check, timeout, interval):
+    if not utils.call_until_true(check, timeout, interval):
         msg = ('Timed out waiting for the allocation %s to become active' %
                allocation_ident)
         raise lib_exc.TimeoutException(msg)
@@ -163,6 +202,195 @@ def wait_for_allocation(client, allocation_ident, timeout=15, interval=1,
     return result[0]
 
 
+def wait_for_allocations(client, allocation_idents, timeout=15, interval=1,
+                         callback=None):
+    """Wait for several allocations to finish processing.
+
+    Instead of showing every allocation on every check, the list of
+    allocations in the 'allocating' state is fetched once per interval, and
+    only the allocations that left it are shown.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param allocation_idents: UUIDs of the allocations.
+    :param timeout: the timeout after which the allocations are considered as
+        failed. Defaults to 15 seconds.
+    :param interval: an interval between list_allocations calls.
+        Defaults to 1 second.
+    :param callback: a callable invoked with every allocation as soon as it
+        is noticed to be no longer allocating.
+    :returns: a dictionary mapping UUIDs to the finished allocations, which
+        may be either active or in error.
+    """
+    pending = set(allocation_idents)
+    finished = {}
+
+    def check():
+        allocating = set()
+        marker = None
+        while True:
+            params = {'state': 'allocating', 'fields': 'uuid'}
+            if marker:
+                params['marker'] = marker
+            _, body = client.list_allocations(**params)
+            allocating.update(item['uuid'] for item in body['allocations'])
+            if not body['allocations'] or not body.get('next'):
+                break
+            marker = body['allocations'][-1]['uuid']
+
+        for ident in pending - allocating:
+            _, allocation = client.show_allocation(ident)
+            if allocation['state'] == 'allocating':
+                continue
+            pending.discard(ident)
+            finished[ident] = allocation
+            if callback is not None:
+                callback(allocation)
+        return not pending
+
+    if not utils.call_until_true(check, timeout, interval):
+        msg = ('Timed out waiting for the allocations %s to become active' %
+               ', '.join(sorted(pending)))
+        raise lib_exc.TimeoutException(msg)
+
+    return finished
+
+
+# Below this number of pending nodes, they are shown one by one instead of
+# listing all nodes.
+SHOW_PENDING_LIMIT = 10
+
+POWER_FIELDS = ('uuid', 'power_state', 'target_power_state', 'last_error')
+
+
+def wait_for_power_states(client, node_ids, power_state, timeout=None,
+                          interval=1, callback=None, filters=None):
+    """Wait for several nodes to finish a power state change.
+
+    Instead of showing every node on every check, the power states of the
+    nodes matching the filters are listed once per interval. Once only a few
+    nodes are pending, they are shown one by one instead.
+
+    :param client: an instance of tempest plugin BaremetalClient.
+    :param node_ids: UUIDs of the nodes.
+    :param power_state: the expected power state, e.g. 'power on'.
+    :param timeout: the timeout after which the power state changes are
+        considered as failed. Defaults to [baremetal]power_timeout.
+    :param interval: an interval between list_nodes calls.
+    :param callback: a callable invoked with every node as soon as it is
+        noticed to have no target power state any more.
+    :param filters: node list filters matching the nodes, e.g. the ones the
+        nodes were selected with, to avoid listing the whole fleet.
+    :returns: a dictionary mapping UUIDs to the nodes, which are either in
+        the expected power state or have last_error set.
+    """
+    if timeout is None:
+        timeout = CONF.baremetal.power_timeout
+    pending = set(node_ids)
+    finished = {}
+
+    def _show(node_id):
+        return utils.get_node(client, node_id=node_id)
+
+    def check():
+        if len(pending) <= SHOW_PENDING_LIMIT:
+            nodes = utils.run_concurrently(_show, sorted(pending),
+                                           len(pending))
+        else:
+            with client_base.microversion_at_least('1.8'):
+                nodes = utils.list_all_nodes(
+                    client, fields=','.join(POWER_FIELDS), **(filters or {}))
+        for node in nodes:
+            if node['uuid'] not in pending or node['target_power_state']:
+                continue
+            # Without the target, the state may still be the old one if the
+            # change failed.
+            if node['power_state'] != power_state and not node['last_error']:
+                continue
+            pending.discard(node['uuid'])
+            finished[node['uuid']] = node
+            if callback is not None:
+                callback(node)
+        return not pending
+
+    if not utils.call_until_true(check, timeout, interval):
+        msg = ('Timed out waiting for the nodes %(nodes)s to reach the power '
+               'state %(state)s' % {'nodes': ', '.join(sorted(pending)),
+                                    'state': power_state})
+        raise lib_exc.TimeoutException(msg)
+
+    return finished
+
+
+def _list_introspection_statuses(client, node_ids):
+    """Get the introspection statuses of the given nodes.
+
+    Pages are fetched until all nodes are found or there are no more pages.
+    """
+    statuses = {}
+    marker = None
+    while True:
+        params = {'marker': marker} if marker else {}
+        _, body = client.list_statuses(**params)
+        page = body['introspection']
+        statuses.update((status['uuid'], status) for status in page
+                        if status['uuid'] in node_ids)
+        if (not page or page[-1]['uuid'] == marker
+                or len(statuses) == len(node_ids)):
+            return statuses
+        marker = page[-1]['uuid']
+
+
+def wait_for_introspection(client, node_ids, timeout, interval,
+                           start_timeout=None):
+    """Wait for introspection of several nodes to finish.
+
+    Instead of getting the status of every node on every check, the statuses
+    of all nodes are listed once per interval.
+
+    :param client: an instance of tempest plugin BaremetalIntrospectionClient.
+    :param node_ids: UUIDs of the nodes.
+    :param timeout: the timeout after which the introspection is considered
+        as failed.
+    :param interval: an interval between list_statuses calls.
+    :param start_timeout: how long a node may be missing from the
+        introspection API. Defaults to timeout.
+    :returns: a generator of statuses of the nodes that finished
+        introspection, either successfully or with an error, in the order they
+        are noticed.
+    :raises: IntrospectionFailed if a node does not appear in the
+        introspection API within start_timeout.
+    :raises: IntrospectionTimeout if some nodes do not finish introspection
+        within the timeout.
+    """
+    if start_timeout is None:
+        start_timeout = timeout
+    pending = set(node_ids)
+    start = time.monotonic()
+
+    while pending:
+        timing.sleep(interval)
+        statuses = _list_introspection_statuses(client, pending)
+        elapsed = time.monotonic() - start
+
+        missing = pending - set(statuses)
+        if missing and elapsed >= start_timeout:
+            raise ironic_exc.IntrospectionFailed(
+                'Nodes %(nodes)s did not appear in the baremetal '
+                'introspection API after %(timeout)d seconds' %
+                {'nodes': ', '.join(sorted(missing)),
+                 'timeout': start_timeout})
+
+        for node_id, status in statuses.items():
+            if status['finished']:
+                pending.discard(node_id)
+                yield status
+
+        if pending and elapsed >= timeout:
+            raise ironic_exc.IntrospectionTimeout(
+                'Introspection timed out for nodes: %s' %
+                ', '.join(sorted(pending)))
+
+
 def wait_node_value_in_field(client, node_id, field, value,
                              raise_if_insufficent_access=True,
                              timeout=None, interval=None,
@@ -197,8 +425,8 @@ def wait_node_value_in_field(client, node_id, field, value,
             raise lib_exc.TempestException(msg)
         return value in field_value
 
-    if not test_utils.call_until_true(is_field_updated, timeout,
-                                      interval):
+    if not utils.call_until_true(is_field_updated, timeout,
+                                 interval):
         msg = ('Timed out waiting to get Ironic node by node_id '
                '%(node_id)s within the required time (%(timeout)s s). '
                'Field value %(value) did not appear in field %(field)s.'
@@ -16,6 +16,7 @@
 #    under the License.
 
 from oslo_config import cfg
+from oslo_config import types
 
 from tempest import config  # noqa
 
@@ -24,6 +25,25 @@ _INSPECTOR_REASON = ('ironic-inspector was retired in favor of the built-in'
                      'agent inspect interface.')
 
 
+class _RequestRates(types.Dict):
+    """Requests per second per class of bare metal API requests."""
+
+    # The request classes of ironic_tempest_plugin.common.throttle.
+    CLASSES = ('read', 'write', 'state')
+
+    def __init__(self):
+        super(_RequestRates, self).__init__(value_type=types.Float(min=0),
+                                            type_name='request rates')
+
+    def __call__(self, value):
+        result = super(_RequestRates, self).__call__(value)
+        unknown = sorted(set(result) - set(self.CLASSES))
+        if unknown:
+            raise ValueError('Unknown request classes %s, expected %s'
+                             % (', '.join(unknown), ', '.join(self.CLASSES)))
+        return result
+
+
 # NOTE(TheJulia): The following options are loaded into a tempest
 # plugin configuration option via plugin.py.
 ironic_service_option = cfg.BoolOpt('ironic',
@@ -74,6 +94,13 @@ baremetal_features_group = cfg.OptGroup(
     name='baremetal_feature_enabled',
     title="Enabled Baremetal Service Features")
 
+baremetal_benchmark_group = cfg.OptGroup(
+    name='baremetal_benchmark',
+    title="Baremetal benchmark options",
+    help="Options for the performance benchmarks of the Bare Metal API. "
+         "The benchmarks enroll a large number of fake-hardware nodes and "
+         "are not meant to be run together with the functional tests.")
+
 BaremetalGroup = [
     cfg.StrOpt('catalog_type',
                default='baremetal',
@@ -261,7 +288,169 @@ BaremetalGroup = [
                     "testing purposes with the dhcp-less test scenario."),
     cfg.StrOpt("public_subnet_ip",
                help="The public subnet IP to bind the public router to for "
-                    "dhcp-less testing.")
+                    "dhcp-less testing."),
+    cfg.BoolOpt('collect_timings',
+                default=False,
+                help="Split the wall clock time of every test into the time "
+                     "spent in bare metal API requests, the time spent "
+                     "sleeping while waiting for resources and the rest. "
+                     "The breakdown is attached to the test results as the "
+                     "'timings' detail."),
+    cfg.StrOpt('timings_dir',
+               help="Directory to store the collected timings in, one file "
+                    "per worker. Only used when collect_timings is enabled. "
+                    "Use 'python -m ironic_tempest_plugin.common.timing' to "
+                    "summarize them."),
+    cfg.StrOpt('timelines_dir',
+               help="If set, the state transitions of every node the tests "
+                    "wait on are recorded and saved in this directory "
+                    "together with the node history and the time spent in "
+                    "every provision state. Use 'python -m "
+                    "ironic_tempest_plugin.common.timeline' to aggregate "
+                    "them per driver and interface combination."),
+    cfg.StrOpt('inventory_store_dir',
+               help="Directory to keep the compressed stores of the "
+                    "inventories and introspection data downloaded by the "
+                    "tests in. By default a temporary directory is used, "
+                    "which is removed when the test class finishes."),
+    cfg.IntOpt('rbac_matrix_concurrency',
+               default=8,
+               min=1,
+               help="How many cells of an RBAC policy matrix are checked "
+                    "at the same time."),
+    cfg.BoolOpt('token_cache',
+                default=False,
+                help="Share the Keystone tokens of the same credentials "
+                     "between the client managers of all test classes in a "
+                     "worker process, instead of authenticating every "
+                     "manager separately."),
+    cfg.StrOpt('token_cache_dir',
+               help="Directory to share the cached tokens between worker "
+                    "processes in. The tokens are stored readable only by "
+                    "the owner. Requires token_cache to be enabled."),
+    cfg.StrOpt('microversion_report_dir',
+               help="Directory to write the results of the microversion "
+                    "enforcement tests to, one JSON file per test class "
+                    "mapping API methods and microversions to pass or "
+                    "fail."),
+    cfg.ListOpt('worker_shards',
+                default=[],
+                help="Shards the standalone scenario tests pick nodes from. "
+                     "When running several tempest instances, giving each "
+                     "one different shards avoids conflicts between them."),
+    cfg.IntOpt('shard_workers',
+               default=0,
+               help="Number of test workers to distribute the shards of the "
+                    "nodes between. Every worker claims a slot and only "
+                    "picks nodes from the shards of its slot, balanced by "
+                    "node count. Must not be lower than the number of "
+                    "workers. 0 disables binding workers to shards. Ignored "
+                    "when worker_shards is set."),
+    cfg.StrOpt('shard_lock_dir',
+               help="Directory for the lock files of the worker slots. "
+                    "Defaults to a directory in the system temporary "
+                    "directory. Workers sharing the slots must use the "
+                    "same directory."),
+    cfg.BoolOpt('conductor_aware_selection',
+                default=False,
+                help="Prefer nodes of less loaded conductors when picking "
+                     "nodes for the standalone scenario tests. The load of "
+                     "a conductor is the number of nodes it is deploying, "
+                     "cleaning, etc. plus the nodes reserved by the tests "
+                     "of the worker. Requires API version 1.49."),
+    cfg.BoolOpt('interface_aware_selection',
+                default=False,
+                help="Prefer nodes that already have the driver and "
+                     "interfaces required by the standalone scenario tests "
+                     "and skip updating the node when nothing differs. "
+                     "Requires API version 1.75."),
+    cfg.BoolOpt('capability_index',
+                default=False,
+                help="Pick nodes for the standalone scenario tests with "
+                     "hardware requirements, e.g. software RAID, based on "
+                     "the capabilities found in their inventories, and skip "
+                     "the tests early if all nodes are known not to match. "
+                     "Nodes without an inventory remain candidates. "
+                     "Requires API version 1.81."),
+    cfg.StrOpt('capability_index_file',
+               help="JSON file to keep the capability index in between "
+                    "runs. Defaults to a file in the temporary directory."),
+    cfg.IntOpt('capability_index_concurrency',
+               default=8,
+               min=1,
+               help="Number of inventories downloaded in parallel when "
+                    "refreshing the capability index."),
+    cfg.BoolOpt('background_teardown',
+                default=False,
+                help="Tear the nodes of the standalone scenario tests down "
+                     "in the background, so that the worker can start the "
+                     "next test class while the node is undeployed and "
+                     "cleaned. Failures are reported when the worker "
+                     "exits, with a non-zero exit status."),
+    cfg.IntOpt('teardown_concurrency',
+               default=4,
+               min=1,
+               help="Number of nodes every worker may tear down in the "
+                    "background at the same time."),
+    cfg.StrOpt('teardown_report_dir',
+               help="Directory to write the failures of the background "
+                    "teardowns to as JSON files."),
+    cfg.BoolOpt('overlap_network_setup',
+                default=False,
+                help="Create the network port of the standalone scenario "
+                     "tests deploying their node while the node is reserved "
+                     "and configured, and allocate the floating IP while "
+                     "the node is deploying."),
+    cfg.Opt('request_rate_limits',
+            type=_RequestRates(),
+            default={},
+            help="Maximum number of bare metal API requests per second of "
+                 "every worker, per class of requests: read, write and state "
+                 "(power, provisioning and other state changes), e.g. "
+                 "read:50,write:10,state:5. Classes that are not listed or "
+                 "set to 0 are not limited, other classes are rejected."),
+    cfg.BoolOpt('adaptive_concurrency',
+                default=False,
+                help="Adapt the number of concurrent bare metal API "
+                     "requests of every worker to the health of the API: "
+                     "the limit is halved when the API responds with 429 "
+                     "or 503 or its latency rises, and increased again "
+                     "while the API is healthy."),
+    cfg.IntOpt('max_concurrent_requests',
+               default=32,
+               min=1,
+               help="The initial and the highest limit of concurrent bare "
+                    "metal API requests of every worker and class of "
+                    "requests when adaptive_concurrency is enabled."),
+    cfg.StrOpt('fake_agent_address',
+               help="The address the conductor reaches the fake agents "
+                    "started by the tests on. The scenario tests using fake "
+                    "agents are skipped if it is not set."),
+    cfg.FloatOpt('fake_agent_command_delay',
+                 default=0,
+                 help="Seconds it takes a fake agent to complete a deploy "
+                      "or clean step, 0 completes them instantly."),
+    cfg.FloatOpt('fake_agent_heartbeat_interval',
+                 default=5,
+                 help="Seconds between the heartbeats of a fake agent."),
+    cfg.BoolOpt('preflight',
+                default=False,
+                help="Whether every test worker checks the health of the "
+                     "bare metal service before its first scenario test and "
+                     "fails all scenario tests if a check fails."),
+    cfg.IntOpt('preflight_workers',
+               default=0,
+               min=0,
+               help="The minimum number of available nodes required by the "
+                    "preflight checks. Defaults to shard_workers, or to 1 "
+                    "if it is not set either."),
+    cfg.StrOpt('history_db',
+               help="If set, the durations and outcomes of the node state "
+                    "waits and of the state changing API requests are "
+                    "appended to this SQLite database, together with the "
+                    "driver, interfaces, node and API version. Use 'python "
+                    "-m ironic_tempest_plugin.common.history' to query "
+                    "percentiles and trends across runs."),
 ]
 
 BaremetalFeaturesGroup = [
@@ -377,3 +566,100 @@ BaremetalIntrospectionGroup = [
                deprecated_reason=_INSPECTOR_REASON,
                help="The storage backend for storing introspection data."),
 ]
+
+BaremetalBenchmarkGroup = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help="Whether the benchmark tests should be run."),
+    cfg.IntOpt('fleet_size',
+               default=100,
+               min=0,
+               help="Number of fake-hardware nodes to enroll for the "
+                    "benchmarks. Set to 0 to only measure against the nodes "
+                    "that already exist in the deployment."),
+    cfg.IntOpt('shard_count',
+               default=4,
+               min=1,
+               help="Number of shards to distribute the enrolled nodes "
+                    "across."),
+    cfg.IntOpt('iterations',
+               default=50,
+               min=1,
+               help="Number of requests issued for every measured query "
+                    "shape."),
+    cfg.IntOpt('concurrency',
+               default=8,
+               min=1,
+               help="Number of requests running in parallel while "
+                    "measuring a query shape."),
+    cfg.IntOpt('page_size',
+               default=50,
+               min=1,
+               help="Page size (limit) used by the pagination benchmarks."),
+    cfg.StrOpt('report_dir',
+               help="Directory to write the machine-readable JSON reports "
+                    "to. If not set, the results are only logged."),
+    cfg.IntOpt('allocation_nodes',
+               default=20,
+               min=1,
+               help="Number of available nodes to create for the allocation "
+                    "benchmark."),
+    cfg.IntOpt('allocation_requests',
+               default=20,
+               min=1,
+               help="Number of allocations requested concurrently in every "
+                    "round of the allocation benchmark."),
+    cfg.IntOpt('allocation_rounds',
+               default=3,
+               min=1,
+               help="Number of rounds of the allocation benchmark. All "
+                    "allocations are released between rounds."),
+    cfg.IntOpt('allocation_resource_classes',
+               default=2,
+               min=1,
+               help="Number of resource classes to distribute the nodes of "
+                    "the allocation benchmark across."),
+    cfg.IntOpt('allocation_traits',
+               default=3,
+               min=0,
+               help="Number of traits to randomly assign to the nodes of the "
+                    "allocation benchmark."),
+    cfg.IntOpt('allocation_retries',
+               default=2,
+               min=0,
+               help="How many times a failed allocation is requested again "
+                    "in the allocation benchmark."),
+    cfg.IntOpt('allocation_timeout',
+               default=300,
+               min=1,
+               help="Timeout for a round of allocations to finish."),
+    cfg.IntOpt('heartbeat_agents',
+               default=100,
+               min=1,
+               help="Number of nodes to simulate heartbeating agents for. "
+                    "The agent tokens are retrieved through the lookup API, "
+                    "so lookup must not be restricted to the deployment "
+                    "states ([api]restrict_lookup = False in ironic.conf)."),
+    cfg.FloatOpt('heartbeat_rate',
+                 default=50,
+                 min=0.1,
+                 help="Requested number of heartbeats per second across all "
+                      "simulated agents."),
+    cfg.IntOpt('heartbeat_duration',
+               default=60,
+               min=1,
+               help="For how many seconds the heartbeats are sent."),
+    cfg.IntOpt('heartbeat_concurrency',
+               default=32,
+               min=1,
+               help="Maximum number of heartbeat requests in flight."),
+    cfg.StrOpt('heartbeat_agent_version',
+               default='9.0.0',
+               help="The ironic-python-agent version sent with the "
+                    "heartbeats."),
+    cfg.FloatOpt('power_poll_interval',
+                 default=1,
+                 min=0.1,
+                 help="Interval between the node lists while waiting for "
+                      "the power sweeps to finish."),
+]
@@ -32,3 +32,15 @@ class RaidCleaningInventoryValidationFailed(exceptions.TempestException):
 class InsufficientAPIAccess(exceptions.TempestException):
     message = ("Insufficient Access to the API exists. Please use a user "
                "with an elevated level of access to execute this test.")
+
+
+class InvalidInspectionRule(exceptions.TempestException):
+    message = "Invalid inspection rule"
+
+
+class PreflightFailed(exceptions.TempestException):
+    message = "Bare metal preflight checks failed: %(reason)s"
+
+
+class TeardownFailed(exceptions.TempestException):
+    message = "Background teardown failed: %(reason)s"
@@ -33,6 +33,8 @@ _opts = [
      project_config.BaremetalFeaturesGroup),
     (project_config.baremetal_introspection_group,
      project_config.BaremetalIntrospectionGroup),
+    (project_config.baremetal_benchmark_group,
+     project_config.BaremetalBenchmarkGroup),
 ]
 
 
@@ -11,13 +11,21 @@
 #    under the License.
 
 
+import contextlib
 import functools
 from http import client as http_client
+import threading
 from urllib import parse as urllib_parse
 
 from oslo_serialization import jsonutils as json
+from tempest.lib.common import api_version_request
 from tempest.lib.common import api_version_utils
 from tempest.lib.common import rest_client
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import history
+from ironic_tempest_plugin.common import throttle
+from ironic_tempest_plugin.common import timing
 
 # NOTE(vsaienko): concurrent tests work because they are launched in
 # separate processes so global variables are not shared among them.
@@ -39,6 +47,50 @@ def reset_baremetal_api_microversion():
     BAREMETAL_MICROVERSION = None
 
 
+# Per-thread overrides of the global microversion, so that concurrent calls
+# can be made with different microversions.
+_LOCAL = threading.local()
+
+
+def current_microversion():
+    """Get the microversion requests of the current thread are made with."""
+    return getattr(_LOCAL, 'microversion', None) or BAREMETAL_MICROVERSION
+
+
+@contextlib.contextmanager
+def microversion(version):
+    """Make the requests of the current thread with a microversion.
+
+    Unlike set_baremetal_api_microversion, this does not affect other
+    threads.
+
+    :param version: the microversion to use.
+    """
+    previous = getattr(_LOCAL, 'microversion', None)
+    _LOCAL.microversion = version
+    try:
+        yield
+    finally:
+        _LOCAL.microversion = previous
+
+
+@contextlib.contextmanager
+def microversion_at_least(minimum):
+    """Make the requests of the current thread with a minimum microversion.
+
+    The current microversion is kept if it is not older than minimum, e.g.
+    to request fields or filters introduced in minimum.
+
+    :param minimum: the minimum microversion to use.
+    """
+    version = current_microversion()
+    if not version or (api_version_request.APIVersionRequest(version)
+                       < api_version_request.APIVersionRequest(minimum)):
+        version = minimum
+    with microversion(version):
+        yield
+
+
 def handle_errors(f):
     """A decorator that allows to ignore certain types of errors."""
 
@@ -67,10 +119,11 @@ class BaremetalClient(rest_client.RestClient):
 
     def get_headers(self):
         headers = super(BaremetalClient, self).get_headers()
-        if BAREMETAL_MICROVERSION:
+        version = current_microversion()
+        if version:
             # NOTE(TheJulia): This is not great, because it can blind a test
             # to the actual version supported.
-            headers[self.api_microversion_header_name] = BAREMETAL_MICROVERSION
+            headers[self.api_microversion_header_name] = version
         return headers
 
     def get_raw_headers(self):
@@ -95,15 +148,38 @@ class BaremetalClient(rest_client.RestClient):
         api_max = version.get('version')
         return (api_min, api_max)
 
-    def request(self, *args, **kwargs):
-        resp, resp_body = super(BaremetalClient, self).request(*args, **kwargs)
+    def _throttled_request(self, method, url, *args, **kwargs):
+        limits = throttle.get()
+        if limits is None:
+            with timing.measure('http'):
+                return super(BaremetalClient, self).request(
+                    method, url, *args, **kwargs)
+
+        with limits.request(method, url) as result:
+            try:
+                with timing.measure('http'):
+                    resp, resp_body = super(BaremetalClient, self).request(
+                        method, url, *args, **kwargs)
+            except lib_exc.RestClientException as exc:
+                result['status'] = getattr(exc.resp, 'status', None)
+                raise
+            result['status'] = resp.status
+        return resp, resp_body
+
+    def request(self, method, url, *args, **kwargs):
+        version = current_microversion()
+        with history.request(self, method, url, version) as result:
+            resp, resp_body = self._throttled_request(method, url, *args,
+                                                      **kwargs)
+            result['status'] = resp.status
         latest_microversion = api_version_utils.LATEST_MICROVERSION
-        if (BAREMETAL_MICROVERSION
-                and BAREMETAL_MICROVERSION != latest_microversion):
+        if version and version != latest_microversion:
+            # NOTE: streamed responses are raw urllib3 responses, which keep
+            # the headers separately.
             api_version_utils.assert_version_header_matches_request(
                 self.api_microversion_header_name,
-                BAREMETAL_MICROVERSION,
-                resp)
+                version,
+                getattr(resp, 'headers', resp))
         return resp, resp_body
 
     def serialize(self, object_dict):
@@ -230,7 +306,9 @@ class BaremetalClient(rest_client.RestClient):
 
         return resp, self.deserialize(body)
 
-    def _create_request_no_response_body(self, resource, object_dict):
+    def _create_request_no_response_body(
+            self, resource, object_dict,
+            expected_status=http_client.NO_CONTENT):
         """Create an object of the specified type.
 
            Do not expect any body in the response.
@@ -238,6 +316,8 @@ class BaremetalClient(rest_client.RestClient):
         :param resource: The name of the REST resource, e.g., 'nodes'.
         :param object_dict: A Python dict that represents an object of the
                             specified type.
+        :param expected_status: Expected response status code. By default is
+                                http_client.NO_CONTENT (204)
         :returns: The server response.
         """
 
@@ -245,7 +325,7 @@ class BaremetalClient(rest_client.RestClient):
         uri = self._get_uri(resource)
 
         resp, body = self.post(uri, body=body)
-        self.expected_success(http_client.NO_CONTENT, resp.status)
+        self.expected_success(expected_status, resp.status)
 
         return resp
 
@@ -299,6 +379,29 @@ class BaremetalClient(rest_client.RestClient):
         """
         return self._list_request(version, permanent=True)
 
+    def _download_request(self, uri, fileobj, headers=None,
+                          extra_headers=False, chunk_size=64 * 1024):
+        """Stream the body of a GET request into a file.
+
+        The response is never loaded into memory as a whole.
+
+        :param uri: The full URI of the resource.
+        :param fileobj: A binary file-like object to write the body to.
+        :param headers: List of headers to use in request.
+        :param extra_headers: Specify whether to use headers.
+        :param chunk_size: The size of the chunks to read the response in.
+        :returns: The server response.
+        """
+        resp, _body = self.get(uri, headers=headers,
+                               extra_headers=extra_headers, chunked=True)
+        try:
+            self.expected_success(http_client.OK, resp.status)
+            for chunk in resp.stream(chunk_size):
+                fileobj.write(chunk)
+        finally:
+            resp.release_conn()
+        return resp
+
     def _put_request(self, resource, put_object):
         """Update specified object with JSON-patch."""
         uri = self._get_uri(resource)
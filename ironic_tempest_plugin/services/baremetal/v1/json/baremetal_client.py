@@ -1012,7 +1012,27 @@ class BaremetalClient(base.BaremetalClient):
             'agent_token': agent_token,
         }
 
-        return self._create_request_no_response_body('heartbeat', kwargs)
+        return self._create_request_no_response_body(
+            'heartbeat', kwargs, expected_status=http_client.ACCEPTED)
+
+    @base.handle_errors
+    def ipa_lookup(self, node_uuid=None, addresses=None):
+        """Look up a node the way the ironic-python-agent ramdisk does it.
+
+        Starting with API version 1.62 the agent configuration in the
+        response contains the agent token, if it has not been retrieved yet.
+
+        :param node_uuid: The unique identifier of the node.
+        :param addresses: A list of MAC addresses of the node.
+        :return: A tuple with the server response and a dictionary with the
+            node and the agent configuration.
+        """
+        params = {}
+        if node_uuid:
+            params['node_uuid'] = node_uuid
+        if addresses:
+            params['addresses'] = ','.join(addresses)
+        return self._list_request('lookup', **params)
 
     @base.handle_errors
     def show_inventory(self, uuid, api_version='1.81'):
@@ -1030,6 +1050,20 @@ class BaremetalClient(base.BaremetalClient):
         self.expected_success(http_client.OK, resp.status)
         return body
 
+    @base.handle_errors
+    def download_inventory(self, uuid, fileobj, api_version='1.81'):
+        """Stream hardware inventory for the specific node into a file.
+
+        :param uuid: Unique identifier of the node in UUID format.
+        :param fileobj: A binary file-like object to write the JSON to.
+        :param api_version: Ironic API version to use.
+        :return: The server response.
+        """
+        extra_headers, headers = self._get_headers(api_version)
+        return self._download_request(
+            f'{self.uri_prefix}/nodes/{uuid}/inventory', fileobj,
+            headers=headers, extra_headers=extra_headers)
+
     @base.handle_errors
     def get_shards(self, api_version='1.82'):
         """Get all shards."""
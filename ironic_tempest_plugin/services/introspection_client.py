@@ -57,6 +57,17 @@ class BaremetalIntrospectionClient(base.BaremetalClient):
         """Get introspection status for a node."""
         return self._show_request('introspection', uuid=uuid)
 
+    @base.handle_errors
+    def list_statuses(self, **kwargs):
+        """List introspection statuses of all nodes.
+
+        :param kwargs: query parameters, e.g. marker and limit.
+        :returns: a tuple with the server response and a dictionary with
+            the statuses in the 'introspection' key, the most recently started
+            introspection first.
+        """
+        return self._list_request('introspection', **kwargs)
+
     @base.handle_errors
     def get_data(self, uuid):
         """Get introspection data for a node."""
@@ -64,6 +75,12 @@ class BaremetalIntrospectionClient(base.BaremetalClient):
                                   uri='/%s/introspection/%s/data' %
                                       (self.uri_prefix, uuid))
 
+    @base.handle_errors
+    def download_data(self, uuid, fileobj):
+        """Stream introspection data for a node into a file."""
+        return self._download_request(
+            '/%s/introspection/%s/data' % (self.uri_prefix, uuid), fileobj)
+
     @base.handle_errors
     def start_introspection(self, uuid):
         """Start introspection for a node."""
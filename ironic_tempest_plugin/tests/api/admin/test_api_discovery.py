@@ -10,11 +10,21 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
+from oslo_log import log as logging
+from tempest import config
 from tempest.lib import decorators
+from testtools import content
 
+from ironic_tempest_plugin.common import microversion_discovery as discovery
+from ironic_tempest_plugin.common import utils
 from ironic_tempest_plugin.tests.api.admin import api_microversion_fixture
 from ironic_tempest_plugin.tests.api import base
 
+LOG = logging.getLogger(__name__)
+CONF = config.CONF
+
 
 class TestApiDiscovery(base.BaseBaremetalTest):
     """Tests for API discovery features."""
@@ -46,3 +56,62 @@ class TestApiDiscovery(base.BaseBaremetalTest):
 
         for res in expected_resources:
             self.assertIn(res, descr)
+
+
+class TestMicroversionDiscovery(base.BaseBaremetalTest):
+    """Discover the minimum microversions of client methods."""
+
+    def setUp(self):
+        super(TestMicroversionDiscovery, self).setUp()
+        _, self.chassis = self.create_chassis()
+        _, self.node = self.create_node(self.chassis['uuid'])
+
+    def _probes(self):
+        node_uuid = self.node['uuid']
+        return {
+            'list_nodes': {},
+            'show_node': {'uuid': node_uuid},
+            'list_portgroups': {},
+            'vif_list': {'node_uuid': node_uuid},
+            'list_volume_connectors': {},
+            'list_node_traits': {'node_uuid': node_uuid},
+            'list_node_bios_settings': {'uuid': node_uuid},
+            'list_conductors': {},
+            'list_allocations': {},
+            'list_deploy_templates': {},
+            'list_node_history': {'node_uuid': node_uuid},
+            'list_runbooks': {},
+        }
+
+    @decorators.idempotent_id('6f1f0c55-9a57-4b8e-8d3c-2e7b5a4c9d10')
+    def test_discover_minimum_microversions(self):
+        api_min, api_max = self.client.get_min_max_api_microversions()
+        report_dir = CONF.baremetal.microversion_report_dir
+        cache = discovery.get_cache(
+            os.path.join(report_dir, 'discovered-microversions.json')
+            if report_dir else None)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+
+        def _discover(item):
+            method_name, args = item
+            if (api_max, method_name) not in cache:
+                version, probes = discovery.discover(
+                    self.client, method_name, args, api_min, api_max)
+                LOG.debug('Discovered microversion %s of %s with %d calls',
+                          version, method_name, probes)
+                cache.set(api_max, method_name, version)
+            return cache.get(api_max, method_name)
+
+        probes = sorted(self._probes().items())
+        results = utils.run_concurrently(_discover, probes, len(probes))
+
+        discovered = dict(zip((name for name, _ in probes), results))
+        text, mismatches = discovery.table(discovered,
+                                           discovery.expected_versions())
+        self.addDetail('microversions', content.text_content(text))
+        if mismatches:
+            LOG.warning('Discovered microversions differ from the ones in '
+                        'the enforcement tests:\n%s', text)
+        # The oldest methods exist in every microversion.
+        self.assertEqual(api_min, discovered['list_nodes'])
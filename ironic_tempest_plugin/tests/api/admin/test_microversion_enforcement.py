@@ -10,8 +10,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import os
 import random
 
+from oslo_serialization import jsonutils as json
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
 from tempest import config
@@ -19,9 +21,10 @@ from tempest.lib.common.utils import data_utils
 from tempest.lib import decorators
 from tempest.lib import exceptions as lib_exc
 
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.services.baremetal import base as ironic_base
 from ironic_tempest_plugin.services.baremetal.v1.json.baremetal_client import \
     BaremetalClient
-from ironic_tempest_plugin.tests.api.admin import api_microversion_fixture
 from ironic_tempest_plugin.tests.api import base
 
 CONF = config.CONF
@@ -30,16 +33,8 @@ CONF = config.CONF
 class MicroversionTestMixin:
     """Mixin class containing shared microversion test functionality."""
 
-    def _microversion_test(
-        self,
-        method_name,
-        min_version,
-        expected_error,
-        required_args,
-        ignore_positive=False,
-    ):
-        """Test methods with invalid API versions"""
-
+    @staticmethod
+    def _invalid_versions(min_version):
         major, minor = map(int, min_version.split("."))
         invalid_versions = []
         if minor >= 11:
@@ -53,88 +48,111 @@ class MicroversionTestMixin:
         else:
             # We expect fails for v1.0 and below
             raise ValueError(f"Invalid microversion {min_version}")
+        return invalid_versions
 
+    def _probe(self, method_name, microversion, should_fail, expected_error,
+               required_args):
+        """Call a method with a microversion.
+
+        The microversion is only set for the calling thread, so probes can
+        run concurrently.
+
+        :returns: None if the outcome is the expected one, otherwise an
+            error message.
+        """
+        method = getattr(self.client, method_name)
+        try:
+            with ironic_base.microversion(microversion):
+                method(**required_args)
+        except expected_error as e:
+            if should_fail:
+                return None
+            return (
+                f"Method {method_name} failed with valid "
+                f"microversion {microversion}: {e}"
+            )
+        except Exception as e:
+            if should_fail:
+                return (
+                    f"Request for microversion {microversion} for "
+                    f"{method_name} raised unexpected exception: {e}"
+                )
+            # Other exceptions might be expected due to invalid test data
+            # For example, a 404 might be expected if we're using fake IDs
+            return None
+        if should_fail:
+            return (
+                f"Request for microversion {microversion} for "
+                f"{method_name} unexpectedly succeeded. We expected "
+                f"{expected_error.__name__}."
+            )
+        return None
+
+    def _microversion_test(
+        self,
+        method_name,
+        min_version,
+        expected_error,
+        required_args,
+        ignore_positive=False,
+    ):
+        """Test methods with invalid API versions
+
+        The calls with the invalid versions and with the minimum version are
+        made concurrently, the results are recorded in the sweep matrix of
+        the class.
+        """
         # Get method name from method object
         method_name = method_name.__name__
 
-        # Test with invalid versions (should fail)
-        for microversion in invalid_versions:
+        probes = [(version, True)
+                  for version in self._invalid_versions(min_version)]
+        if not ignore_positive:
+            # Use the minimum required version
+            probes.append((min_version, False))
+
+        results = utils.run_concurrently(
+            lambda probe: self._probe(method_name, probe[0], probe[1],
+                                      expected_error, required_args),
+            probes, len(probes))
+
+        row = self.sweep_matrix.setdefault(method_name, {})
+        for (microversion, should_fail), error in zip(probes, results):
+            row[microversion] = 'pass' if error is None else 'fail'
             msg = (
                 f"Testing {method_name} with version {microversion} "
-                f"and arguments {required_args} - should fail"
+                f"and arguments {required_args} - should "
+                f"{'fail' if should_fail else 'succeed'}"
             )
             with self.subTest(
                 msg=msg, method=method_name, version=microversion
             ):
-                self.useFixture(
-                    api_microversion_fixture.APIMicroversionFixture(
-                        microversion
-                    )
-                )
-                method = getattr(self.client, method_name)
-
-                try:
-                    method(**required_args)
-                    self.fail(
-                        f"Request for microversion {microversion} for "
-                        f"{method_name} unexpectedly succeeded. We expected "
-                        f"{expected_error.__name__}."
-                    )
-                except expected_error:
-                    pass  # Expected error, test passes
-                except Exception as e:
-                    self.fail(
-                        f"Request for microversion {microversion} for "
-                        f"{method_name} raised unexpected exception: {e}"
-                    )
-
-        if ignore_positive:
-            return True
-
-        # Test with valid version (should succeed)
-        # Use the minimum required version
-        msg = (
-            f"Testing {method_name} with version {min_version} "
-            f"and arguments {required_args} - should succeed"
-        )
-        with self.subTest(
-            msg=msg, method=method_name, version=min_version
-        ):
-            self.useFixture(
-                api_microversion_fixture.APIMicroversionFixture(
-                    min_version
-                )
-            )
-            method = getattr(self.client, method_name)
-
-            try:
-                # We don't check the actual response, just
-                # that it doesn't raise
-                # the expected error from the negative test
-                method(**required_args)
-                return True
+                if error is not None:
+                    self.fail(error)
 
-            except expected_error as e:
-                self.fail(
-                    f"Method {method_name} failed with valid "
-                    f"microversion {min_version}: {e}"
-                )
-            except Exception as e:
-                # Other exceptions might be expected due to invalid test data
-                # For example, a 404 might be expected if we're using fake IDs
-                self.assertNotIsInstance(
-                    e,
-                    expected_error,
-                    (
-                        f"Got unexpected {expected_error.__name__} with valid "
-                        f"microversion {min_version}: {e}"
-                    ),
-                )
+        return True
 
 
 class BaseTestMicroversionEnforcement(base.BaseBaremetalTest):
     """Base class for microversion enforcement tests."""
 
+    @classmethod
+    def resource_setup(cls):
+        super(BaseTestMicroversionEnforcement, cls).resource_setup()
+        # Method name -> microversion -> pass or fail.
+        cls.sweep_matrix = {}
+
+    @classmethod
+    def resource_cleanup(cls):
+        report_dir = CONF.baremetal.microversion_report_dir
+        if report_dir and cls.sweep_matrix:
+            os.makedirs(report_dir, exist_ok=True)
+            path = os.path.join(report_dir,
+                                'microversions-%s.json' % cls.__name__)
+            with open(path, 'w') as fp:
+                fp.write(json.dumps(cls.sweep_matrix, sort_keys=True))
+        super(BaseTestMicroversionEnforcement, cls).resource_cleanup()
+
     def setUp(self):
         super().setUp()
         self.resource_class = uuidutils.generate_uuid()
@@ -19,6 +19,8 @@ from tempest.lib.common.utils import data_utils
 from tempest.lib import exceptions as lib_exc
 from tempest import test
 
+from ironic_tempest_plugin.common import timing
+from ironic_tempest_plugin.common import token_cache
 from ironic_tempest_plugin.common import waiters
 from ironic_tempest_plugin.services.baremetal import base
 from ironic_tempest_plugin.tests.api.admin import api_microversion_fixture
@@ -95,9 +97,23 @@ class BaseBaremetalTest(api_version_utils.BaseMicroversionTest,
 
         super(BaseBaremetalTest, cls).setup_credentials()
 
+    @classmethod
+    def setUpClass(cls):
+        # NOTE: the whole class setup is timed, including the credentials
+        # and the clients, since they are a part of its cost.
+        with timing.phase(cls.__name__, 'resource_setup') as timings:
+            cls.setup_timings = timings
+            super(BaseBaremetalTest, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        with timing.phase(cls.__name__, 'resource_cleanup'):
+            super(BaseBaremetalTest, cls).tearDownClass()
+
     @classmethod
     def setup_clients(cls):
         super(BaseBaremetalTest, cls).setup_clients()
+        token_cache.share_managers(cls)
         if CONF.enforce_scope.ironic:
             cls.client = cls.os_system_admin.baremetal.BaremetalClient()
         else:
@@ -191,6 +207,8 @@ class BaseBaremetalTest(api_version_utils.BaseMicroversionTest,
 
     def setUp(self):
         super(BaseBaremetalTest, self).setUp()
+        if timing.enabled():
+            self.useFixture(timing.TimingFixture(self, self.setup_timings))
         self.useFixture(api_microversion_fixture.APIMicroversionFixture(
             self.request_microversion))
 
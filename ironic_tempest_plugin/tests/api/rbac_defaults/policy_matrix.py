@@ -0,0 +1,262 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Data-driven RBAC tests.
+
+A policy matrix is a list of cells, each stating which HTTP status a persona
+gets when calling an operation on a node it has a given relation with. The
+nodes are created concurrently once per test class, one for every relation
+used by the matrix. Every cell is reported as a test of its own, all cells of
+a class are checked concurrently when its first test runs.
+
+Cells of operations changing the node get a node of their own, so that an
+operation unexpectedly allowed cannot affect other cells. Nodes created by
+an unexpectedly allowed create are deleted with the other nodes of the
+class.
+"""
+
+import collections
+import threading
+import uuid
+
+from oslo_log import log as logging
+from tempest import config
+from tempest.lib import decorators
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.services.baremetal import base as client_base
+from ironic_tempest_plugin.tests.api import base
+
+LOG = logging.getLogger(__name__)
+CONF = config.CONF
+
+# Relations of the persona's project to a node.
+NO_RELATION = 'none'
+OWNER = 'owner'
+LESSEE = 'lessee'
+
+RELATIONS = (NO_RELATION, OWNER, LESSEE)
+
+Cell = collections.namedtuple(
+    'Cell', ('persona', 'operation', 'relation', 'expected'))
+
+# The idempotent IDs of the tests of the cells are derived from their names.
+CELL_ID_NAMESPACE = uuid.UUID('3b8f0c52-6d1e-4a79-b0e4-9f2c7d5a1e68')
+
+
+# Operation name -> (policy, callable accepting a client and a node).
+OPERATIONS = {
+    'create': (
+        'baremetal:node:create',
+        lambda client, node: client.create_node(node['chassis_uuid'])),
+    'get': (
+        'baremetal:node:get',
+        lambda client, node: client.show_node(node['uuid'])),
+    'update': (
+        'baremetal:node:update',
+        lambda client, node: client.update_node(node['uuid'])),
+    'update_extra': (
+        'baremetal:node:update_extra',
+        lambda client, node: client.update_node(
+            node['uuid'], patch=[{'path': '/extra/rbac', 'op': 'add',
+                                  'value': 'matrix'}])),
+    'update_owner': (
+        'baremetal:node:update:owner',
+        lambda client, node: client.update_node(
+            node['uuid'], patch=[{'path': '/owner', 'op': 'replace',
+                                  'value': 'new_owner'}])),
+    'delete': (
+        'baremetal:node:delete',
+        lambda client, node: client.delete_node(node['uuid'])),
+    'validate': (
+        'baremetal:node:validate',
+        lambda client, node: client.validate_driver_interface(node['uuid'])),
+    'get_boot_device': (
+        'baremetal:node:get_boot_device',
+        lambda client, node: client.get_node_boot_device(node['uuid'])),
+    'set_boot_device': (
+        'baremetal:node:set_boot_device',
+        lambda client, node: client.set_node_boot_device(node['uuid'],
+                                                         'pxe')),
+    'set_power_state': (
+        'baremetal:node:set_power_state',
+        lambda client, node: client.set_node_power_state(node['uuid'],
+                                                         'power on')),
+    'get_console': (
+        'baremetal:node:get_console',
+        lambda client, node: client.get_console(node['uuid'])),
+    'vif_list': (
+        'baremetal:node:vif:list',
+        lambda client, node: client.vif_list(node['uuid'])),
+    'vif_attach': (
+        'baremetal:node:vif:attach',
+        lambda client, node: client.vif_attach(node['uuid'], 'vifid')),
+    'traits_list': (
+        'baremetal:node:traits:list',
+        lambda client, node: client.list_node_traits(node['uuid'])),
+    'traits_set': (
+        'baremetal:node:traits:set',
+        lambda client, node: client.set_node_traits(node['uuid'],
+                                                    ['CUSTOM_TRAIT_A'])),
+    'bios_get': (
+        'baremetal:node:bios:get',
+        lambda client, node: client.list_node_bios_settings(node['uuid'])),
+}
+
+
+# Operations changing the node or creating one.
+MUTATING = frozenset(['create', 'update', 'update_extra', 'update_owner',
+                      'delete', 'set_boot_device', 'set_power_state',
+                      'vif_attach', 'traits_set'])
+
+
+def cells(persona, relation, **expected):
+    """Build the cells of a persona and a relation.
+
+    :param persona: the tempest credentials name, e.g. project_reader.
+    :param relation: one of RELATIONS.
+    :param expected: operation names mapped to the expected HTTP status.
+    :returns: a list of Cell objects.
+    """
+    return [Cell(persona, operation, relation, status)
+            for operation, status in sorted(expected.items())]
+
+
+def call(operation, client, node):
+    """Call an operation.
+
+    :returns: a tuple (HTTP status, response body or None).
+    """
+    try:
+        result = OPERATIONS[operation][1](client, node)
+    except lib_exc.RestClientException as exc:
+        return exc.resp.status, None
+    if isinstance(result, tuple):
+        return result[0].status, result[1]
+    return result.status, None
+
+
+class PolicyMatrixTest(base.BaseBaremetalRBACTest):
+    """Base class for tests checking a policy matrix.
+
+    Subclasses set the matrix attribute to a list of cells, and the
+    credentials to system_admin and all personas of the matrix. A test is
+    added for every cell.
+    """
+
+    matrix = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for cell in cls.matrix:
+            name = 'test_%s_%s_%s' % (cell.persona, cell.operation,
+                                      cell.relation)
+            setattr(cls, name, cls._cell_test(
+                cell, str(uuid.uuid5(CELL_ID_NAMESPACE,
+                                     '%s.%s' % (cls.__name__, name)))))
+
+    @staticmethod
+    def _cell_test(cell, idempotent_id):
+        @decorators.idempotent_id(idempotent_id)
+        def test(self):
+            self.check_cell(cell)
+
+        test.__doc__ = ('%s %s on a node with relation %s returns %s'
+                        % (cell.persona, cell.operation, cell.relation,
+                           cell.expected))
+        return test
+
+    @classmethod
+    def personas(cls):
+        return sorted({cell.persona for cell in cls.matrix})
+
+    @classmethod
+    def setup_clients(cls):
+        super(PolicyMatrixTest, cls).setup_clients()
+        cls.persona_clients = {
+            persona: getattr(cls, 'os_%s' % persona).baremetal
+            .BaremetalClient()
+            for persona in cls.personas()}
+
+    @classmethod
+    def _project_id(cls):
+        for persona in cls.personas():
+            if persona.startswith('project_'):
+                return getattr(cls, 'os_%s' % persona).credentials.project_id
+
+    @classmethod
+    def resource_setup(cls):
+        super(PolicyMatrixTest, cls).resource_setup()
+        client_base.set_baremetal_api_microversion(cls.request_microversion)
+        try:
+            _, cls.chassis = cls.create_chassis()
+            project_id = cls._project_id()
+            # Relation or cell -> node, read-only cells share the node of
+            # their relation.
+            keys = sorted({cls._node_key(cell) for cell in cls.matrix},
+                          key=str)
+
+            def _create(key):
+                relation = key if key in RELATIONS else key.relation
+                _, node = cls.create_node(cls.chassis['uuid'],
+                                          network_interface='noop',
+                                          deploy_interface='fake')
+                if relation != NO_RELATION:
+                    _, node = cls.client.update_node(
+                        node['uuid'], **{relation: project_id})
+                return node
+
+            cls.nodes = dict(zip(keys, utils.run_concurrently(
+                _create, keys, CONF.baremetal.rbac_matrix_concurrency)))
+        finally:
+            client_base.reset_baremetal_api_microversion()
+        cls.cell_results = None
+        cls._results_lock = threading.Lock()
+
+    @staticmethod
+    def _node_key(cell):
+        return cell if cell.operation in MUTATING else cell.relation
+
+    @classmethod
+    def _check(cls, cell):
+        client = cls.persona_clients[cell.persona]
+        node = cls.nodes[cls._node_key(cell)]
+        try:
+            status, body = call(cell.operation, client, node)
+        except Exception as exc:
+            LOG.exception('Unexpected error for cell %s', cell)
+            return repr(exc)
+        if cell.operation == 'create' and body and body.get('uuid'):
+            # Deleted by resource_cleanup together with the fixtures.
+            cls.created_objects['node'].add(body['uuid'])
+        return status
+
+    @classmethod
+    def check_matrix(cls):
+        """Check all cells concurrently, only once per class.
+
+        :returns: a dictionary mapping cells to the HTTP status they got.
+        """
+        with cls._results_lock:
+            if cls.cell_results is None:
+                cls.cell_results = dict(zip(cls.matrix, utils.run_concurrently(
+                    cls._check, cls.matrix,
+                    CONF.baremetal.rbac_matrix_concurrency)))
+            return cls.cell_results
+
+    def check_cell(self, cell):
+        actual = self.check_matrix()[cell]
+        self.assertEqual(cell.expected, actual,
+                         '%s %s on a node with relation %s (%s)'
+                         % (cell.persona, cell.operation, cell.relation,
+                            OPERATIONS[cell.operation][0]))
@@ -0,0 +1,57 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from ironic_tempest_plugin.tests.api.rbac_defaults import policy_matrix as pm
+
+
+# Operations on a node without any relation to the project are hidden from
+# project scoped personas, see TestNodeProjectReader.
+_HIDDEN = dict(get=404, update=404, update_extra=404, update_owner=404,
+               delete=404, validate=404, get_boot_device=404,
+               set_boot_device=404, set_power_state=404, get_console=404,
+               vif_list=404, vif_attach=404, traits_list=404, traits_set=404,
+               bios_get=404)
+
+# Readers with a relation to a node can see, but not change it. In the default
+# ironic policy, get and traits:list are SYSTEM_OR_PROJECT_READER, which
+# matches the readers of the owner and of the lessee project, while
+# update:owner is SYSTEM_MEMBER_OR_OWNER_LESSEE_ADMIN, delete is
+# SYSTEM_ADMIN_OR_OWNER_ADMIN and the other operations are
+# SYSTEM_OR_OWNER_MEMBER_AND_LESSEE_ADMIN, which all need at least the member
+# role. A node the persona can see returns 403 rather than 404 when denied.
+_VISIBLE_READ_ONLY = dict(get=200, update=403, update_extra=403,
+                          update_owner=403, delete=403, set_boot_device=403,
+                          set_power_state=403, get_console=403,
+                          vif_attach=403, traits_list=200, traits_set=403)
+
+
+class TestNodeReaderPolicyMatrix(pm.PolicyMatrixTest):
+    """Default node policies for system and project readers.
+
+    https://opendev.org/openstack/ironic/src/branch/master/ironic/common/policy.py
+    """
+
+    credentials = ['system_admin', 'system_reader', 'project_reader']
+
+    # The system reader and the project reader without a relation follow
+    # TestNodeSystemReader and TestNodeProjectReader.
+    matrix = (
+        pm.cells('system_reader', pm.NO_RELATION,
+                 create=403, get=200, update=403, update_extra=403,
+                 update_owner=403, delete=403, set_boot_device=403,
+                 set_power_state=403, get_console=403, vif_list=200,
+                 vif_attach=403, traits_list=200, traits_set=403,
+                 bios_get=200)
+        + pm.cells('project_reader', pm.NO_RELATION, create=403, **_HIDDEN)
+        + pm.cells('project_reader', pm.OWNER, **_VISIBLE_READ_ONLY)
+        + pm.cells('project_reader', pm.LESSEE, **_VISIBLE_READ_ONLY)
+    )
@@ -0,0 +1,148 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_log import log as logging
+from tempest import config
+from tempest.lib.common.utils import data_utils
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import benchmark
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.services.baremetal import base as client_base
+from ironic_tempest_plugin.tests.api import base
+
+
+LOG = logging.getLogger(__name__)
+CONF = config.CONF
+
+
+class BaseBaremetalBenchmarkTest(base.BaseBaremetalTest):
+    """Base class for Bare Metal API benchmarks.
+
+    A fleet of fake-hardware nodes is enrolled once per class, every test
+    measures one or more query shapes and a JSON report with the results of
+    the whole class is written on cleanup.
+    """
+
+    # Whether the enrolled nodes should be distributed across shards.
+    # Requires API version 1.82.
+    enroll_shards = False
+
+    @classmethod
+    def skip_checks(cls):
+        super(BaseBaremetalBenchmarkTest, cls).skip_checks()
+        if not CONF.baremetal_benchmark.enabled:
+            raise cls.skipException('Bare Metal benchmarks are not enabled.')
+
+    @classmethod
+    def resource_setup(cls):
+        super(BaseBaremetalBenchmarkTest, cls).resource_setup()
+        cls.results = {}
+        cls.api_min, cls.api_max = cls.client.get_min_max_api_microversions()
+        cls.shards = [data_utils.rand_name('benchmark-shard')
+                      for _ in range(CONF.baremetal_benchmark.shard_count)]
+        client_base.set_baremetal_api_microversion(cls.request_microversion)
+        try:
+            cls.fleet = cls.setup_fleet()
+        finally:
+            client_base.reset_baremetal_api_microversion()
+
+    @classmethod
+    def setup_fleet(cls):
+        """Prepare the nodes used by the benchmarks of the class.
+
+        :returns: a list of nodes.
+        """
+        return cls.enroll_fleet(CONF.baremetal_benchmark.fleet_size)
+
+    @classmethod
+    def enroll_fleet(cls, count, **kwargs):
+        """Enroll fake-hardware nodes in parallel.
+
+        :param count: the number of nodes to enroll.
+        :param kwargs: other node fields passed to create_node.
+        :returns: a list of the created nodes.
+        """
+        if not count:
+            return []
+        _, chassis = cls.create_chassis()
+
+        def _create(index):
+            node_kwargs = dict(kwargs)
+            if cls.enroll_shards:
+                node_kwargs['shard'] = cls.shards[index % len(cls.shards)]
+            _, node = cls.create_node(chassis['uuid'], **node_kwargs)
+            return node
+
+        LOG.info('Enrolling %d nodes for %s', count, cls.__name__)
+        return utils.run_concurrently(_create, range(count),
+                                      CONF.baremetal_benchmark.concurrency)
+
+    @classmethod
+    def resource_cleanup(cls):
+        results = getattr(cls, 'results', None)
+        if results:
+            benchmark.write_report(cls.__name__, {
+                'api_min_version': cls.api_min,
+                'api_max_version': cls.api_max,
+                'microversion': cls.request_microversion,
+                'fleet_size': len(cls.fleet),
+                'iterations': CONF.baremetal_benchmark.iterations,
+                'concurrency': CONF.baremetal_benchmark.concurrency,
+                'results': results,
+            })
+
+        # Deleting thousands of nodes one by one takes a long time, delete the
+        # fleet in parallel before the generic cleanup takes over.
+        nodes = list(cls.created_objects.get('node', ()))
+
+        def _delete(node_id):
+            try:
+                cls.client.delete_node(node_id)
+            except lib_exc.NotFound:
+                pass
+            except lib_exc.TempestException:
+                LOG.warning('Cleanup: Failed to delete node: %s', node_id)
+                return
+            cls.created_objects['node'].discard(node_id)
+
+        client_base.set_baremetal_api_microversion(cls.request_microversion)
+        try:
+            utils.run_concurrently(_delete, nodes,
+                                   CONF.baremetal_benchmark.concurrency)
+        finally:
+            client_base.reset_baremetal_api_microversion()
+        super(BaseBaremetalBenchmarkTest, cls).resource_cleanup()
+
+    def measure(self, shape, func, iterations=None, concurrency=None):
+        """Measure the latency of a query shape.
+
+        :param shape: the name of the query shape used in the report.
+        :param func: a callable without arguments issuing the request(s).
+        :param iterations: how many times to call func. Defaults to
+            [baremetal_benchmark]iterations.
+        :param concurrency: how many calls may run in parallel. Defaults to
+            [baremetal_benchmark]concurrency.
+        :returns: the summary of the measurement.
+        """
+        recorder = benchmark.LatencyRecorder().run(
+            func,
+            iterations or CONF.baremetal_benchmark.iterations,
+            concurrency or CONF.baremetal_benchmark.concurrency)
+        summary = recorder.summary()
+        self.results[shape] = summary
+        LOG.info('Benchmark %s: %s', shape, summary)
+        return summary
+
+    def assertNoErrors(self, summary):
+        self.assertEqual({}, summary['errors'],
+                         'Some benchmark requests failed')
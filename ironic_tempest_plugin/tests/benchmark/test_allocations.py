@@ -0,0 +1,178 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import random
+import time
+
+from oslo_log import log as logging
+from oslo_utils import uuidutils
+from tempest import config
+from tempest.lib import decorators
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import benchmark
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.common import waiters
+from ironic_tempest_plugin.tests.benchmark import base
+
+
+LOG = logging.getLogger(__name__)
+CONF = config.CONF
+
+
+class TestAllocationBenchmark(base.BaseBaremetalBenchmarkTest):
+    """Throughput and contention of the allocation API.
+
+    Available nodes with random resource classes and traits are created, then
+    several rounds of concurrent allocation requests are fired at them.
+    """
+
+    min_microversion = '1.52'
+
+    @classmethod
+    def setup_fleet(cls):
+        opts = CONF.baremetal_benchmark
+        cls.resource_classes = [
+            uuidutils.generate_uuid()
+            for _ in range(opts.allocation_resource_classes)]
+        traits = ['CUSTOM_BENCHMARK_%d' % i
+                  for i in range(opts.allocation_traits)]
+        nodes = cls.enroll_fleet(
+            opts.allocation_nodes,
+            # Fake deploy interface to avoid stop when automated cleaning
+            # is on.
+            deploy_interface='fake',
+            # noop network interface in case a cleaning/provisioning network
+            # is not defined.
+            network_interface='noop')
+
+        def _prepare(node):
+            node['resource_class'] = random.choice(cls.resource_classes)
+            node['traits'] = random.sample(traits,
+                                           random.randint(0, len(traits)))
+            cls.client.update_node(node['uuid'],
+                                   resource_class=node['resource_class'])
+            if node['traits']:
+                cls.client.set_node_traits(node['uuid'], node['traits'])
+            cls.provide_node(node['uuid'])
+            # Force non-empty power state, otherwise allocation API won't
+            # pick it.
+            cls.client.set_node_power_state(node['uuid'], 'power off')
+            waiters.wait_for_bm_node_status(cls.client, node['uuid'],
+                                            'power_state', 'power off')
+            return node
+
+        return utils.run_concurrently(_prepare, nodes, opts.concurrency)
+
+    def _random_request(self):
+        # Base every request on an existing node, so that there is always at
+        # least one candidate and failures are only caused by contention.
+        node = random.choice(self.fleet)
+        return {
+            'resource_class': node['resource_class'],
+            'traits': random.sample(node['traits'],
+                                    random.randint(0, len(node['traits']))),
+        }
+
+    def _release(self, allocations):
+        def _delete(ident):
+            self.client.delete_allocation(ident)
+            self.created_objects['allocation'].discard(ident)
+
+        utils.run_concurrently(_delete, allocations,
+                               CONF.baremetal_benchmark.concurrency)
+
+    def _run_round(self, recorder, picks):
+        """Request allocations concurrently and wait for all of them.
+
+        :returns: the number of retried requests.
+        """
+        opts = CONF.baremetal_benchmark
+        requests = [dict(self._random_request(), started=None)
+                    for _ in range(opts.allocation_requests)]
+        active = []
+        retries = 0
+
+        for attempt in range(opts.allocation_retries + 1):
+            created = {}
+
+            def _create(request):
+                if request['started'] is None:
+                    request['started'] = time.monotonic()
+                try:
+                    _, body = self.create_allocation(
+                        request['resource_class'], traits=request['traits'])
+                except lib_exc.RestClientException as exc:
+                    recorder.add_error(benchmark.error_code(exc))
+                    return
+                created[body['uuid']] = request
+
+            utils.run_concurrently(_create, requests, opts.concurrency)
+
+            failed = []
+
+            def _finished(allocation):
+                request = created[allocation['uuid']]
+                if allocation['state'] == 'active':
+                    recorder.add(time.monotonic() - request['started'])
+                    picks[allocation['node_uuid']] += 1
+                    active.append(allocation['uuid'])
+                else:
+                    LOG.debug('Allocation %s failed: %s', allocation['uuid'],
+                              allocation['last_error'])
+                    failed.append(request)
+                    # Failed allocations are released right away.
+                    self._release([allocation['uuid']])
+
+            waiters.wait_for_allocations(self.client, list(created),
+                                         timeout=opts.allocation_timeout,
+                                         interval=0.5, callback=_finished)
+            if not failed:
+                break
+            if attempt == opts.allocation_retries:
+                for _ in failed:
+                    recorder.add_error('allocation_failed')
+                break
+            retries += len(failed)
+            requests = failed
+
+        self._release(active)
+        return retries
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('affe0bdb-7bcf-4083-83e5-a2cfcf1c639a')
+    def test_concurrent_allocations(self):
+        opts = CONF.baremetal_benchmark
+        recorder = benchmark.LatencyRecorder()
+        picks = collections.Counter()
+        retries = 0
+
+        recorder.started_at = time.monotonic()
+        for _ in range(opts.allocation_rounds):
+            retries += self._run_round(recorder, picks)
+        recorder.finished_at = time.monotonic()
+
+        summary = recorder.summary()
+        requested = opts.allocation_requests * opts.allocation_rounds
+        summary.update({
+            'requested': requested,
+            'retries': retries,
+            'retry_rate': retries / requested,
+            'nodes_used': len(picks),
+            'fairness_index': benchmark.fairness_index(
+                picks.get(node['uuid'], 0) for node in self.fleet),
+        })
+        self.results['create_allocation'] = summary
+        LOG.info('Allocation benchmark: %s', summary)
+        self.assertGreater(summary['count'], 0,
+                           'No allocation succeeded')
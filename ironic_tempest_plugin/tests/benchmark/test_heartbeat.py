@@ -0,0 +1,85 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_log import log as logging
+from tempest import config
+from tempest.lib import decorators
+from tempest.lib import exceptions as lib_exc
+
+from ironic_tempest_plugin.common import benchmark
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.tests.benchmark import base
+
+
+LOG = logging.getLogger(__name__)
+CONF = config.CONF
+
+# The lookup API hides tokens that have already been handed out.
+REDACTED_TOKEN = '******'
+
+
+class TestHeartbeatBenchmark(base.BaseBaremetalBenchmarkTest):
+    """Sustained rate of the agent heartbeat API.
+
+    Every node of the fleet gets a simulated agent that retrieves its token
+    through the lookup API, then heartbeats are sent at a constant rate
+    across all agents.
+    """
+
+    # Agent tokens are returned by the lookup API starting with 1.62.
+    min_microversion = '1.62'
+
+    @classmethod
+    def setup_fleet(cls):
+        nodes = cls.enroll_fleet(CONF.baremetal_benchmark.heartbeat_agents)
+
+        def _lookup(node):
+            try:
+                _, body = cls.client.ipa_lookup(node_uuid=node['uuid'])
+            except lib_exc.NotFound:
+                body = {}
+            token = body.get('config', {}).get('agent_token')
+            if not token or token == REDACTED_TOKEN:
+                raise cls.skipException(
+                    'Unable to retrieve an agent token for node %s, the '
+                    'lookup API must not be restricted to the deployment '
+                    'states ([api]restrict_lookup = False in ironic.conf)'
+                    % node['uuid'])
+            node['agent_token'] = token
+            return node
+
+        return utils.run_concurrently(_lookup, nodes,
+                                      CONF.baremetal_benchmark.concurrency)
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('5c0f6e0b-33a4-4b8e-9a0e-7d5d4f1c2a61')
+    def test_heartbeat_flood(self):
+        opts = CONF.baremetal_benchmark
+
+        def _heartbeat(index):
+            node = self.fleet[index % len(self.fleet)]
+            # Every agent reports from its own (documentation) address.
+            self.client.ipa_heartbeat(
+                node['uuid'],
+                callback_url='http://192.0.2.%d:9999' % (index % 254 + 1),
+                agent_token=node['agent_token'],
+                agent_version=opts.heartbeat_agent_version)
+
+        recorder = benchmark.LatencyRecorder().run_at_rate(
+            _heartbeat, opts.heartbeat_rate, opts.heartbeat_duration,
+            opts.heartbeat_concurrency)
+        summary = recorder.summary()
+        summary['target_rate'] = opts.heartbeat_rate
+        self.results['ipa_heartbeat'] = summary
+        LOG.info('Heartbeat benchmark: %s', summary)
+        self.assertGreater(summary['count'], 0,
+                           'No heartbeat was accepted')
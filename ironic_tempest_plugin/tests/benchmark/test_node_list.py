@@ -0,0 +1,144 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from tempest import config
+from tempest.lib import decorators
+
+from ironic_tempest_plugin.tests.benchmark import base
+
+
+CONF = config.CONF
+
+PROJECTED_FIELDS = 'uuid,name,provision_state,power_state,maintenance'
+
+
+class NodeQueriesMixin(object):
+
+    def walk_nodes(self, **kwargs):
+        """List all nodes page by page using limit and marker."""
+        marker = None
+        pages = 0
+        while True:
+            params = dict(kwargs, limit=CONF.baremetal_benchmark.page_size)
+            if marker:
+                params['marker'] = marker
+            _, body = self.client.list_nodes(**params)
+            pages += 1
+            if not body['nodes'] or not body.get('next'):
+                return pages
+            marker = body['nodes'][-1]['uuid']
+
+
+class TestNodeListBenchmark(base.BaseBaremetalBenchmarkTest,
+                            NodeQueriesMixin):
+    """Latency and throughput of the node list queries."""
+
+    # Required for the fields parameter.
+    min_microversion = '1.8'
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('f9eca862-2a80-4767-853d-23e3fac7b916')
+    def test_list_nodes(self):
+        self.assertNoErrors(self.measure('list_nodes',
+                                         self.client.list_nodes))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('3e23d934-ab20-417b-97e5-0e20c76553d7')
+    def test_list_nodes_detail(self):
+        self.assertNoErrors(self.measure('list_nodes_detail',
+                                         self.client.list_nodes_detail))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('39bc0012-9dd9-48b6-b34f-ac600483ed05')
+    def test_list_nodes_fields(self):
+        self.assertNoErrors(self.measure(
+            'list_nodes_fields',
+            lambda: self.client.list_nodes(fields=PROJECTED_FIELDS)))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('f5955b61-035a-43f5-931c-cf63e006c0f9')
+    def test_list_nodes_detail_filtered(self):
+        self.assertNoErrors(self.measure(
+            'list_nodes_detail_filtered',
+            lambda: self.client.list_nodes_detail(provision_state='enroll',
+                                                  maintenance=False)))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('4e1174da-4f3a-4a0d-9f0d-d79f50c8c3b6')
+    def test_list_nodes_first_page(self):
+        self.assertNoErrors(self.measure(
+            'list_nodes_first_page',
+            lambda: self.client.list_nodes(
+                limit=CONF.baremetal_benchmark.page_size)))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('182cc7ca-11d0-4925-92df-2bebf1da88fb')
+    def test_list_nodes_pagination(self):
+        # Every iteration walks the whole collection, so run fewer of them.
+        iterations = max(1, CONF.baremetal_benchmark.iterations // 10)
+        self.assertNoErrors(self.measure('list_nodes_walk', self.walk_nodes,
+                                         iterations=iterations))
+        self.assertNoErrors(self.measure(
+            'list_nodes_fields_walk',
+            lambda: self.walk_nodes(fields=PROJECTED_FIELDS),
+            iterations=iterations))
+
+
+class TestNodeShardBenchmark(base.BaseBaremetalBenchmarkTest,
+                             NodeQueriesMixin):
+    """Latency and throughput of the shard related queries."""
+
+    min_microversion = '1.82'
+    enroll_shards = True
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('18a326d3-6252-4001-9a90-3477bd447660')
+    def test_get_shards(self):
+        self.assertNoErrors(self.measure('get_shards',
+                                         self.client.get_shards))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('f51ff1b0-16f6-427c-88bb-83b47f7c9c46')
+    def test_list_nodes_by_shard(self):
+        self.assertNoErrors(self.measure(
+            'list_nodes_by_shard',
+            lambda: self.client.list_nodes(shard=self.shards[0])))
+        self.assertNoErrors(self.measure(
+            'list_nodes_fields_by_shard',
+            lambda: self.client.list_nodes(shard=self.shards[0],
+                                           fields=PROJECTED_FIELDS)))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('db1f2764-95a0-40e4-9905-0f7940bb9106')
+    def test_list_nodes_by_multiple_shards(self):
+        self.assertNoErrors(self.measure(
+            'list_nodes_by_multiple_shards',
+            lambda: self.client.list_nodes(shard=','.join(self.shards))))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('03585578-7fde-4808-8fc2-050f329c8245')
+    def test_list_nodes_sharded(self):
+        self.assertNoErrors(self.measure(
+            'list_nodes_sharded',
+            lambda: self.client.list_nodes(sharded=True)))
+        self.assertNoErrors(self.measure(
+            'list_nodes_unsharded',
+            lambda: self.client.list_nodes(sharded=False)))
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('eeb275f9-1c5b-4a63-ad88-be5e3e7112fa')
+    def test_list_nodes_shard_pagination(self):
+        iterations = max(1, CONF.baremetal_benchmark.iterations // 10)
+        self.assertNoErrors(self.measure(
+            'list_nodes_shard_walk',
+            lambda: self.walk_nodes(shard=self.shards[0]),
+            iterations=iterations))
@@ -0,0 +1,54 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_log import log as logging
+from tempest import config
+from tempest.lib import decorators
+
+from ironic_tempest_plugin.common import power_sweep
+from ironic_tempest_plugin.tests.benchmark import base
+
+
+LOG = logging.getLogger(__name__)
+CONF = config.CONF
+
+
+class TestPowerSweepBenchmark(base.BaseBaremetalBenchmarkTest):
+    """Latency of power state changes applied to the whole fleet.
+
+    Every node of the fleet is powered off, on and rebooted, with a limited
+    number of power requests in flight, and the time until every node
+    reaches the new power state is recorded.
+    """
+
+    # Required for the fields parameter.
+    min_microversion = '1.8'
+
+    def _sweep(self, target):
+        summary = power_sweep.sweep(
+            self.client, [node['uuid'] for node in self.fleet], target,
+            concurrency=CONF.baremetal_benchmark.concurrency,
+            interval=CONF.baremetal_benchmark.power_poll_interval,
+            # The fleet shares a chassis, do not list other nodes.
+            filters={'chassis_uuid': self.fleet[0]['chassis_uuid']})
+        shape = 'power_%s' % target.replace(' ', '_')
+        self.results[shape] = summary
+        LOG.info('Benchmark %s: %s', shape,
+                 {key: value for key, value in summary.items()
+                  if key != 'nodes'})
+        self.assertNoErrors(summary)
+
+    @decorators.attr(type=['benchmark'])
+    @decorators.idempotent_id('7921d659-9fef-41e1-8829-6f66d0a2179a')
+    def test_power_sweeps(self):
+        for target in ('power off', 'power on', 'rebooting'):
+            self._sweep(target)
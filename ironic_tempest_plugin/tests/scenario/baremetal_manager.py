@@ -14,6 +14,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import os
+import shutil
+import tempfile
 import time
 
 from oslo_log import log as logging
@@ -21,9 +25,15 @@ from tempest.common import waiters
 from tempest import config
 from tempest.lib.common import api_version_utils
 from tempest.lib.common.utils.linux import remote_client
-from tempest.lib.common.utils import test_utils
 from tempest.lib import exceptions as lib_exc
 
+from ironic_tempest_plugin.common import connectivity
+from ironic_tempest_plugin.common import fake_agent
+from ironic_tempest_plugin.common import inventory_store
+from ironic_tempest_plugin.common import preflight
+from ironic_tempest_plugin.common import ssh_probe
+from ironic_tempest_plugin.common import timing
+from ironic_tempest_plugin.common import token_cache
 from ironic_tempest_plugin.common import utils
 from ironic_tempest_plugin.common import waiters as ironic_waiters
 from ironic_tempest_plugin import manager
@@ -31,6 +41,9 @@ from ironic_tempest_plugin import manager
 CONF = config.CONF
 LOG = logging.getLogger(__name__)
 
+# Seconds between the authentication attempts once the SSH server is up.
+SSH_AUTH_RETRY_DELAY = 2
+
 
 def retry_on_conflict(func):
     def inner(*args, **kwargs):
@@ -42,7 +55,7 @@ def retry_on_conflict(func):
             except lib_exc.Conflict:
                 if att == 9:
                     raise
-                time.sleep(1)
+                timing.sleep(1)
     return inner
 
 
@@ -93,9 +106,26 @@ class BaremetalScenarioTest(manager.ScenarioTest):
                                                        cfg_min_version,
                                                        cfg_max_version)
 
+    @classmethod
+    def setUpClass(cls):
+        with timing.phase(cls.__name__, 'resource_setup') as timings:
+            cls.setup_timings = timings
+            super(BaremetalScenarioTest, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        with timing.phase(cls.__name__, 'resource_cleanup'):
+            super(BaremetalScenarioTest, cls).tearDownClass()
+
+    def setUp(self):
+        super(BaremetalScenarioTest, self).setUp()
+        if timing.enabled():
+            self.useFixture(timing.TimingFixture(self, self.setup_timings))
+
     @classmethod
     def setup_clients(cls):
         super(BaremetalScenarioTest, cls).setup_clients()
+        token_cache.share_managers(cls)
         if CONF.enforce_scope.ironic:
             client = cls.os_system_admin.baremetal.BaremetalClient()
         else:
@@ -116,8 +146,44 @@ class BaremetalScenarioTest(manager.ScenarioTest):
     @classmethod
     def resource_setup(cls):
         super(BaremetalScenarioTest, cls).resource_setup()
+        if preflight.enabled():
+            preflight.ensure(cls.baremetal_client)
         # allow any issues obtaining the node list to raise early
         cls.baremetal_client.list_nodes()
+        cls._inventory_stores = {}
+
+    @classmethod
+    def get_inventory_store(cls, name='inventory'):
+        """Get a compressed payload store shared by the tests of the class.
+
+        :param name: the name of the store, e.g. 'inventory'.
+        :returns: an InventoryStore object.
+        """
+        if name not in cls._inventory_stores:
+            store_dir = CONF.baremetal.inventory_store_dir
+            if store_dir:
+                os.makedirs(store_dir, exist_ok=True)
+            else:
+                store_dir = tempfile.mkdtemp()
+                cls.addClassResourceCleanup(shutil.rmtree, store_dir,
+                                            ignore_errors=True)
+            store = inventory_store.InventoryStore(
+                os.path.join(store_dir, '%s-%s' % (cls.__name__, name)))
+            cls.addClassResourceCleanup(store.close)
+            cls._inventory_stores[name] = store
+        return cls._inventory_stores[name]
+
+    def fetch_inventory(self, node_id, api_version='1.81'):
+        """Download the inventory of a node into the class store.
+
+        :param node_id: UUID of the node.
+        :param api_version: Ironic API version to use.
+        :returns: a lazily loaded, read-only view of the inventory.
+        """
+        return self.get_inventory_store().fetch(
+            node_id, api_version,
+            functools.partial(self.baremetal_client.download_inventory,
+                              node_id, api_version=api_version))
 
     @classmethod
     def wait_provisioning_state(cls, node_id, state, timeout=10, interval=1,
@@ -150,6 +216,19 @@ class BaremetalScenarioTest(manager.ScenarioTest):
             interval=10,
             abort_on_error_state=abort_on_error_state)
 
+    def start_fake_agent(self, node_id, **kwargs):
+        """Start a fake agent for a node, stopped on the test cleanup.
+
+        :param node_id: UUID of the node.
+        :param kwargs: other arguments of FakeAgent.
+        :returns: the started FakeAgent.
+        """
+        agent = fake_agent.FakeAgent(self.baremetal_client, node_id,
+                                     **kwargs)
+        agent.start()
+        self.addCleanup(agent.stop)
+        return agent
+
     @classmethod
     def get_node(cls, node_id=None, instance_id=None, api_version=None):
         return utils.get_node(cls.baremetal_client, node_id, instance_id,
@@ -362,6 +441,22 @@ class BaremetalScenarioTest(manager.ScenarioTest):
                      server=None,
                      timeout=60,
                      delay=10):
+        """Wait until an SSH session can be authenticated.
+
+        Authentication is only attempted once the SSH server has sent its
+        banner, see ssh_probe.
+
+        :param delay: the maximum delay between authentication attempts.
+        """
+        start = time.monotonic()
+        _, missing = ssh_probe.wait_for_banners([ip_address], timeout)
+        self.assertFalse(missing, f"No SSH server answered on {ip_address}")
+        self._wait_for_ssh_auth(
+            ip_address, username, private_key, server,
+            max(timeout - (time.monotonic() - start), 0), delay)
+
+    def _wait_for_ssh_auth(self, ip_address, username, private_key, server,
+                           timeout, delay):
         def _wait_ssh():
             try:
                 self.get_remote_client(ip_address, username, private_key,
@@ -372,9 +467,82 @@ class BaremetalScenarioTest(manager.ScenarioTest):
                 return False
             return True
 
-        res = test_utils.call_until_true(_wait_ssh, timeout, delay)
+        # The server is up, so authentication usually fails only until
+        # cloud-init has installed the key.
+        res = utils.call_until_true(_wait_ssh, timeout,
+                                    min(delay, SSH_AUTH_RETRY_DELAY))
         self.assertTrue(res, f"Failed to wait for ssh on {ip_address}")
 
+    def wait_for_ssh_many(self, targets, timeout=60, delay=10):
+        """Wait for SSH on several instances at the same time.
+
+        :param targets: a list of dictionaries with the ip_address key and
+            optionally the username, private_key and server keys, as
+            accepted by wait_for_ssh.
+        :param timeout: how long to wait for all instances.
+        :param delay: the maximum delay between authentication attempts.
+        """
+        start = time.monotonic()
+        _, missing = ssh_probe.wait_for_banners(
+            [target['ip_address'] for target in targets], timeout)
+        self.assertFalse(missing, "No SSH server answered on %s"
+                         % ', '.join(sorted(missing)))
+        remaining = max(timeout - (time.monotonic() - start), 0)
+        utils.run_concurrently(
+            lambda target: self._wait_for_ssh_auth(
+                target['ip_address'], target.get('username'),
+                target.get('private_key'), target.get('server'),
+                remaining, delay),
+            targets, len(targets))
+
+    def check_vm_connectivity_many(self, targets):
+        """Check that several instances are reachable at the same time.
+
+        :param targets: a list of dictionaries with the ip_address key and
+            optionally the username, private_key and server keys.
+        """
+        LOG.info("Waiting for SSH to become available on %s",
+                 ', '.join(target['ip_address'] for target in targets))
+        self.wait_for_ssh_many(targets)
+        results = utils.run_concurrently(
+            lambda target: self.ping_ip_address(
+                target['ip_address'], server=target.get('server')),
+            targets, len(targets))
+        unreachable = [target['ip_address']
+                       for target, result in zip(targets, results)
+                       if not result]
+        self.assertFalse(unreachable, "Timed out waiting for %s to become "
+                         "reachable" % ', '.join(unreachable))
+
+    def check_connectivity_matrix(self, sources, expected, timeout=15):
+        """Check the reachability between instances in parallel.
+
+        All sources are checked at the same time, and every source pings
+        all its destinations with a single command per attempt.
+
+        :param sources: a dictionary mapping source names to dictionaries
+            with the ip_address key and optionally the username and
+            private_key keys.
+        :param expected: a dictionary mapping (source name, destination IP)
+            tuples to whether the destination must be reachable.
+        :param timeout: how long to retry the unexpected results.
+        :returns: the reachability matrix, see connectivity.check_matrix.
+        """
+        def _get_client(source):
+            remote = self.get_remote_client(
+                source['ip_address'], username=source.get('username'),
+                private_key=source.get('private_key'))
+            remote.validate_authentication()
+            return remote
+
+        matrix = connectivity.check_matrix(_get_client, sources, expected,
+                                           timeout)
+        failures = connectivity.mismatches(matrix, expected)
+        self.assertFalse(failures, "Unexpected connectivity: %s" % '; '.join(
+            '%s -> %s expected %s, got %s' % failure
+            for failure in failures))
+        return matrix
+
     def check_vm_connectivity(self,
                               ip_address,
                               username=None,
@@ -391,6 +559,15 @@ class BaremetalScenarioTest(manager.ScenarioTest):
             self.wait_for_ssh(ip_address=ip_address, username=username,
                               private_key=private_key, server=server)
             LOG.info("SSH is now available on %s", ip_address)
+            # The instance is up, so there is no need for the polling of the
+            # base class and authenticating again, a ping must just pass.
+            msg = "%s is not reachable" % ip_address
+            if extra_msg:
+                msg = "%s\n%s" % (extra_msg, msg)
+            self.assertTrue(self.ping_ip_address(ip_address, mtu=mtu,
+                                                 server=server),
+                            msg=msg)
+            return
         super().check_vm_connectivity(ip_address=ip_address,
                                       username=username,
                                       private_key=private_key,
@@ -18,6 +18,7 @@
 import ipaddress
 import random
 
+from oslo_log import log as logging
 from oslo_utils import uuidutils
 from tempest import config
 from tempest.lib.common.utils.linux import remote_client
@@ -25,10 +26,17 @@ from tempest.lib.common.utils import test_utils
 from tempest.lib import exceptions as lib_exc
 from tempest.scenario import manager
 
+from ironic_tempest_plugin.common import capability_index
+from ironic_tempest_plugin.common import conductor_load
+from ironic_tempest_plugin.common import node_index
+from ironic_tempest_plugin.common import reaper
+from ironic_tempest_plugin.common import shards
+from ironic_tempest_plugin.common import utils
 from ironic_tempest_plugin.services.baremetal import base
 from ironic_tempest_plugin.tests.scenario import baremetal_manager as bm
 
 CONF = config.CONF
+LOG = logging.getLogger(__name__)
 
 
 class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
@@ -43,6 +51,10 @@ class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
     image_checksum = None
     boot_option = None
 
+    # Hardware the tests need, as arguments of capability_index.matches,
+    # e.g. {'min_disks': 2}. Only used with the capability index enabled.
+    hardware_requirements = None
+
     @classmethod
     def skip_checks(cls):
         """Defines conditions to skip these tests."""
@@ -82,23 +94,94 @@ class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
           * provision_state is 'available'
           * maintenance is False
           * No instance_uuid is associated to node.
+          * The node is in one of the shards of the worker, if workers are
+            bound to shards.
+
+        With interface aware selection, the nodes also have the fields used
+        by the node index.
 
         :returns: a list of Ironic nodes.
         """
         fields = ['uuid', 'driver', 'instance_uuid', 'provision_state',
                   'name', 'maintenance']
-        _, body = cls.baremetal_client.list_nodes(provision_state='available',
-                                                  associated=False,
-                                                  maintenance=False,
-                                                  fields=','.join(fields))
+        query = dict(provision_state='available', associated=False,
+                     maintenance=False)
+        minimum_version = None
+        if conductor_load.enabled():
+            fields.append('conductor')
+            minimum_version = conductor_load.CONDUCTOR_MICROVERSION
+        if node_index.enabled():
+            fields.extend(field for field in node_index.INDEX_FIELDS
+                          if field not in fields)
+            minimum_version = node_index.INDEX_MICROVERSION
+
+        worker_shards = shards.worker_shards(cls.baremetal_client)
+        if worker_shards is not None:
+            if not worker_shards:
+                raise cls.skipException('This worker is not bound to any '
+                                        'shard, there are fewer shards than '
+                                        'workers.')
+            query['shard'] = ','.join(worker_shards)
+            minimum_version = shards.SHARDS_MICROVERSION
+
+        query['fields'] = ','.join(fields)
+        if minimum_version is None:
+            _, body = cls.baremetal_client.list_nodes(**query)
+        else:
+            with base.microversion_at_least(minimum_version):
+                _, body = cls.baremetal_client.list_nodes(**query)
         return body['nodes']
 
+    @classmethod
+    def node_requirements(cls):
+        """Get the requirements of the tests on the node.
+
+        :returns: a dictionary of arguments for NodeIndex.best.
+        """
+        return {}
+
+    @classmethod
+    def check_hardware_requirements(cls):
+        """Skip the tests if no node has the required hardware.
+
+        Nodes with unknown capabilities, e.g. never inspected, may have it,
+        so the tests are only skipped if all nodes are known not to.
+        """
+        if not (capability_index.enabled() and cls.hardware_requirements):
+            return
+        index = capability_index.get_index(cls.baremetal_client)
+        if (not index.query(**cls.hardware_requirements)
+                and not index.unknown()):
+            raise cls.skipException(
+                'No node has the hardware required by the tests: %s'
+                % cls.hardware_requirements)
+
     @classmethod
     def get_random_available_node(cls):
-        """Randomly pick an available node for deployment."""
+        """Randomly pick an available node for deployment.
+
+        With interface aware selection, only the nodes needing the fewest
+        changes to match node_requirements are considered. With conductor
+        aware selection, nodes of less loaded conductors are more likely to be
+        picked. With the capability index, nodes known to have the required
+        hardware are preferred over nodes with unknown capabilities.
+        """
         nodes = cls.get_available_nodes()
-        if nodes:
-            return random.choice(nodes)
+        if capability_index.enabled() and cls.hardware_requirements:
+            index = capability_index.get_index(cls.baremetal_client)
+            matching = index.query(**cls.hardware_requirements)
+            nodes = ([node for node in nodes if node['uuid'] in matching]
+                     or [node for node in nodes
+                         if index.get(node['uuid']) is None])
+        if node_index.enabled():
+            nodes = node_index.NodeIndex(nodes).best(
+                **cls.node_requirements())
+        if not nodes:
+            return None
+        if conductor_load.enabled():
+            return conductor_load.choose(
+                nodes, conductor_load.loads(cls.baremetal_client))
+        return random.choice(nodes)
 
     @classmethod
     def create_neutron_port(cls, *args, **kwargs):
@@ -147,18 +230,70 @@ class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
         return vifs
 
     @classmethod
-    def add_floatingip_to_node(cls, node_id):
+    def prepare_network(cls):
+        """Start creating the port to boot the node in.
+
+        The port is created in the background while a node is reserved, it
+        is then used by boot_node. Nothing is created if there is no network
+        to create it in, in which case boot_node uses its fallback network.
+        """
+        network, subnet, router = cls.create_networks()
+        if network is None:
+            return
+        cls.network_future = utils.start_in_background(
+            cls.create_neutron_port, network_id=network['id'])
+
+    @classmethod
+    def take_prepared_port(cls):
+        """Get the port created by prepare_network, if any.
+
+        The port is only returned once.
+
+        :returns: the Neutron port or None if no port was prepared or the
+            preparation failed.
+        """
+        future = cls.__dict__.get('network_future')
+        if future is None:
+            return None
+        cls.network_future = None
+        try:
+            port = future.result()
+        except Exception:
+            LOG.warning('Preparing the network in the background failed, '
+                        'retrying during the deployment', exc_info=True)
+            return None
+        # In case the port is never attached to the node.
+        cls.addClassResourceCleanup(test_utils.call_and_ignore_notfound_exc,
+                                    cls.ports_client.delete_port, port['id'])
+        return port
+
+    @classmethod
+    def create_floating_ip(cls):
+        """Allocate a floating IP.
+
+        The caller is responsible for deleting it, so that it can be
+        allocated in the background.
+        """
+        body = cls.floating_ips_client.create_floatingip(
+            floating_network_id=CONF.network.public_network_id)
+        return body['floatingip']
+
+    @classmethod
+    def add_floatingip_to_node(cls, node_id, floating_ip=None):
         """Add floating IP to node.
 
         Create and associate floating IP with node VIF.
 
         :param node_id: Name or UUID of the node.
+        :param floating_ip: an already allocated floating IP to associate,
+            by default a new one is created.
         :returns: IP address of associated floating IP.
         """
         vif = cls.get_node_vifs(node_id)[0]
-        body = cls.floating_ips_client.create_floatingip(
-            floating_network_id=CONF.network.public_network_id)
-        floating_ip = body['floatingip']
+        if floating_ip is None:
+            body = cls.floating_ips_client.create_floatingip(
+                floating_network_id=CONF.network.public_network_id)
+            floating_ip = body['floatingip']
         cls.floating_ips_client.update_floatingip(floating_ip['id'],
                                                   port_id=vif)
         return floating_ip['floating_ip_address']
@@ -237,9 +372,10 @@ class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
                 nodes.append(n)
             except lib_exc.Conflict:
                 return False
+            conductor_load.begin(n.get('conductor'))
             return True
 
-        if (not test_utils.call_until_true(
+        if (not utils.call_until_true(
                 _try_to_associate_instance,
                 duration=CONF.baremetal.association_timeout, sleep_for=1)):
             msg = ('Timed out waiting to associate instance to ironic node '
@@ -263,12 +399,13 @@ class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
                 except lib_exc.Conflict:
                     return False
             return True
-        if (not test_utils.call_until_true(
+        if (not utils.call_until_true(
                 _try_to_disassociate_instance,
                 duration=CONF.baremetal.association_timeout, sleep_for=1)):
             msg = ('Timed out waiting to disassociate instance from '
                    'ironic node uuid %s' % node['instance_uuid'])
             raise lib_exc.TimeoutException(msg)
+        conductor_load.end(node.get('conductor'))
 
     @classmethod
     def gen_config_drive_net_info(cls, node_id, n_port):
@@ -334,8 +471,9 @@ class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
         """Boot ironic node.
 
         The following actions are executed:
-          * Create/Pick networks to boot node in.
-          * Create Neutron port and attach it to node.
+          * Create/Pick networks to boot node in and create a Neutron port,
+            unless they were prepared in the background.
+          * Attach the Neutron port to node.
           * Update node image_source/root_gb.
           * Deploy node.
           * Wait until node is deployed.
@@ -360,16 +498,18 @@ class BaremetalStandaloneManager(bm.BaremetalScenarioTest,
         if boot_option is None:
             boot_option = cls.boot_option
 
-        network, subnet, router = cls.create_networks()
-        try:
-            n_port = cls.create_neutron_port(network_id=network['id'])
-
-        except TypeError:
-            if fallback_network:
-                n_port = cls.create_neutron_port(
-                    network_id=fallback_network)
-            else:
-                raise
+        n_port = cls.take_prepared_port()
+        if n_port is None:
+            network, subnet, router = cls.create_networks()
+            try:
+                n_port = cls.create_neutron_port(network_id=network['id'])
+
+            except TypeError:
+                if fallback_network:
+                    n_port = cls.create_neutron_port(
+                        network_id=fallback_network)
+                else:
+                    raise
         cls.vif_attach(node_id=cls.node['uuid'], vif_id=n_port['id'])
         config_drive = None
         if config_drive_networking:
@@ -646,6 +786,10 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
     # If we need to set provision state 'deleted' for the node  after test
     delete_node = True
 
+    # If the tests deploy the node. Only then the network port is created
+    # while the node is reserved when overlap_network_setup is enabled.
+    deploys_node = True
+
     mandatory_attr = ['driver', 'image_ref']
 
     node = None
@@ -690,13 +834,29 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
                            fallback_network=None,
                            config_drive_networking=None,
                            method_to_get_ip=None):
-        cls.boot_node(image_ref, image_checksum,
-                      fallback_network=fallback_network,
-                      config_drive_networking=config_drive_networking)
+        floating_ip_future = None
+        if (CONF.baremetal.overlap_network_setup and not method_to_get_ip
+                and CONF.validation.connect_method == 'floating'):
+            # Allocate the floating IP while the node is deploying.
+            floating_ip_future = utils.start_in_background(
+                cls.create_floating_ip)
+        try:
+            cls.boot_node(image_ref, image_checksum,
+                          fallback_network=fallback_network,
+                          config_drive_networking=config_drive_networking)
+        finally:
+            if (floating_ip_future is not None
+                    and floating_ip_future.exception() is None):
+                cls.addClassResourceCleanup(
+                    test_utils.call_and_ignore_notfound_exc,
+                    cls.floating_ips_client.delete_floatingip,
+                    floating_ip_future.result()['id'])
         if method_to_get_ip:
             cls.node_ip = method_to_get_ip(cls.node['uuid'])
         elif CONF.validation.connect_method == 'floating':
-            cls.node_ip = cls.add_floatingip_to_node(cls.node['uuid'])
+            cls.node_ip = cls.add_floatingip_to_node(
+                cls.node['uuid'],
+                floating_ip_future.result() if floating_ip_future else None)
         elif CONF.validation.connect_method == 'fixed':
             cls.node_ip = cls.get_server_ip(cls.node['uuid'])
         else:
@@ -704,6 +864,15 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
                  'must be set.')
             raise lib_exc.InvalidConfiguration(m)
 
+    @classmethod
+    def node_requirements(cls):
+        requirements = {'driver': cls.driver,
+                        'boot_mode': CONF.baremetal.boot_mode}
+        for iface in base.SUPPORTED_INTERFACES:
+            requirements[f'{iface}_interface'] = getattr(
+                cls, f'{iface}_interface')
+        return requirements
+
     @classmethod
     def resource_setup(cls):
         super(BaremetalStandaloneScenarioTest, cls).resource_setup()
@@ -720,6 +889,10 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
             if requested := getattr(cls, f'{iface}_interface'):
                 boot_kwargs[f'{iface}_interface'] = requested
 
+        cls.check_hardware_requirements()
+        if CONF.baremetal.overlap_network_setup and cls.deploys_node:
+            # The port is ready by the time boot_node needs it.
+            cls.prepare_network()
         # just get an available node
         cls.node = cls.get_and_reserve_node()
         if (cls.use_available_driver
@@ -728,7 +901,21 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
             # If we're attempting to reuse the existing driver, then
             # lets save a value for update_node_driver to work with.
             cls.driver = cls.node['driver']
-        cls.update_node_driver(cls.node['uuid'], cls.driver, **boot_kwargs)
+        if node_index.enabled():
+            changes = node_index.differences(
+                cls.node, cls.driver,
+                **{name: value for name, value in boot_kwargs.items()
+                   if name in node_index.INTERFACE_FIELDS})
+            if changes:
+                cls.update_node_driver(cls.node['uuid'],
+                                       changes.pop('driver', cls.driver),
+                                       **changes)
+            else:
+                LOG.debug('Node %s already matches the driver and '
+                          'interfaces of %s', cls.node['uuid'], cls.__name__)
+        else:
+            cls.update_node_driver(cls.node['uuid'], cls.driver,
+                                   **boot_kwargs)
 
     @classmethod
     def cleanup_vif_attachments(cls):
@@ -743,6 +930,8 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
 
     @classmethod
     def resource_cleanup(cls):
+        # Wait for the network preparation if the node was never booted.
+        cls.take_prepared_port()
         if CONF.validation.connect_method == 'floating':
             if cls.node_ip:
                 try:
@@ -752,11 +941,35 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
                     pass
 
         cls.cleanup_vif_attachments()
-        cls.terminate_node(cls.node['uuid'])
-        cls.unreserve_node(cls.node)
+        if reaper.enabled():
+            # The credentials of the class are cleared by the reaper once
+            # the node is torn down. The global microversion may be changed
+            # by the next class, so the current one is passed on.
+            cls.teardown_future = reaper.get().submit(
+                cls.__name__, cls._background_teardown,
+                base.current_microversion())
+        else:
+            cls.terminate_node(cls.node['uuid'])
+            cls.unreserve_node(cls.node)
         base.reset_baremetal_api_microversion()
         super(BaremetalStandaloneManager, cls).resource_cleanup()
 
+    @classmethod
+    def _background_teardown(cls, microversion):
+        try:
+            with base.microversion(microversion):
+                cls.terminate_node(cls.node['uuid'])
+                cls.unreserve_node(cls.node)
+        finally:
+            super(BaremetalStandaloneScenarioTest, cls).clear_credentials()
+
+    @classmethod
+    def clear_credentials(cls):
+        # Only look at the class itself, a parent class may have handed its
+        # own node to the reaper.
+        if cls.__dict__.get('teardown_future') is None:
+            super(BaremetalStandaloneScenarioTest, cls).clear_credentials()
+
     def boot_and_verify_node(self, image_ref=None, image_checksum=None,
                              should_succeed=True):
         self.set_node_to_active(image_ref, image_checksum)
@@ -871,8 +1084,9 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
         """Boot ironic using a ramdisk node.
 
         The following actions are executed:
-          * Create/Pick networks to boot node in.
-          * Create Neutron port and attach it to node.
+          * Create/Pick networks to boot node in and create a Neutron port,
+            unless they were prepared in the background.
+          * Attach the Neutron port to node.
           * Update node image_source.
           * Deploy node.
           * Wait until node is deployed.
@@ -885,8 +1099,10 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
         if ramdisk_ref is None:
             ramdisk_ref = self.image_ref
 
-        network, subnet, router = self.create_networks()
-        n_port = self.create_neutron_port(network_id=network['id'])
+        n_port = self.take_prepared_port()
+        if n_port is None:
+            network, subnet, router = self.create_networks()
+            n_port = self.create_neutron_port(network_id=network['id'])
         self.vif_attach(node_id=self.node['uuid'], vif_id=n_port['id'])
         if iso:
             patch_path = '/instance_info/boot_iso'
@@ -941,8 +1157,9 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
         """Boot ironic using a ramdisk node.
 
         The following actions are executed:
-          * Create/Pick networks to boot node in.
-          * Create Neutron port and attach it to node.
+          * Create/Pick networks to boot node in and create a Neutron port,
+            unless they were prepared in the background.
+          * Attach the Neutron port to node.
           * Update node image_source.
           * Deploy node.
           * Wait until node is deployed.
@@ -956,8 +1173,10 @@ class BaremetalStandaloneScenarioTest(BaremetalStandaloneManager):
             raise cls.skipException('Skipping anaconda tests as an image ref '
                                     'was not supplied')
 
-        network, subnet, router = cls.create_networks()
-        n_port = cls.create_neutron_port(network_id=network['id'])
+        n_port = cls.take_prepared_port()
+        if n_port is None:
+            network, subnet, router = cls.create_networks()
+            n_port = cls.create_neutron_port(network_id=network['id'])
         cls.vif_attach(node_id=cls.node['uuid'], vif_id=n_port['id'])
         p_root = '/instance_info/'
         patch = [{'path': p_root + 'image_source',
@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import os
 import time
 
@@ -17,10 +18,13 @@ from oslo_serialization import jsonutils as json
 import tempest
 from tempest import config
 from tempest.lib.common.api_version_utils import LATEST_MICROVERSION
-from tempest.lib.common.utils import test_utils
 from tempest.lib import exceptions as lib_exc
 
 import ironic_tempest_plugin
+from ironic_tempest_plugin.common import inspection_rules
+from ironic_tempest_plugin.common import timing
+from ironic_tempest_plugin.common import utils
+from ironic_tempest_plugin.common import waiters
 from ironic_tempest_plugin import exceptions
 from ironic_tempest_plugin.tests.api.admin.api_microversion_fixture import \
     APIMicroversionFixture as IronicMicroversionFixture
@@ -114,17 +118,41 @@ class InspectorScenarioTest(BaremetalScenarioTest):
     def rule_import(self, rule_path):
         with open(rule_path, 'rb') as fp:
             rules = json.load(fp)
-        self.introspection_client.create_rules(rules)
+        self.rule_import_from_dict(rules)
 
     def rule_import_from_dict(self, rules):
+        # Fail early and with a clear message on rules the service would
+        # reject or silently never match.
+        inspection_rules.compile_rules(rules)
         self.introspection_client.create_rules(rules)
 
+    def rule_evaluate(self, rules, datasets, nodes=None):
+        """Evaluate rules offline against recorded introspection data.
+
+        :param rules: a rule or a list of rules.
+        :param datasets: a list of introspection data, e.g. as returned by
+            fetch_introspection_data.
+        :param nodes: optionally, the nodes corresponding to the data.
+        :returns: a list of inspection_rules.Outcome objects.
+        """
+        return inspection_rules.evaluate(
+            inspection_rules.compile_rules(rules), datasets, nodes=nodes)
+
     def introspection_status(self, uuid):
         return self.introspection_client.get_status(uuid)[1]
 
     def introspection_data(self, uuid):
         return self.introspection_client.get_data(uuid)[1]
 
+    def fetch_introspection_data(self, uuid):
+        """Download introspection data of a node into the class store.
+
+        :returns: a lazily loaded, read-only view of the data.
+        """
+        return self.get_inventory_store('introspection').fetch(
+            uuid, self.introspection_client.version,
+            functools.partial(self.introspection_client.download_data, uuid))
+
     def introspection_start(self, uuid):
         return self.introspection_client.start_introspection(uuid)
 
@@ -157,7 +185,7 @@ class InspectorScenarioTest(BaremetalScenarioTest):
                 return False
             return True
 
-        if not test_utils.call_until_true(
+        if not utils.call_until_true(
                 check_node,
                 duration=CONF.baremetal_introspection.discovery_timeout,
                 sleep_for=20):
@@ -167,52 +195,43 @@ class InspectorScenarioTest(BaremetalScenarioTest):
         inspected_node = self.node_show(self.node_info['name'])
         self.wait_for_introspection_finished(inspected_node['uuid'])
 
-    # TODO(aarefiev): switch to call_until_true
-    def wait_for_introspection_finished(self, node_ids):
-        """Waits for introspection of baremetal nodes to finish.
+    def iter_introspection_results(self, node_ids):
+        """Wait for introspection of nodes, yielding them as they finish.
 
+        The statuses of all nodes are fetched with one request per
+        [baremetal_introspection]introspection_sleep seconds.
+
+        :param node_ids: a UUID of a node or a list of them.
+        :returns: a generator of introspection statuses, either successful or
+            failed, in the order the nodes finish.
         """
         if isinstance(node_ids, str):
             node_ids = [node_ids]
-        start = int(time.time())
-        not_introspected = {node_id for node_id in node_ids}
-        introspection_start_timeout = (
-            CONF.baremetal_introspection.introspection_start_timeout)
-
-        while not_introspected:
-            time.sleep(CONF.baremetal_introspection.introspection_sleep)
-            for node_id in node_ids:
-                try:
-                    status = self.introspection_status(node_id)
-                except lib_exc.NotFound as exc:
-                    if int(time.time()) - start >= introspection_start_timeout:
-                        message = ('Node %(node_id)s did not appear in the '
-                                   'baremetal introspection API after '
-                                   '%(timeout)d seconds: %(error)s' %
-                                   {'node_id': node_id, 'error': exc,
-                                    'timeout': introspection_start_timeout})
-                        raise exceptions.IntrospectionFailed(message)
-                    else:
-                        continue
-                if status['finished']:
-                    if status['error']:
-                        message = ('Node %(node_id)s introspection failed '
-                                   'with %(error)s.' %
-                                   {'node_id': node_id,
-                                    'error': status['error']})
-                        raise exceptions.IntrospectionFailed(message)
-                    not_introspected = not_introspected - {node_id}
-
-            if (int(time.time()) - start
-                    >= CONF.baremetal_introspection.introspection_timeout):
-                message = ('Introspection timed out for nodes: %s' %
-                           not_introspected)
-                raise exceptions.IntrospectionTimeout(message)
+        return waiters.wait_for_introspection(
+            self.introspection_client, node_ids,
+            timeout=CONF.baremetal_introspection.introspection_timeout,
+            interval=CONF.baremetal_introspection.introspection_sleep,
+            start_timeout=(
+                CONF.baremetal_introspection.introspection_start_timeout))
+
+    def wait_for_introspection_finished(self, node_ids):
+        """Waits for introspection of baremetal nodes to finish.
+
+        :raises: IntrospectionFailed as soon as introspection of any node
+            fails.
+        """
+        for status in self.iter_introspection_results(node_ids):
+            if status['error']:
+                message = ('Node %(node_id)s introspection failed '
+                           'with %(error)s.' %
+                           {'node_id': status['uuid'],
+                            'error': status['error']})
+                raise exceptions.IntrospectionFailed(message)
 
     def wait_for_nova_aware_of_bvms(self):
         start = int(time.time())
         while True:
-            time.sleep(CONF.baremetal_introspection.hypervisor_update_sleep)
+            timing.sleep(CONF.baremetal_introspection.hypervisor_update_sleep)
             stats = self.hypervisor_stats()
             if int(stats['hypervisor_statistics']['count']):
                 break
@@ -259,3 +278,32 @@ class InspectorScenarioTest(BaremetalScenarioTest):
         self.baremetal_client.set_node_provision_state(node_id, 'manage')
         self.baremetal_client.set_node_provision_state(node_id, 'inspect')
         self.addCleanup(self.node_cleanup, node_id)
+
+    def introspect_nodes(self, node_ids, remove_props=True):
+        """Start introspection of several nodes concurrently.
+
+        Introspection is started through the introspection API, use
+        iter_introspection_results or wait_for_introspection_finished to
+        wait for it.
+
+        :param node_ids: UUIDs of the nodes.
+        :param remove_props: whether to remove the node properties first.
+        """
+        node_ids = list(node_ids)
+
+        def _start(node_id):
+            if remove_props:
+                patch = {('properties/%s' % key): None for key in
+                         self.node_show(node_id)['properties']}
+                patch['extra/rule_success'] = None
+                self.node_update(node_id, patch)
+            self.baremetal_client.set_node_provision_state(node_id, 'manage')
+            self.wait_provisioning_state(
+                node_id, 'manageable',
+                timeout=CONF.baremetal.active_timeout,
+                interval=self.wait_provisioning_state_interval)
+            self.introspection_start(node_id)
+
+        for node_id in node_ids:
+            self.addCleanup(self.node_cleanup, node_id)
+        utils.run_concurrently(_start, node_ids, len(node_ids))
@@ -35,6 +35,7 @@ class BaremetalFakeBios(
     image_ref = CONF.baremetal.whole_disk_image_ref
     wholedisk_image = True
     delete_node = False
+    deploys_node = False
     api_microversion = '1.40'
 
     @decorators.idempotent_id('ef55c44a-cc10-4cf6-8fda-85f0c0793150')
@@ -61,6 +62,7 @@ class BaremetalIdracBiosCleaning(
     credentials = ['primary', 'admin']
     driver = 'idrac'
     delete_node = False
+    deploys_node = False
     api_microversion = '1.40'
 
     def _get_bios_setting_to_update(self):
@@ -40,6 +40,7 @@ class BaremetalCleaningIpmiWholedisk(
     image_ref = CONF.baremetal.whole_disk_image_ref
     wholedisk_image = True
     delete_node = False
+    deploys_node = False
     deploy_interface = 'iscsi'
     api_microversion = '1.31'
 
@@ -69,6 +70,8 @@ class SoftwareRaidIscsi(bsm.BaremetalStandaloneScenarioTest):
     # Software RAID is always local boot
     boot_option = 'local'
     delete_node = False
+    # RAID 1 needs two disks
+    hardware_requirements = {'min_disks': 2}
 
     raid_config = {
         "logical_disks": [
@@ -114,6 +117,8 @@ class SoftwareRaidDirect(bsm.BaremetalStandaloneScenarioTest):
     # Software RAID is always local boot
     boot_option = 'local'
     delete_node = False
+    # RAID 1 needs two disks
+    hardware_requirements = {'min_disks': 2}
 
     # TODO(dtantsur): more complex layout in this job
     raid_config = {
@@ -154,6 +159,7 @@ class BaremetalIdracManagementCleaning(
 
     driver = 'idrac'
     delete_node = False
+    deploys_node = False
     # Minimum version for manual cleaning is 1.15 (# v1.15: Add ability to
     # do manual cleaning of nodes). The test cases clean up at the end by
     # detaching the VIF. Support for VIFs was introduced by version 1.28
@@ -317,6 +323,7 @@ class BaremetalRedfishFirmwareUpdate(bsm.BaremetalStandaloneScenarioTest):
     api_microversion = '1.68'  # to support redfish firmware update
     driver = 'redfish'
     delete_node = False
+    deploys_node = False
     image_ref = CONF.baremetal.whole_disk_image_ref
     wholedisk_image = True
 
@@ -381,6 +388,7 @@ class BaremetalIdracRedfishConfigurationMolds(
 
     api_microversion = '1.72'  # to support configuration molds functionality
     delete_node = False
+    deploys_node = False
     image_ref = CONF.baremetal.whole_disk_image_ref
     driver = 'idrac'
     boot_interface = 'ipxe'
@@ -447,3 +455,37 @@ class BaremetalIdracRedfishConfigurationMolds(
             ]
             self.addCleanup(self.manual_cleaning, self.node,
                             clean_steps=rollback_steps)
+
+
+class BaremetalCleaningFakeAgent(bsm.BaremetalStandaloneScenarioTest):
+
+    mandatory_attr = ['driver']
+
+    # The fake agent replaces the ramdisk, the conductor still runs the
+    # whole agent based cleaning flow.
+    driver = 'fake-hardware'
+    boot_interface = 'fake'
+    power_interface = 'fake'
+    deploy_interface = 'direct'
+    delete_node = False
+    deploys_node = False
+    api_microversion = '1.31'
+
+    @classmethod
+    def skip_checks(cls):
+        super(BaremetalCleaningFakeAgent, cls).skip_checks()
+        if not CONF.baremetal.fake_agent_address:
+            raise cls.skipException('No address is configured for the '
+                                    'fake agents')
+
+    @decorators.idempotent_id('14d66b4f-86e1-4f85-9ecd-1935c1e970c1')
+    def test_manual_cleaning_fake_agent(self):
+        agent = self.start_fake_agent(self.node['uuid'])
+        self.check_manual_partition_cleaning(self.node)
+        steps = [command.params['step']['step']
+                 for command in agent.commands
+                 if command.name == 'clean.execute_clean_step']
+        # Automated cleaning may run more steps once the node is provided.
+        self.assertEqual('erase_devices_metadata', steps[0])
+        self.assertIn('clean.get_clean_steps',
+                      [command.name for command in agent.commands])
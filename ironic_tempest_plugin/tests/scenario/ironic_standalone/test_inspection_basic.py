@@ -27,6 +27,7 @@ class BaremetalInspectBase:
     # (# v1.31: Support for updating inspect_interface).
     api_microversion = '1.31'
     delete_node = False
+    deploys_node = False
     wait_provisioning_state_interval = 1
 
     def _verify_node_inspection_data(self, node):
@@ -75,8 +76,7 @@ class BaremetalRedfishAgentInspect(BaremetalInspectBase,
 
     def _verify_node_inspection_data(self, node):
         super()._verify_node_inspection_data(node)
-        inspection_data = self.baremetal_client.show_inventory(
-            self.node['uuid'])
+        inspection_data = self.fetch_inventory(self.node['uuid'])
         self.assertEqual({'inventory', 'plugin_data'}, set(inspection_data))
 
         # Inventory sanity check
@@ -17,9 +17,9 @@ from oslo_log import log as logging
 from tempest.common import utils
 from tempest import config
 from tempest.lib.common.utils import data_utils
-from tempest.lib.common.utils import test_utils
 from tempest.lib import decorators
 
+from ironic_tempest_plugin.common import utils as ironic_utils
 from ironic_tempest_plugin import manager
 from ironic_tempest_plugin.tests.scenario import baremetal_manager
 
@@ -97,7 +97,7 @@ class BaremetalMultitenancy(baremetal_manager.BaremetalScenarioTest,
 
         # NOTE(vsaienko): we may lost couple of pings due to missing ARPs
         # so do several retries to get stable output.
-        res = test_utils.call_until_true(ping_remote, timeout, 1)
+        res = ironic_utils.call_until_true(ping_remote, timeout, 1)
         self.assertTrue(res)
 
     def multitenancy_check(self, use_vm=False):
@@ -119,9 +119,6 @@ class BaremetalMultitenancy(baremetal_manager.BaremetalScenarioTest,
         floating_ip1 = self.create_floating_ip(
             instance1,
         )['floating_ip_address']
-        self.check_vm_connectivity(ip_address=floating_ip1,
-                                   private_key=keypair['private_key'],
-                                   server=instance1)
         if use_vm:
             # Create VM on compute node
             alt_instance = self.create_server(
@@ -144,28 +141,22 @@ class BaremetalMultitenancy(baremetal_manager.BaremetalScenarioTest,
             alt_instance,
             client=self.os_alt.floating_ips_client
         )['floating_ip_address']
-        self.check_vm_connectivity(
-            ip_address=alt_floating_ip,
-            private_key=alt_keypair['private_key'],
-            server=alt_instance)
-        self.verify_l3_connectivity(
-            alt_floating_ip,
-            alt_keypair['private_key'],
-            fixed_ip1,
-            conn_expected=False
-        )
-        self.verify_l3_connectivity(
-            floating_ip1,
-            keypair['private_key'],
-            fixed_ip2,
-            conn_expected=False
-        )
-        self.verify_l3_connectivity(
-            floating_ip1,
-            keypair['private_key'],
-            alt_floating_ip,
-            conn_expected=True
-        )
+        self.check_vm_connectivity_many(
+            [{'ip_address': floating_ip1,
+              'private_key': keypair['private_key'],
+              'server': instance1},
+             {'ip_address': alt_floating_ip,
+              'private_key': alt_keypair['private_key'],
+              'server': alt_instance}])
+        # The checks are independent, run them at the same time.
+        self.check_connectivity_matrix(
+            {'primary': {'ip_address': floating_ip1,
+                         'private_key': keypair['private_key']},
+             'alt': {'ip_address': alt_floating_ip,
+                     'private_key': alt_keypair['private_key']}},
+            {('alt', fixed_ip1): False,
+             ('primary', fixed_ip2): False,
+             ('primary', alt_floating_ip): True})
         self.terminate_instance(
             instance=alt_instance,
             servers_client=self.os_alt.servers_client)
@@ -74,19 +74,6 @@ class BaremetalSingleTenant(baremetal_manager.BaremetalScenarioTest,
 
         return network, subnet, router
 
-    def verify_l3_connectivity(self, source_ip, private_key,
-                               destination_ip, conn_expected=True):
-        remote = self.get_remote_client(source_ip, private_key=private_key)
-        remote.validate_authentication()
-
-        cmd = 'ping %s -c4 -w4 || exit 0' % destination_ip
-        success_substring = " bytes from %s" % destination_ip
-        output = remote.exec_command(cmd)
-        if conn_expected:
-            self.assertIn(success_substring, output)
-        else:
-            self.assertNotIn(success_substring, output)
-
     def tenancy_check(self, use_vm=False):
 
         ip_version = CONF.validation.ip_version_for_ssh
@@ -112,9 +99,6 @@ class BaremetalSingleTenant(baremetal_manager.BaremetalScenarioTest,
             floating_ip1 = self.create_floating_ip(
                 instance1,
             )['floating_ip_address']
-        self.check_vm_connectivity(ip_address=floating_ip1,
-                                   private_key=keypair['private_key'],
-                                   server=instance1)
 
         if use_vm:
             # Create VM on compute node
@@ -140,29 +124,23 @@ class BaremetalSingleTenant(baremetal_manager.BaremetalScenarioTest,
                 instance2,
                 client=self.os_primary.floating_ips_client
             )['floating_ip_address']
-        self.check_vm_connectivity(
-            ip_address=floating_ip2,
-            private_key=keypair['private_key'],
-            server=instance2)
-
-        self.verify_l3_connectivity(
-            floating_ip2,
-            keypair['private_key'],
-            fixed_ip1,
-            conn_expected=True
-        )
-        self.verify_l3_connectivity(
-            floating_ip1,
-            keypair['private_key'],
-            fixed_ip2,
-            conn_expected=True
-        )
-        self.verify_l3_connectivity(
-            floating_ip1,
-            keypair['private_key'],
-            floating_ip2,
-            conn_expected=True
-        )
+        self.check_vm_connectivity_many(
+            [{'ip_address': floating_ip1,
+              'private_key': keypair['private_key'],
+              'server': instance1},
+             {'ip_address': floating_ip2,
+              'private_key': keypair['private_key'],
+              'server': instance2}])
+
+        # The checks are independent, run them at the same time.
+        self.check_connectivity_matrix(
+            {'instance1': {'ip_address': floating_ip1,
+                           'private_key': keypair['private_key']},
+             'instance2': {'ip_address': floating_ip2,
+                           'private_key': keypair['private_key']}},
+            {('instance2', fixed_ip1): True,
+             ('instance1', fixed_ip2): True,
+             ('instance1', floating_ip2): True})
         self.terminate_instance(
             instance=instance2,
             servers_client=self.os_primary.servers_client)
@@ -21,7 +21,7 @@ from ironic_tempest_plugin.tests.scenario import introspection_manager
 class InspectorBasicTest(introspection_manager.InspectorScenarioTest):
 
     def verify_node_introspection_data(self, node):
-        data = self.introspection_data(node['uuid'])
+        data = self.fetch_introspection_data(node['uuid'])
         # Validate that introspection discovered CPU architecture
         # (common architectures supported by Ironic)
         self.assertIn(data['cpu_arch'],
@@ -69,8 +69,7 @@ class InspectorBasicTest(introspection_manager.InspectorScenarioTest):
         self.rule_import(rule_path)
         self.addCleanup(self.rule_purge)
 
-        for node_id in self.node_ids:
-            self.introspect_node(node_id)
+        self.introspect_nodes(self.node_ids)
 
         # settle down introspection
         self.wait_for_introspection_finished(self.node_ids)